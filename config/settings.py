@@ -11,11 +11,89 @@ SHA_TZ = timezone(timedelta(hours=8), 'Asia/Shanghai')
 # === 敏感信息 (从环境变量获取) ===
 TG_BOT_TOKEN = os.getenv("TG_BOT_TOKEN")
 TG_CHAT_ID = os.getenv("TG_CHAT_ID")
+TG_API_BASE = os.getenv("TG_API_BASE", "https://api.telegram.org")
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
 
+# === AI 模型配置 ===
+# base_url 可通过环境变量指向兼容 OpenAI 协议的其他服务（或本地测试桩）
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+DEEPSEEK_MODEL = "deepseek-chat"
+AI_CONNECT_TIMEOUT = 5.0    # 秒，建立连接的超时
+AI_READ_TIMEOUT = 120.0     # 秒，等待生成结果的超时
+AI_MAX_RETRIES = 1          # SDK 内置重试次数
+AI_MAX_CONCURRENCY = 4      # 批量调用时的最大并发数
+
 # === 文件路径 ===
 PICK_FILE = os.path.join(BASE_DIR, "stock_pick.json")     # 选股记忆文件
 PROMPTS_FILE = os.path.join(BASE_DIR, "prompts.json")     # 外部提示词文件
+KEYWORDS_FILE = os.path.join(BASE_DIR, "keywords.json")   # 外部关键词文件
+NEWS_CURSOR_FILE = os.path.join(BASE_DIR, "news_cursor.json")  # 快讯已读游标
+TRACK_STATE_FILE = os.path.join(BASE_DIR, "track_state.json")  # 个股追踪状态 (上次提醒价、已触发规则)
+NEWS_FINGERPRINT_FILE = os.path.join(BASE_DIR, "news_fingerprints.json")  # 已推送事件指纹
+CACHE_DIR = os.path.join(BASE_DIR, ".cache")                # 本地缓存目录 (不入库)
+AI_CACHE_FILE = os.path.join(CACHE_DIR, "ai_cache.sqlite3")  # AI 回复缓存
+KLINE_DIR = os.path.join(CACHE_DIR, "klines")               # 日K线缓存
+NEWS_ARCHIVE_DB = os.path.join(CACHE_DIR, "news_archive.sqlite3")  # 快讯归档与倒排索引
+FUNDS_DIR = os.path.join(CACHE_DIR, "funds")                # 盘中板块资金时序 (按交易日分目录)
+
+# === 快讯抓取配置 ===
+NEWS_MAX_ITEMS = 100    # 单次最多处理的快讯条数（即全量抓取的页大小）
+NEWS_PAGE_SIZE = 20     # 增量模式下每页条数，按需翻页
+NEWS_SNAPSHOT_TTL = 60  # 快讯快照有效期(秒)：期内不同回溯窗口共用同一次抓取
+
+# === 快讯归档 (倒排索引，供追踪/复盘按股票查新闻) ===
+# 设置环境变量 NEWS_ARCHIVE_DISABLE=1 可整体关闭归档
+NEWS_ARCHIVE_ENABLED = os.getenv("NEWS_ARCHIVE_DISABLE") != "1"
+NEWS_ARCHIVE_RETENTION_DAYS = 30  # 归档保留天数，每天压缩一次
+NEWS_ARCHIVE_LOOKBACK_DAYS = 3    # 追踪/复盘查询相关快讯的回溯天数
+NEWS_ARCHIVE_MAX_ITEMS = 5        # 每只股票最多带几条相关快讯
+
+# === AI 回复缓存配置 ===
+# 设置环境变量 AI_CACHE_DISABLE=1 可整体关闭缓存
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_DISABLE") != "1"
+AI_CACHE_MAX_ENTRIES = 500
+AI_CACHE_DEFAULT_TTL = 1800   # 秒
+# 各模式的缓存有效期（秒），0 表示不缓存
+AI_CACHE_TTL = {
+    "monitor": 1800,
+    "periodic": 3600,
+    "after_market": 3600,
+    "daily": 6 * 3600,
+    "funds": 1800,
+    "track": 600,
+    "recommend": 3600,
+}
+
+# === 启动耗时预算 (--profile-startup) ===
+# 各模式的导入耗时上限（毫秒），超出时 --profile-startup 以非零码退出，可直接用于 CI 回归
+STARTUP_BUDGET_MS = {
+    "review": 250,
+    "monitor": 250,
+}
+
+# === 常驻监控 (serve) 配置 ===
+SERVE_INTERVAL = int(os.getenv("SERVE_INTERVAL", "60"))   # 秒，快讯轮询间隔
+SERVE_HEARTBEAT = 600                                     # 秒，心跳日志间隔
+
+# === 近似去重配置 (MinHash-LSH) ===
+DEDUP_SIMILARITY = 0.6  # 估算 Jaccard 相似度达到该值、且事件要素一致时才视为同一事件
+DEDUP_TTL_HOURS = 12    # 已推送事件的指纹保留时长
+# 事件要素：两条快讯提到的指数、公司、代码与方向词必须完全相同才允许合并
+# 避免"加息/降息"、"涨停/跌停"、"中信证券/华泰证券"这类字面相近、含义不同的快讯被误合并
+DEDUP_INDEX_NAMES = {   # 指数名称 -> 统一名称
+    "沪指": "沪指", "上证指数": "沪指", "深成指": "深成指", "深证成指": "深成指",
+    "创业板指": "创业板指", "科创50": "科创50", "北证50": "北证50", "沪深300": "沪深300",
+    "上证50": "上证50", "中证500": "中证500", "中证1000": "中证1000",
+    "恒指": "恒指", "恒生指数": "恒指", "恒生科技": "恒生科技", "纳指": "纳指", "道指": "道指", "标普": "标普",
+}
+DEDUP_COMPANY_SUFFIXES = [  # 公司简称 = 两个字 + 常见后缀
+    "证券", "银行", "保险", "集团", "控股", "科技", "传媒", "医药", "药业", "能源", "汽车",
+    "电子", "电气", "光电", "新材", "化工", "电力", "地产", "通信", "软件", "生物", "半导体",
+]
+DEDUP_POLARITY_TERMS = [    # 方向词：任一方出现而另一方没有时不合并
+    "涨", "跌", "加息", "降息", "降准", "加征", "上调", "下调", "增持", "减持",
+    "暂停", "取消", "恢复", "终止", "否认", "流入", "流出", "利好", "利空", "买入", "卖出",
+]
 
 # === 网络请求配置 ===
 # 浏览器身份池
@@ -24,10 +102,74 @@ USER_AGENTS = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15"
 ]
 
+# === HTTP 会话层配置 ===
+# 每个 host 共享一个长连接 Session；失败时按指数退避 + 随机抖动重试
+HTTP_POOL_SIZE = 10
+HTTP_MAX_RETRIES = 2
+HTTP_BACKOFF_BASE = 0.5      # 秒
+HTTP_BACKOFF_MAX = 8.0       # 秒
+# 按 host 的令牌桶限流：(每秒令牌数, 桶容量)，未列出的 host 不限流
+HTTP_RATE_LIMITS = {
+    "push2.eastmoney.com": (5, 10),
+    "newsapi.eastmoney.com": (2, 4),
+    "api.telegram.org": (1, 3),
+}
+EASTMONEY_REFERER = "https://eastmoney.com/"
+
+# === Telegram 发送队列 ===
+# send_tg 只入队，由后台线程合并、分段后发送；进程退出前最多等待 TG_FLUSH_TIMEOUT 秒
+TG_MAX_LENGTH = 4096         # Telegram 单条消息字符上限
+TG_MAX_RETRIES = 3           # 单段消息的最大重试次数 (429 / 5xx / 连接失败)
+TG_RETRY_AFTER_MAX = 60      # 429 retry_after 的等待上限(秒)
+TG_TIMEOUT = 10              # 单次发送超时(秒)
+TG_FLUSH_TIMEOUT = 30
+
+# === 录制 / 回放 (离线基准测试) ===
+# FIXTURE_MODE=record 时把真实的 HTTP / AI 响应写入 FIXTURE_DIR；=replay 时只从该目录回放，不联网
+FIXTURE_MODE = os.getenv("FIXTURE_MODE")
+FIXTURE_DIR = os.getenv("FIXTURE_DIR", os.path.join(BASE_DIR, "fixtures", "v1"))
+FIXTURE_VERSION = 1
+FIXTURE_LATENCY_MS = float(os.getenv("FIXTURE_LATENCY_MS", "0"))        # 回放 HTTP 的模拟延迟
+FIXTURE_JITTER_MS = float(os.getenv("FIXTURE_JITTER_MS", "0"))          # 延迟的随机抖动 (±)
+FIXTURE_AI_LATENCY_MS = float(os.getenv("FIXTURE_AI_LATENCY_MS", "0"))  # 回放 AI 的模拟延迟
+BENCH_BASELINE_FILE = os.path.join(BASE_DIR, "fixtures", "bench_baseline.json")
+BENCH_MODES = ["recommend", "track", "review", "daily", "funds", "monitor", "periodic", "after_market"]
+
+# === 阶段追踪 (抓取 / 解析 / Prompt / AI / 推送) ===
+# TRACE=1 或 --trace 开启；span 以 JSON Lines 追加到 TRACE_FILE，设置 TRACE_PROM_FILE 时另写 Prometheus 文本文件
+TRACE_ENABLED = os.getenv("TRACE", "").lower() in ("1", "true", "yes")
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(CACHE_DIR, "trace.jsonl"))
+TRACE_PROM_FILE = os.getenv("TRACE_PROM_FILE")
+
 # API 地址常量 (集中管理)
-URL_NEWS = "https://newsapi.eastmoney.com/kuaixun/v1/getlist_102_ajaxResult_100_1_.html"
+URL_NEWS_PAGE = "https://newsapi.eastmoney.com/kuaixun/v1/getlist_102_ajaxResult_{size}_{page}_.html"
 URL_FUNDS = "https://push2.eastmoney.com/api/qt/clist/get"
 URL_QUOTE = "https://push2.eastmoney.com/api/qt/stock/get"
+URL_QUOTES = "https://push2.eastmoney.com/api/qt/ulist.np/get"     # 多股批量行情
+URL_KLINE = "https://push2his.eastmoney.com/api/qt/stock/kline/get" # 日K线
+
+# 全市场快照：clist 分页大小、并发页数、快照有效期(秒)
+# 一次查询的代码数不少于 MARKET_SNAPSHOT_MIN_CODES 时，直接拉全市场快照代替逐批请求
+MARKET_PAGE_SIZE = 100
+MARKET_MAX_WORKERS = 8
+MARKET_SNAPSHOT_TTL = 60
+MARKET_SNAPSHOT_MIN_CODES = 200
+
+# 选股量化预排序：候选池大小、送给 AI 的前 N 名、各因子权重 (z 分数加权)
+# 第一名领先第二名超过 RANK_DOMINANCE_GAP 分时直接采用，不再调用 AI
+RECOMMEND_POOL_SIZE = 30
+RANK_TOP_N = 5
+RANK_WEIGHTS = {"momentum": 0.3, "turnover": 0.2, "sector_flow": 0.25, "news": 0.25}
+RANK_DOMINANCE_GAP = 1.0
+
+# 板块资金：净流入前/后 K 名，以及盘中"加速流入/流出"各列出几个板块
+FUNDS_TOP_K = 8
+FUNDS_ACCEL_TOP_K = 5
+FUNDS_RETENTION_DAYS = 5   # 资金时序保留最近几个交易日的目录
+
+# 批量行情：单次请求最多携带的 secid 数量，以及降级逐只查询时的并发上限
+QUOTE_BATCH_SIZE = 50
+QUOTE_MAX_WORKERS = 8
 
 # === 默认 Prompt (兜底策略) ===
 # 如果 prompts.json 读取失败，将使用这里的默认值
@@ -37,8 +179,45 @@ DEFAULT_PROMPTS = {
     "after_market": "你是复盘专家。基于下午新闻写《收盘复盘》：\n{news_txt}\n\n1.今日赚钱效应\n2.尾盘变化\n3.明日推演",
     "periodic": "快速总结盘中简报：\n{news_txt}",
     "funds": "你是一位资深A股分析师。这是今日行业资金数据：\n\n主力抢筹：\n{in_str}\n\n主力抛售：\n{out_str}\n\n请分析核心风口、避险板块并给出明日态度。",
-    "track": "你今天早上推荐了【{name} ({code})】。\n当前行情：现价 {price}，涨跌幅 {pct}%。\n\n作为游资交易员，请评价当前走势：\n1. 是否符合预期？\n2. 操作建议（持仓/补仓/止损/止盈）？\n3. 简短犀利，100字以内。"
+    "track": "你在{date}推荐了【{name} ({code})】。\n当前行情：现价 {price}，涨跌幅 {pct}%。\n近期走势：{trend}\n\n作为游资交易员，请评价当前走势：\n1. 是否符合预期？\n2. 操作建议（持仓/补仓/止损/止盈）？\n3. 简短犀利，100字以内。"
+}
+
+# === 默认 Prompt token 预算 (兜底策略) ===
+# 新闻列表部分允许占用的 token 数，prompts.json 中的 token_budgets 优先
+DEFAULT_TOKEN_BUDGETS = {
+    "daily": 600,
+    "periodic": 500,
+    "after_market": 500,
+    "recommend": 300,
+    "monitor": 700,
+}
+
+# === 个股追踪触发规则 (兜底策略) ===
+# 只有规则触发时才调用 AI；prompts.json 中的 track_rules 优先
+DEFAULT_TRACK_RULES = {
+    "pct_abs": 5.0,         # 当日涨跌幅绝对值达到 N% (每天一次)
+    "start_break": True,    # 跌破 / 重新站上推荐价
+    "since_last": 3.0,      # 距上次提醒价格变动 N%
+    "profit_abs": 10.0,     # 相对推荐价累计盈亏达到 N% (每天一次)
+    "quiet_update": True,   # 没有规则触发时发送一条模板简报；False 则静默
+    "max_codes": 5,         # 同时追踪的最近选股数量
+}
+
+# === 默认关键词 (兜底策略) ===
+# 如果 keywords.json 读取失败，将使用这里的默认值
+DEFAULT_KEYWORDS = {
+    # 监控模式：命中后放宽时间窗口，并参与排序
+    "high_impact": [
+        "涨停", "跌停", "停牌", "复牌", "业绩", "并购", "重组", "回购", "增持", "减持",
+        "政策", "降息", "加息", "关税", "制裁", "突发", "北向", "主力", "龙头", "算力", "芯片", "AI"
+    ]
 }
 
 # ... (在 PICK_FILE 下面增加一行)
-HISTORY_FILE = os.path.join(BASE_DIR, "history.csv")   # 战绩记录表
+HISTORY_FILE = os.path.join(BASE_DIR, "history.csv")   # 战绩记录表 (CSV 镜像)
+RANKING_FILE = os.path.join(BASE_DIR, "ranking_snapshots.jsonl")  # 每次选股的量化排名快照 (回测用)
+HISTORY_DB = os.path.join(BASE_DIR, "history.db")      # 战绩记录库 (带日期/代码索引)
+REVIEW_WINDOW = "all"    # 复盘默认统计范围："all" 为全部历史，也可以是最近 N 次
+REVIEW_MAX_DETAILS = 10  # 复盘消息里最多列出多少条明细，防止消息过长
+REVIEW_FORWARD_DAYS = (1, 3, 5, 10)  # 统计选股后第 N 个交易日的收益
+KLINE_MAX_WORKERS = 8    # 并发拉取K线的线程数
@@ -1,12 +1,24 @@
 import json
 import os
 import re
-import csv
+import time
 from datetime import datetime, timedelta
 from config import settings
-from utils.notifier import send_tg, log_info, log_error
-from utils.ai_client import get_ai_response
-from core.data_fetcher import get_news, get_market_funds, get_hot_stocks_data, get_stock_quote
+from utils.notifier import send_tg, log_info, log_error, flush_notifications, get_tg_stats
+from utils.ai_client import get_ai_response, get_ai_responses, stream_ai_response
+from core.data_fetcher import (get_news, split_top_flows, get_sector_flows, get_hot_stocks_data, get_stock_quotes,
+                               commit_news_cursor)
+from core.keyword_index import KeywordIndex
+from core.dedup import cluster, FingerprintStore
+from core.history_store import HistoryStore
+from core.kline_store import get_daily_closes, sync_codes, trend_summary, tracked_codes
+from core.review_stats import compute_review_stats, format_review_stats
+from core.prompt_builder import estimate_tokens, clean_title, rank_news, pack_lines
+from utils.tracing import span
+from core.track_rules import evaluate, load_track_state, save_track_state
+from core.funds_store import record_and_analyze
+from core.news_archive import stock_news
+from core.candidate_ranker import build_features, score_candidates, dominant_pick, format_features, save_ranking
 
 def load_prompts():
     """加载提示词：优先读取本地文件，失败则使用默认配置"""
@@ -18,35 +30,153 @@ def load_prompts():
         log_error(f"⚠️ 提示词文件读取失败: {e}，将使用默认 Prompt")
     return settings.DEFAULT_PROMPTS
 
-def run_recommend():
+def load_keywords():
+    """加载关键词表：优先读取本地文件，失败则使用默认配置"""
+    try:
+        if os.path.exists(settings.KEYWORDS_FILE):
+            with open(settings.KEYWORDS_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+    except Exception as e:
+        log_error(f"⚠️ 关键词文件读取失败: {e}，将使用默认关键词")
+    return settings.DEFAULT_KEYWORDS
+
+def _high_impact_index():
+    """按关键词配置构建高影响力关键词索引"""
+    keywords = load_keywords().get("high_impact") or settings.DEFAULT_KEYWORDS["high_impact"]
+    return KeywordIndex(keywords)
+
+def _token_budget(prompts, mode):
+    """读取某个模式的新闻 token 预算：prompts.json 优先，其次默认配置"""
+    budgets = prompts.get("token_budgets") or {}
+    return budgets.get(mode, settings.DEFAULT_TOKEN_BUDGETS[mode])
+
+def _build_news_txt(news, mode, prompts, max_items):
+    """按关键词命中数和新旧排序，在 token 预算内拼装新闻列表"""
+    budget = _token_budget(prompts, mode)
+    with span("prompt.news", mode=mode) as s:
+        ranked = rank_news(news, _high_impact_index())
+        _, lines, used = pack_lines([(n, f"- {clean_title(n.title)}") for n in ranked], budget, max_items)
+        s.set(items=len(lines), tokens=used)
+    log_info(f"🧮 Prompt 预算 [{mode}]: 新闻 {len(lines)}/{len(news)} 条，约 {used}/{budget} tokens")
+    return "\n".join(lines)
+
+def _log_prompt_tokens(mode, prompt):
+    """记录整段 Prompt 的估算 token 数"""
+    log_info(f"🧮 Prompt 总量 [{mode}]: 约 {estimate_tokens(prompt)} tokens")
+
+def _rank_candidates(candidates, sector_flows, news):
+    """量化预排序：按动量、成交额、行业资金、新闻热度打分"""
+    with span("rank.candidates", items=len(candidates)):
+        ranked = score_candidates(build_features(candidates, sector_flows, news))
+    top_txt = "、".join(f"{r['name']}({r['score']:+.2f})" for r in ranked[:settings.RANK_TOP_N])
+    log_info(f"🧮 量化预排序: 候选 {len(ranked)} 只，前{settings.RANK_TOP_N}: {top_txt}")
+    return ranked
+
+def _quant_pick(ranked):
+    """第一名明显领先时直接给出选股结果（与 AI 输出同格式），否则返回 None"""
+    top = dominant_pick(ranked[:settings.RANK_TOP_N])
+    if top is None:
+        return None
+    log_info(f"⚡ {top['name']} 量化得分明显领先，跳过 AI 调用")
+    return json.dumps({
+        "name": top['name'],
+        "code": top['code'],
+        "reason": f"量化排名第一且明显领先：{format_features(top)}"
+    }, ensure_ascii=False)
+
+def _build_recommend_prompt(ranked, news):
+    """组装选股 Prompt（只送入量化排名前几名及其因子）"""
+    candidates_str = "\n".join(
+        f"- {r['name']} (代码:{r['code']}, 行业:{r['industry'] or '未知'}) {format_features(r)}"
+        for r in ranked[:settings.RANK_TOP_N]
+    )
+    news_txt = _build_news_txt(news, "recommend", load_prompts(), max_items=15)
+
+    return (
+        "你是极其理性的量化交易员。请从下方的【候选股票列表】（已按量化综合分排序）中，挑选唯一一只最符合当前市场热点和新闻面的股票。\n\n"
+        f"【候选股票列表】:\n{candidates_str}\n\n"
+        f"【近期新闻】:\n{news_txt}\n\n"
+        "要求：\n1. 必须从候选列表中选一只，绝对禁止捏造。\n"
+        "2. 输出 JSON 格式：{\"name\": \"股票名\", \"code\": \"6位代码\", \"reason\": \"简短理由\"}"
+    )
+
+def run_recommend(use_async=False):
     """【选股模式】AI 基于热点选股"""
-    log_info("启动：AI 选股推荐")
-    
+    log_info(f"启动：AI 选股推荐{' (async)' if use_async else ''}")
+    started = time.perf_counter()
+
+    if use_async:
+        import asyncio
+        asyncio.run(_run_recommend_async())
+    else:
+        _run_recommend_sync()
+
+    log_info(f"⏱️ 选股流程耗时 {time.perf_counter() - started:.2f}s")
+
+def _run_recommend_sync():
+    """同步流程：依次获取候选池、新闻、行业资金，量化预排序后再交给 AI，最后验真"""
     # 1. 获取市场活跃股 (候选池)
-    candidates = get_hot_stocks_data()
+    candidates = get_hot_stocks_data(settings.RECOMMEND_POOL_SIZE)
     if not candidates:
         log_error("❌ 无法获取市场活跃股，选股中止")
         return
     
-    candidates_str = "\n".join([f"- {s['name']} (代码:{s['code']}, 涨幅:{s['pct']}, 成交:{s['amount']})" for s in candidates])
-    
-    # 2. 获取新闻背景
+    # 2. 获取新闻背景与行业资金
     news = get_news(720) # 过去12小时
-    news_txt = "\n".join([f"- {n['title']}" for n in news[:15]])
-    
-    # 3. 组装 Prompt
-    base_prompt = (
-        "你是极其理性的量化交易员。请从下方的【候选股票列表】中，挑选唯一一只最符合当前市场热点和新闻面的股票。\n\n"
-        f"【候选股票列表】:\n{candidates_str}\n\n"
-        f"【近期新闻】:\n{news_txt}\n\n"
-        "要求：\n1. 必须从候选列表中选一只，绝对禁止捏造。\n"
-        "2. 输出 JSON 格式：{\"name\": \"股票名\", \"code\": \"6位代码\", \"reason\": \"简短理由\"}"
+    sector_flows = get_sector_flows()
+
+    # 3. 量化预排序；第一名明显领先时不再调用 AI
+    ranked = _rank_candidates(candidates, sector_flows, news)
+    content = _quant_pick(ranked)
+    used_ai = content is None
+
+    if used_ai:
+        # 4. 组装 Prompt 并调用 AI (低温度，保证理性)
+        base_prompt = _build_recommend_prompt(ranked, news)
+        _log_prompt_tokens("recommend", base_prompt)
+        content = get_ai_response(base_prompt, temperature=0.1, mode="recommend")
+        if not content: return
+
+    _finish_recommend(content, {}, ranked, used_ai)
+
+async def _run_recommend_async():
+    """异步流程：候选池、新闻、行业资金并发抓取，AI 思考期间预取候选股行情"""
+    import asyncio
+
+    candidates, news, sector_flows = await asyncio.gather(
+        asyncio.to_thread(get_hot_stocks_data, settings.RECOMMEND_POOL_SIZE),
+        asyncio.to_thread(get_news, 720),
+        asyncio.to_thread(get_sector_flows)
     )
-    
-    # 4. 调用 AI (低温度，保证理性)
-    content = get_ai_response(base_prompt, temperature=0.1)
+    if not candidates:
+        log_error("❌ 无法获取市场活跃股，选股中止")
+        return
+
+    ranked = _rank_candidates(candidates, sector_flows, news)
+    content = _quant_pick(ranked)
+    if content is not None:
+        _finish_recommend(content, {}, ranked, used_ai=False)
+        return
+
+    base_prompt = _build_recommend_prompt(ranked, news)
+    _log_prompt_tokens("recommend", base_prompt)
+
+    # AI 调用期间顺手把候选股行情取回来，验真时直接命中
+    top_codes = [r['code'] for r in ranked[:settings.RANK_TOP_N]]
+    prefetch = asyncio.create_task(asyncio.to_thread(get_stock_quotes, top_codes))
+    content = await asyncio.to_thread(get_ai_response, base_prompt, temperature=0.1, mode="recommend")
+    prefetched_quotes = await prefetch
     if not content: return
 
+    _finish_recommend(content, prefetched_quotes, ranked, used_ai=True)
+
+def _finish_recommend(content, prefetched_quotes, ranked, used_ai):
+    """
+    解析 AI 输出、验真并保存选股结果
+    :param prefetched_quotes: 已预取的行情 {code: quote}，未命中时再联网查询
+    :param ranked: 量化排名结果，随选股一起存档供回测
+    :param used_ai: 本次是否调用了 AI
+    """
     # 5. 解析并验证
     try:
         json_match = re.search(r'\{.*\}', content, re.DOTALL)
@@ -57,7 +187,8 @@ def run_recommend():
         pick_data = json.loads(json_match.group())
         
         # 二次验真：确保代码存在且能获取行情
-        real_quote = get_stock_quote(pick_data['code'])
+        code = str(pick_data['code'])
+        real_quote = prefetched_quotes.get(code) or get_stock_quotes([code]).get(code)
         if not real_quote:
             log_error(f"❌ 防幻觉拦截：AI 推荐了不存在的股票代码 {pick_data['code']}")
             return
@@ -66,150 +197,255 @@ def run_recommend():
         with open(settings.PICK_FILE, "w", encoding="utf-8") as f:
             json.dump(pick_data, f, ensure_ascii=False, indent=2)
             
-        # === ✨ 新增：追加到历史战绩表 (CSV) ===
+        # === ✨ 新增：追加到历史战绩表 ===
+        today_str = datetime.now(settings.SHA_TZ).strftime("%Y-%m-%d")
         try:
-            today_str = datetime.now(settings.SHA_TZ).strftime("%Y-%m-%d")
-            file_exists = os.path.isfile(settings.HISTORY_FILE)
-            
-            with open(settings.HISTORY_FILE, "a", newline='', encoding="utf-8") as f:
-                writer = csv.writer(f)
-                # 如果是新文件，先写表头
-                if not file_exists:
-                    writer.writerow(["Date", "Name", "Code", "Start_Price", "Reason"])
-                
-                # 写入今日记录
-                writer.writerow([
-                    today_str, 
-                    pick_data['name'], 
-                    pick_data['code'], 
-                    real_quote['price'], 
-                    pick_data['reason'].replace("\n", " ")
-                ])
+            HistoryStore().append(
+                today_str,
+                pick_data['name'],
+                pick_data['code'],
+                real_quote['price'],
+                pick_data['reason']
+            )
             log_info(f"✅ 已计入历史战绩: {pick_data['name']}")
         except Exception as e:
             log_error(f"❌ 历史记录写入失败: {e}")
         # ========================================
+        save_ranking(today_str, ranked, code, used_ai)
 
-        send_tg(f"<b>🎯 今日AI精选 (Pro版)</b>\n\n🦄 <b>{pick_data['name']} ({pick_data['code']})</b>\n当前价: {real_quote['price']}\n\n📝 <b>逻辑：</b>\n{pick_data['reason']}")
+        send_tg(f"<b>🎯 今日{'AI' if used_ai else '量化'}精选 (Pro版)</b>\n\n🦄 <b>{pick_data['name']} ({pick_data['code']})</b>\n当前价: {real_quote['price']}\n\n📝 <b>逻辑：</b>\n{pick_data['reason']}")
         log_info(f"✅ 选股完成: {pick_data['name']}")
         
     except Exception as e:
         log_error(f"❌ 选股结果解析失败: {e}")
 
-def run_track():
-    """【追踪模式】跟踪已选股票"""
-    log_info("启动：个股追踪")
-    
-    if not os.path.exists(settings.PICK_FILE):
-        log_info("⚠️ 没有找到今日选股记录，跳过追踪")
-        return
-        
-    try:
+def _track_rules(prompts):
+    """读取追踪触发规则：prompts.json 的 track_rules 覆盖默认配置"""
+    rules = dict(settings.DEFAULT_TRACK_RULES)
+    rules.update(prompts.get("track_rules") or {})
+    return rules
+
+def _tracked_picks(max_codes):
+    """
+    需要追踪的股票：今日选股优先，再补最近的历史选股（按代码去重）
+    :return: [{"code", "name", "start_price", "date"}]，date 为最近一次推荐日期，历史中查不到时为 None
+    """
+    picks = {}
+    if os.path.exists(settings.PICK_FILE):
         with open(settings.PICK_FILE, "r", encoding="utf-8") as f:
             pick_data = json.load(f)
-        
-        quote = get_stock_quote(pick_data['code'])
-        if not quote: return
+        picks[str(pick_data['code'])] = {"code": str(pick_data['code']), "name": pick_data['name'], "start_price": None, "date": None}
 
-        raw_pct = quote.get('pct', '-')
-        pct_num = None
-        try:
-            pct_num = float(str(raw_pct).replace('%', '').strip())
-        except (ValueError, TypeError):
-            pct_num = None
+    try:
+        rows = HistoryStore().tail(max_codes * 3)
+    except Exception as e:
+        log_error(f"⚠️ 读取历史选股失败: {e}")
+        rows = []
+    for row in reversed(rows):  # 新 -> 旧
+        code = str(row['Code'])
+        pick = picks.get(code)
+        if pick is None and len(picks) < max_codes:
+            pick = picks[code] = {"code": code, "name": row['Name'], "start_price": None, "date": None}
+        if pick is not None and pick["start_price"] is None:
+            pick["start_price"] = row['Start_Price']
+            pick["date"] = row['Date']
+    return list(picks.values())
+
+def _pick_date_text(date, today):
+    """推荐日期的口语化写法：今天 / 2026-02-13 / 近期（日期未知）"""
+    if not date:
+        return "近期"
+    return "今天" if date == today else date
 
-        pct_for_prompt = f"{pct_num:.2f}" if pct_num is not None else str(raw_pct).replace('%', '').strip()
-        pct_text = f"{pct_num:.2f}%" if pct_num is not None else str(raw_pct)
+def run_track():
+    """【追踪模式】跟踪已选股票：本地规则判断后，只有触发时才调用 AI"""
+    log_info("启动：个股追踪")
 
+    try:
         prompts = load_prompts()
-        track_prompt = prompts.get("track", settings.DEFAULT_PROMPTS["track"]).format(
-            name=pick_data['name'], code=pick_data['code'], price=quote['price'], pct=pct_for_prompt
-        )
-
-        analysis = get_ai_response(track_prompt)
-        if not analysis: return
-
-        icon = "🔴" if pct_num is not None and pct_num > 0 else "🟢" if pct_num is not None else "⚪️"
-        send_tg(f"<b>👀 选股跟踪: {pick_data['name']}</b>\n\n{icon} 现价: {quote['price']} ({pct_text})\n\n🧠 <b>AI观点：</b>\n{analysis}")
-        
-    except Exception as e:
-        log_error(f"❌ 追踪执行失败: {e}")
-
-def run_analysis(mode):
-    """【通用模式】处理早报、资金、监控等"""
-    log_info(f"启动：通用分析模式 [{mode}]")
-    prompts = load_prompts()
-    
-    if mode == "funds":
-        top_in, top_out = get_market_funds()
-        if not top_in: return
-        in_str = "\n".join([f"- {s['name']}: {s['flow']}亿 ({s['change']})" for s in top_in])
-        out_str = "\n".join([f"- {s['name']}: {s['flow']}亿 ({s['change']})" for s in top_out])
-        
-        prompt = prompts["funds"].format(in_str=in_str, out_str=out_str)
-        content = get_ai_response(prompt)
-        if content:
-            send_tg(f"<b>💰 主力资金雷达</b>\n\n{content}")
+        rules = _track_rules(prompts)
+        picks = _tracked_picks(rules["max_codes"])
+        if not picks:
+            log_info("⚠️ 没有找到选股记录，跳过追踪")
+            return
 
-    elif mode == "daily":
-        news = get_news(1440) # 24小时
-        if not news: return
-        news_txt = "\n".join([f"- {n['title']}" for n in news[:30]])
-        
-        prompt = prompts["daily"].format(news_txt=news_txt)
-        content = get_ai_response(prompt)
-        if content:
-            send_tg(f"<b>🌅 股市全景内参</b>\n\n{content}")
+        quotes = get_stock_quotes([p['code'] for p in picks])
+        state = load_track_state()
+        today = datetime.now(settings.SHA_TZ).strftime("%Y-%m-%d")
 
-    elif mode == "monitor":
-        news = get_news(90) # 1.5小时，给强信号留一点缓冲
-        now = datetime.now(settings.SHA_TZ)
-
-        # “不那么灵敏，但又有点灵敏”：
-        # - 普通新闻只看最近15分钟
-        # - 强关键词新闻放宽到30分钟
-        strict_threshold = now - timedelta(minutes=15)
-        soft_threshold = now - timedelta(minutes=30)
-        high_impact_keywords = [
-            "涨停", "跌停", "停牌", "复牌", "业绩", "并购", "重组", "回购", "增持", "减持",
-            "政策", "降息", "加息", "关税", "制裁", "突发", "北向", "主力", "龙头", "算力", "芯片", "AI"
-        ]
-
-        fresh_news = []
-        for n in news:
-            if n['datetime'] >= strict_threshold:
-                fresh_news.append(n)
+        triggered, quiet = [], []
+        for pick in picks:
+            quote = quotes.get(pick['code'])
+            if not quote:
                 continue
+            reasons, state[pick['code']] = evaluate(pick, quote, state.get(pick['code']), rules, today)
+            (triggered if reasons else quiet).append((pick, quote, reasons))
+        save_track_state(state)
+        log_info(f"🎯 追踪 {len(picks)} 只，规则触发 {len(triggered)} 只")
 
-            if n['datetime'] >= soft_threshold:
-                text_blob = f"{n['title']} {n['digest']}"
-                if any(k in text_blob for k in high_impact_keywords):
-                    fresh_news.append(n)
-
-        if not fresh_news:
-            log_info("暂无最新重要快讯")
-            return
-
-        # 去重+限流，避免雷达过于敏感
-        dedup_news = []
-        seen_titles = set()
-        for n in fresh_news:
-            title_key = n['title'].strip()
-            if title_key in seen_titles:
-                continue
-            seen_titles.add(title_key)
-            dedup_news.append(n)
+        # 触发的股票先增量同步日K线（已缓存时每只只请求最新几根），走势描述才不会是"暂无"
+        if triggered:
+            try:
+                sync_codes([p['code'] for p, _, _ in triggered])
+            except Exception as e:
+                log_error(f"⚠️ K线同步失败: {e}，走势按本地已有数据生成")
+
+        # 触发的股票并发请求 AI 点评，附上归档里该股最近的相关快讯
+        template = prompts.get("track", settings.DEFAULT_PROMPTS["track"])
+        related = stock_news([(p['code'], p['name']) for p, _, _ in triggered])
+        calls = []
+        for pick, quote, reasons in triggered:
+            prompt = template.format(
+                name=pick['name'], code=pick['code'], price=quote['price'], pct=_pct_text(quote, percent=False),
+                trend=trend_summary(pick['code']), date=_pick_date_text(pick.get('date'), today)
+            )
+            prompt += f"\n\n触发提醒：{'；'.join(reasons)}"
+            if related.get(pick['code']):
+                prompt += "\n\n近期相关快讯：\n" + _related_news_txt(related[pick['code']])
+            calls.append({"prompt_text": prompt, "mode": "track"})
+        analyses = get_ai_responses(calls)
+
+        for (pick, quote, reasons), analysis in zip(triggered, analyses):
+            msg = (
+                f"<b>👀 选股跟踪: {pick['name']}</b>\n\n{_pct_icon(quote)} 现价: {quote['price']} ({_pct_text(quote)})\n"
+                f"⚡ <b>触发：</b>{'；'.join(reasons)}"
+            )
+            if analysis:
+                msg += f"\n\n🧠 <b>AI观点：</b>\n{analysis}"
+            send_tg(msg)
+
+        # 没有触发的股票：合并成一条模板简报，不调用 AI
+        if quiet and rules.get("quiet_update"):
+            lines = []
+            for pick, quote, _ in quiet:
+                line = f"{_pct_icon(quote)} {pick['name']} {quote['price']} ({_pct_text(quote)})"
+                try:
+                    line += f"，较推荐价 {(float(quote['price']) / float(pick['start_price']) - 1) * 100:+.2f}%"
+                except (TypeError, ValueError, ZeroDivisionError):
+                    pass
+                lines.append(line)
+            send_tg("<b>👀 选股跟踪简报</b>\n\n" + "\n".join(lines))
 
-        news_titles = [f"{i}. {n['title']} (详情:{n['digest'][:60]})" for i, n in enumerate(dedup_news[:12])]
-        prompt = prompts["monitor"].format(news_list="\n".join(news_titles))
+    except Exception as e:
+        log_error(f"❌ 追踪执行失败: {e}")
 
-        content = get_ai_response(prompt)
-        if not content:
-            return
+def _related_news_txt(news):
+    """归档快讯 -> 带日期的列表文本（跨天，所以比当日快讯多显示月-日）"""
+    return "\n".join(f"- {n.datetime.strftime('%m-%d %H:%M')} {n.title}" for n in news)
 
-        # 解析 ALERT 格式，最多推送3条，控制噪音
-        alerts_buffer = []
-        for line in content.split("\n"):
+def _pct_value(quote):
+    try:
+        return float(str(quote.get('pct', '-')).replace('%', '').strip())
+    except (ValueError, TypeError):
+        return None
+
+def _pct_text(quote, percent=True):
+    """涨跌幅文本：能解析时保留两位小数；percent=False 时不带 % (用于 Prompt 模板)"""
+    pct = _pct_value(quote)
+    raw = str(quote.get('pct', '-'))
+    if pct is None:
+        return raw if percent else raw.replace('%', '').strip()
+    return f"{pct:.2f}%" if percent else f"{pct:.2f}"
+
+def _pct_icon(quote):
+    pct = _pct_value(quote)
+    return "🔴" if pct is not None and pct > 0 else "🟢" if pct is not None else "⚪️"
+
+def run_sync_klines():
+    """【K线模式】增量同步历史选股与当前热门股的日K线"""
+    log_info("启动：日K线增量同步")
+    hot_codes = [s['code'] for s in get_hot_stocks_data()]
+    sync_codes(tracked_codes(hot_codes))
+
+class MonitorState:
+    """
+    监控模式跨轮次复用的状态：提示词、关键词索引、已推送事件指纹
+    cron 模式每次新建；常驻模式 (serve) 在进程内一直保留
+    """
+
+    def __init__(self, prompts=None):
+        self.prompts = prompts or load_prompts()
+        self.keyword_index = _high_impact_index()
+        self.alerted_store = FingerprintStore()
+
+def _stream_lines(chunks):
+    """把流式回复片段拼成完整的行逐行产出（末尾没有换行的一行在结束时产出）"""
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split("\n")
+        yield from lines
+    if buffer:
+        yield buffer
+
+def run_monitor(state):
+    """
+    【监控模式】执行一轮快讯扫描，返回推送的提醒条数
+    快讯游标只在本轮处理完（含推送成功）后推进；AI 或推送失败时保持不动，下一轮重新处理
+    """
+    mode = "monitor"
+    # 1.5小时，给强信号留一点缓冲；增量模式只返回上次运行之后的新快讯
+    news = get_news(90, incremental=True)
+    if not news:
+        log_info("没有新快讯，跳过 AI 分析")
+        commit_news_cursor()
+        return 0
+    now = datetime.now(settings.SHA_TZ)
+
+    # “不那么灵敏，但又有点灵敏”：
+    # - 普通新闻只看最近15分钟
+    # - 强关键词新闻放宽到30分钟
+    strict_threshold = now - timedelta(minutes=15)
+    soft_threshold = now - timedelta(minutes=30)
+    keyword_index = state.keyword_index
+
+    fresh_news = []
+    for n in news:
+        if n.datetime < soft_threshold:
+            continue
+
+        hits = keyword_index.match(f"{n.title} {n.digest}")
+        if n.datetime >= strict_threshold or hits:
+            fresh_news.append((n, hits))
+
+    if not fresh_news:
+        log_info("暂无最新重要快讯")
+        commit_news_cursor()
+        return 0
+
+    # 按命中关键词数量排序（同分按时间新旧），再做近似去重+限流，避免雷达过于敏感
+    fresh_news.sort(key=lambda x: (len(x[1]), x[0].datetime), reverse=True)
+
+    # 同一事件的不同措辞归为一簇，只保留排名最高的一条；上一轮已推送过的事件直接抑制
+    alerted_store = state.alerted_store
+    clusters = cluster(fresh_news, key=lambda x: x[0].title)
+    dedup_news = [c[0] for c in clusters if not alerted_store.contains(c[0][0].title)]
+    log_info(f"🧹 近似去重：{len(fresh_news)} 条 -> {len(clusters)} 个事件，其中 {len(clusters) - len(dedup_news)} 个已推送过")
+
+    if not dedup_news:
+        log_info("新快讯均为已推送事件的重复报道")
+        commit_news_cursor()
+        return 0
+
+    # 在 token 预算内按优先级装入快讯，序号与最终列表一一对应
+    budget = _token_budget(state.prompts, mode)
+    entries = []
+    for n, hits in dedup_news:
+        tag = f" [关键词:{'/'.join(hits)}]" if hits else ""
+        entries.append((n, f"{clean_title(n.title)}{tag} (详情:{n.digest[:60]})"))
+    dedup_news, lines, used = pack_lines(entries, budget, max_items=12)
+    log_info(f"🧮 Prompt 预算 [{mode}]: 快讯 {len(lines)}/{len(entries)} 条，约 {used}/{budget} tokens")
+
+    news_titles = [f"{i}. {line}" for i, line in enumerate(lines)]
+    prompt = state.prompts["monitor"].format(news_list="\n".join(news_titles))
+    _log_prompt_tokens(mode, prompt)
+
+    # 流式接收，逐行解析 ALERT 格式；最多推送3条，控制噪音，凑满即停止接收剩余回复
+    alerts_buffer = []
+    received = False
+    with span("llm.stream", mode=mode) as s:
+        for line in _stream_lines(stream_ai_response(prompt, mode=mode)):
+            received = True
             if "ALERT|" not in line:
                 continue
 
@@ -221,33 +457,109 @@ def run_analysis(mode):
                 idx = int(re.sub(r"\D", "", parts[1]))
                 if idx < len(dedup_news):
                     t = dedup_news[idx]
-                    alerts_buffer.append(f"💡 <b>逻辑</b>：{parts[2]}\n📰 <a href='{t['link']}'>{t['title']}</a> ({t['time_str']})")
+                    alerted_store.add(t.title)
+                    alerts_buffer.append(f"💡 <b>逻辑</b>：{parts[2]}\n📰 <a href='{t.link}'>{t.title}</a> ({t.time_str})")
             except (ValueError, TypeError):
                 continue
 
             if len(alerts_buffer) >= 3:
                 break
+        s.set(items=len(alerts_buffer))
+    if not received:
+        return 0
+
+    if alerts_buffer:
+        failed_before = get_tg_stats()["failed"]
+        send_tg("<b>🎯 机会雷达汇总</b>\n\n" + "\n\n〰️〰️〰️〰️〰️\n\n".join(alerts_buffer))
+        # 等本轮提醒发出后再推进游标和事件指纹
+        if not flush_notifications() or get_tg_stats()["failed"] > failed_before:
+            log_error("❌ 提醒推送失败，快讯游标保持不变，下一轮重新处理")
+            return 0
+        alerted_store.save()
+    commit_news_cursor()
+    return len(alerts_buffer)
+
+def _funds_line(sector, dynamics):
+    """板块资金行；有上一次快照时附上期间变化"""
+    line = f"- {sector['name']}: {sector['flow']}亿 ({sector['change']})"
+    item = dynamics["by_code"].get(sector.get('code') or sector['name'])
+    if item:
+        line += f"，{dynamics['minutes']}分钟内 {item['delta']:+.2f}亿"
+    return line
+
+def _funds_dynamics_txt(dynamics):
+    """盘中加速流入 / 加速流出板块；不足两次快照时返回空串"""
+    # 有三次快照时只列速度与加速度同号的板块，只有两次时按速度正负列出
+    accel = dynamics["accelerated"]
+    label = "加速" if accel else "持续"
+
+    def fmt(x):
+        line = f"- {x['name']}: 净流入 {x['flow']:.2f}亿，速度 {x['rate']:+.2f}亿/小时"
+        return line + (f"，加速度 {x['accel']:+.2f}亿/小时²" if accel else "")
+
+    if not dynamics["inflow"] and not dynamics["outflow"]:
+        return ""
+    txt = f"\n\n盘中资金动向（对比最近几次快照，间隔约{dynamics['minutes']}分钟）："
+    if dynamics["inflow"]:
+        txt += f"\n{label}流入：\n" + "\n".join(fmt(x) for x in dynamics["inflow"])
+    if dynamics["outflow"]:
+        txt += f"\n{label}流出：\n" + "\n".join(fmt(x) for x in dynamics["outflow"])
+    return txt
+
+def run_analysis(mode):
+    """【通用模式】处理早报、资金、监控等"""
+    log_info(f"启动：通用分析模式 [{mode}]")
+    prompts = load_prompts()
+    
+    if mode == "funds":
+        sectors = get_sector_flows()
+        if not sectors: return
+        top_in, top_out = split_top_flows(sectors)
+        # 追加到当日时序，只用最近几次快照计算变化速度与加速度
+        dynamics = record_and_analyze(sectors, time.time(), datetime.now(settings.SHA_TZ).strftime("%Y-%m-%d"))
+        in_str = "\n".join(_funds_line(s, dynamics) for s in top_in)
+        out_str = "\n".join(_funds_line(s, dynamics) for s in top_out)
+        
+        prompt = prompts["funds"].format(in_str=in_str, out_str=out_str) + _funds_dynamics_txt(dynamics)
+        content = get_ai_response(prompt, mode=mode)
+        if content:
+            send_tg(f"<b>💰 主力资金雷达</b>\n\n{content}")
+
+    elif mode == "daily":
+        news = get_news(1440) # 24小时
+        if not news: return
+        news_txt = _build_news_txt(news, mode, prompts, max_items=30)
+        
+        prompt = prompts["daily"].format(news_txt=news_txt)
+        _log_prompt_tokens(mode, prompt)
+        content = get_ai_response(prompt, mode=mode)
+        if content:
+            send_tg(f"<b>🌅 股市全景内参</b>\n\n{content}")
 
-        if alerts_buffer:
-            send_tg("<b>🎯 机会雷达汇总</b>\n\n" + "\n\n〰️〰️〰️〰️〰️\n\n".join(alerts_buffer))
+    elif mode == "monitor":
+        run_monitor(MonitorState(prompts))
 
     elif mode in ["periodic", "after_market"]:
         news = get_news(240) # 4小时
         if not news: return
-        news_txt = "\n".join([f"- {n['title']}" for n in news[:25]])
+        news_txt = _build_news_txt(news, mode, prompts, max_items=25)
         
         prompt = prompts.get(mode, settings.DEFAULT_PROMPTS[mode]).format(news_txt=news_txt)
+        _log_prompt_tokens(mode, prompt)
         title = "🌇 每日复盘" if mode == "after_market" else "🍵 盘中茶歇"
         
-        content = get_ai_response(prompt)
+        content = get_ai_response(prompt, mode=mode)
         if content:
             send_tg(f"<b>{title}</b>\n\n{content}")
 
-def run_review():
-    """【复盘模式】统计历史战绩与胜率"""
+def run_review(window=None):
+    """
+    【复盘模式】统计历史战绩与胜率
+    :param window: 统计最近多少次选股，"all" 表示全部历史，默认 settings.REVIEW_WINDOW
+    """
     log_info("启动：历史战绩复盘")
     
-    if not os.path.exists(settings.HISTORY_FILE):
+    if not os.path.exists(settings.HISTORY_DB) and not os.path.exists(settings.HISTORY_FILE):
         log_info("⚠️ 暂无历史记录")
         return
 
@@ -257,14 +569,16 @@ def run_review():
     details = []
 
     try:
-        # 读取历史记录
-        rows = []
-        with open(settings.HISTORY_FILE, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
-        
-        # 只取最近 10 次选股进行展示，防止消息过长
-        recent_rows = rows[-10:] if len(rows) > 10 else rows
+        # 读取历史记录：只从库尾读取所需窗口
+        store = HistoryStore()
+        window = window or settings.REVIEW_WINDOW
+        if window == "all":
+            recent_rows = store.all()
+        else:
+            recent_rows = store.tail(int(window))
+
+        # 一次性批量拉取所有代码的最新行情（自动去重）
+        quotes = get_stock_quotes([row['Code'] for row in recent_rows])
         
         for row in recent_rows:
             code = row['Code']
@@ -273,8 +587,7 @@ def run_review():
             except:
                 continue
             
-            # 获取最新行情
-            curr_quote = get_stock_quote(code)
+            curr_quote = quotes.get(code)
             if not curr_quote: continue
             
             try:
@@ -300,13 +613,38 @@ def run_review():
         win_rate = (win_count / total_count) * 100
         avg_profit = total_profit / total_count
 
+        # 基于日K线的整段历史绩效（前瞻收益、回撤、分主题表现）
+        stats_txt = ""
+        try:
+            closes = get_daily_closes([row['Code'] for row in recent_rows])
+            keyword_index = _high_impact_index()
+            stats = compute_review_stats(recent_rows, closes, settings.REVIEW_FORWARD_DAYS, tagger=keyword_index.match)
+            if stats:
+                stats_txt = format_review_stats(stats) + "\n"
+        except Exception as e:
+            log_error(f"⚠️ 绩效分析失败: {e}")
+
+        # 明细只列最近几条，防止消息过长
+        shown = details[-settings.REVIEW_MAX_DETAILS:]
         msg = (
             f"<b>📊 AI 战绩周报 (近{total_count}次)</b>\n\n"
             f"🏆 <b>胜率: {win_rate:.0f}%</b>\n"
             f"💰 <b>平均收益: {avg_profit:+.2f}%</b>\n"
+            f"{stats_txt}"
             f"------------------\n" +
-            "\n".join(details)
+            "\n".join(shown)
         )
+
+        # 最近几只选股各附一条归档里的最新相关快讯
+        recent_stocks = list({row['Code']: row['Name'] for row in recent_rows[-settings.REVIEW_MAX_DETAILS:]}.items())
+        related = stock_news(recent_stocks, limit=1)
+        news_lines = []
+        for code, name in recent_stocks:
+            if related.get(code):
+                n = related[code][0]
+                news_lines.append(f"📰 <b>{name}</b> <a href='{n.link}'>{n.title}</a> ({n.datetime.strftime('%m-%d %H:%M')})")
+        if news_lines:
+            msg += "\n------------------\n" + "\n".join(news_lines)
         
         send_tg(msg)
         
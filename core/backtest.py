@@ -0,0 +1,75 @@
+from config import settings
+from utils.notifier import log_info, log_error
+from core.history_store import HistoryStore
+from core.kline_store import get_daily_closes
+from core.review_stats import compute_review_stats
+from core.candidate_ranker import score_candidates, load_rankings
+
+
+def _pick_row(date_str, code, price, reason=""):
+    """构造与历史记录同格式的行，便于复用 compute_review_stats"""
+    return {"Date": date_str, "Code": str(code), "Start_Price": price, "Reason": reason}
+
+
+def build_backtest_rows(history_rows, rankings, weights=None):
+    """
+    生成各策略的"选股记录"
+    - history: history.csv 中的实际选股
+    - quant: 用当前权重对每次排名快照重新打分后的第一名
+    - pool: 候选池等权（基准）
+    :return: {策略名: [row, ...]}，以及量化第一名与实际选股一致的次数
+    """
+    strategies = {"history": list(history_rows), "quant": [], "pool": []}
+    agree = 0
+    for record in rankings:
+        candidates = [dict(c) for c in record.get("candidates") or []]
+        if not candidates:
+            continue
+        ranked = score_candidates(candidates, weights)
+        top = ranked[0]
+        strategies["quant"].append(_pick_row(record["date"], top["code"], top.get("price")))
+        strategies["pool"].extend(_pick_row(record["date"], c["code"], c.get("price")) for c in candidates)
+        if top["code"] == str(record.get("pick")):
+            agree += 1
+    return strategies, agree
+
+
+def _format_line(label, stats):
+    if not stats:
+        return f"{label}: 暂无可用数据"
+    parts = [f"T+{n} {v['mean'] * 100:+.2f}% (胜率{v['win_rate'] * 100:.0f}%, {v['count']}次)" for n, v in sorted(stats["forward"].items())]
+    return f"{label}: {' | '.join(parts) or '尚无走完的前瞻区间'}"
+
+
+def run_backtest(weights=None):
+    """
+    【回测模式】比较实际选股、量化第一名与候选池等权的前瞻收益
+    :param weights: 因子权重，默认 settings.RANK_WEIGHTS；可用来试验新的权重组合
+    :return: {策略名: 指标字典或 None}
+    """
+    log_info("启动：选股策略回测")
+    weights = weights or settings.RANK_WEIGHTS
+
+    try:
+        history_rows = HistoryStore().all()
+    except Exception as e:
+        log_error(f"❌ 历史记录读取失败: {e}")
+        history_rows = []
+    rankings = load_rankings()
+    if not history_rows and not rankings:
+        log_info("⚠️ 暂无历史记录与排名快照，无法回测")
+        return {}
+
+    strategies, agree = build_backtest_rows(history_rows, rankings, weights)
+    codes = [row["Code"] for rows in strategies.values() for row in rows]
+    closes = get_daily_closes(codes)
+
+    labels = {"history": "实际选股", "quant": "量化第一名", "pool": "候选池等权"}
+    results = {}
+    log_info(f"📐 回测权重: {weights} | 历史选股 {len(history_rows)} 次，排名快照 {len(rankings)} 份")
+    for name, rows in strategies.items():
+        results[name] = compute_review_stats(rows, closes, settings.REVIEW_FORWARD_DAYS)
+        log_info(_format_line(labels[name], results[name]))
+    if rankings:
+        log_info(f"🤝 量化第一名与实际选股一致 {agree}/{len(rankings)} 次")
+    return results
@@ -0,0 +1,126 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from config import settings
+from utils.notifier import log_info, log_error, flush_notifications
+from utils.http_client import get_stats
+from utils.ai_client import get_ai_stats
+from utils import fixtures
+from core.data_fetcher import clear_news_snapshot
+from core.market_snapshot import clear_market_snapshot
+
+# 每个模式都在独立的临时目录里运行，互不影响，也不改动仓库里的真实状态文件
+_STATE_PATHS = ("NEWS_CURSOR_FILE", "NEWS_FINGERPRINT_FILE", "TRACK_STATE_FILE", "AI_CACHE_FILE", "KLINE_DIR", "FUNDS_DIR", "NEWS_ARCHIVE_DB", "HISTORY_DB")
+_COPIED_FILES = ("PICK_FILE", "HISTORY_FILE", "RANKING_FILE")
+
+
+def _isolate_state(workdir):
+    """把状态文件指向临时目录，并复制选股/历史记录作为初始数据"""
+    for name in _STATE_PATHS:
+        setattr(settings, name, os.path.join(workdir, os.path.basename(getattr(settings, name))))
+    for name in _COPIED_FILES:
+        src = getattr(settings, name)
+        dst = os.path.join(workdir, os.path.basename(src))
+        if os.path.exists(src):
+            shutil.copy(src, dst)
+        setattr(settings, name, dst)
+
+
+def _measure(runner):
+    """运行一个模式并采集 墙钟 / CPU / 网络 / AI / 推送 各阶段指标"""
+    http_before = get_stats()
+    ai_before = get_ai_stats()
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+
+    error = None
+    try:
+        runner()
+    except Exception as e:
+        error = str(e)
+    run_wall = time.perf_counter() - wall_started
+
+    notify_started = time.perf_counter()
+    flush_notifications()
+    notify_wall = time.perf_counter() - notify_started
+
+    http_after = get_stats()
+    ai_after = get_ai_stats()
+    return {
+        "wall": run_wall + notify_wall,
+        "cpu": time.process_time() - cpu_started,
+        "http_calls": http_after["requests"] - http_before["requests"],
+        "bytes": http_after["bytes"] - http_before["bytes"],
+        "ai_calls": ai_after["calls"] - ai_before["calls"],
+        "ai_wall": ai_after["seconds"] - ai_before["seconds"],
+        "notify_wall": notify_wall,
+        "error": error,
+    }
+
+
+def _format_row(mode, m, baseline=None):
+    line = (
+        f"{mode:<13} 墙钟 {m['wall']:6.2f}s | CPU {m['cpu']:5.2f}s | HTTP {m['http_calls']:3d} 次 "
+        f"{m['bytes'] / 1024:8.1f}KB | AI {m['ai_calls']} 次 {m['ai_wall']:5.2f}s | 推送 {m['notify_wall']:4.2f}s"
+    )
+    if baseline and baseline.get("wall"):
+        line += f" | 相对基线 {(m['wall'] / baseline['wall'] - 1) * 100:+.0f}%"
+    if m["error"]:
+        line += f" | ❌ {m['error']}"
+    return line
+
+
+def run_benchmark(runners, modes=None, save_baseline=False):
+    """
+    【基准模式】离线回放夹具，逐个模式端到端运行并汇报各阶段开销
+    :param runners: {模式名: 无参可调用对象}
+    :param modes: 要测的模式，默认 settings.BENCH_MODES
+    :param save_baseline: True 时把本次结果写为新的基线
+    :return: {模式名: 指标字典}
+    """
+    modes = modes or settings.BENCH_MODES
+    if not os.path.exists(settings.FIXTURE_DIR):
+        log_error(f"❌ 夹具目录不存在: {settings.FIXTURE_DIR}，请先以 FIXTURE_MODE=record 运行各模式录制")
+        return {}
+
+    # 强制回放：不联网、不用 AI 缓存；Token 只需非空即可通过配置检查
+    settings.FIXTURE_MODE = "replay"
+    settings.AI_CACHE_ENABLED = False
+    settings.DEEPSEEK_API_KEY = settings.DEEPSEEK_API_KEY or "replay"
+    settings.TG_BOT_TOKEN = settings.TG_BOT_TOKEN or "replay"
+    settings.TG_CHAT_ID = settings.TG_CHAT_ID or "replay"
+    fixtures.reset_replay()
+
+    baseline = {}
+    if os.path.exists(settings.BENCH_BASELINE_FILE):
+        with open(settings.BENCH_BASELINE_FILE, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    originals = {name: getattr(settings, name) for name in _STATE_PATHS + _COPIED_FILES}
+    results = {}
+    log_info(f"🏁 离线基准：{len(modes)} 个模式，夹具 {settings.FIXTURE_DIR}")
+    try:
+        for mode in modes:
+            if mode not in runners:
+                log_error(f"❌ 不支持的基准模式: {mode}")
+                continue
+            with tempfile.TemporaryDirectory() as workdir:
+                for name, value in originals.items():
+                    setattr(settings, name, value)
+                _isolate_state(workdir)
+                clear_news_snapshot()
+                clear_market_snapshot()
+                results[mode] = _measure(runners[mode])
+            log_info(_format_row(mode, results[mode], baseline.get(mode)))
+    finally:
+        for name, value in originals.items():
+            setattr(settings, name, value)
+
+    if save_baseline and results:
+        os.makedirs(os.path.dirname(settings.BENCH_BASELINE_FILE), exist_ok=True)
+        with open(settings.BENCH_BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        log_info(f"💾 已保存基线: {settings.BENCH_BASELINE_FILE}")
+    return results
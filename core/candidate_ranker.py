@@ -0,0 +1,127 @@
+import json
+import math
+import os
+from config import settings
+from utils.notifier import log_error
+from core.keyword_index import KeywordIndex
+
+# 因子 -> 中文说明（用于 Prompt 与推送理由）
+FEATURE_LABELS = {
+    "momentum": "涨幅(%)",
+    "turnover": "成交额(亿)",
+    "sector_flow": "所属行业净流入(亿)",
+    "news": "新闻提及(次)",
+}
+
+
+def _to_float(text, suffix=""):
+    """'3.2%' / '12.5亿' -> float，无法解析返回 0"""
+    try:
+        return float(str(text).rstrip(suffix))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def build_features(candidates, sector_flows, news):
+    """
+    为候选股计算量化因子
+    :param candidates: get_hot_stocks_data 的结果
+    :param sector_flows: get_sector_flows 的结果
+    :param news: NewsItem 列表
+    :return: [{"code", "name", "industry", "price", "features": {...}}]
+    """
+    flow_by_sector = {s['name']: s['flow'] for s in sector_flows}
+
+    # 用股票名建关键词索引，一遍扫描统计每条新闻提到了哪些候选股
+    name_index = KeywordIndex(c['name'] for c in candidates)
+    mentions = {}
+    for n in news:
+        for name in name_index.match(f"{n.title} {n.digest}"):
+            mentions[name] = mentions.get(name, 0) + 1
+
+    rows = []
+    for c in candidates:
+        rows.append({
+            "code": str(c['code']),
+            "name": c['name'],
+            "industry": c.get('industry') or '',
+            "price": c.get('price'),
+            "features": {
+                "momentum": _to_float(c['pct'], "%"),
+                "turnover": _to_float(c['amount'], "亿"),
+                "sector_flow": flow_by_sector.get(c.get('industry'), 0.0),
+                "news": mentions.get(c['name'], 0),
+            },
+        })
+    return rows
+
+
+def score_candidates(rows, weights=None):
+    """
+    各因子在候选池内做 z 分数标准化后加权求和，按得分降序返回（同分按代码排序，结果可复现）
+    会在每行写入 "score"
+    """
+    weights = weights or settings.RANK_WEIGHTS
+    for row in rows:
+        row["score"] = 0.0
+    for name, weight in weights.items():
+        values = [row["features"].get(name, 0.0) for row in rows]
+        if len(values) < 2:
+            continue
+        mean = sum(values) / len(values)
+        std = math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+        if std == 0:
+            continue
+        for row, v in zip(rows, values):
+            row["score"] += weight * (v - mean) / std
+    return sorted(rows, key=lambda r: (-r["score"], r["code"]))
+
+
+def dominant_pick(ranked, gap=None):
+    """第一名领先第二名超过 gap 分时返回第一名，否则返回 None"""
+    gap = settings.RANK_DOMINANCE_GAP if gap is None else gap
+    if len(ranked) == 1 or (len(ranked) >= 2 and ranked[0]["score"] - ranked[1]["score"] >= gap):
+        return ranked[0]
+    return None
+
+
+def format_features(row):
+    """单只候选股的因子描述"""
+    f = row["features"]
+    industry = row["industry"] or "未知行业"
+    return (
+        f"涨幅 {f['momentum']:+.2f}%，成交 {f['turnover']:.1f}亿，"
+        f"{industry}净流入 {f['sector_flow']:+.2f}亿，新闻提及 {f['news']} 次，综合分 {row['score']:+.2f}"
+    )
+
+
+def save_ranking(date_str, ranked, pick_code, used_ai):
+    """把本次排名快照追加到 RANKING_FILE，供回测复用"""
+    record = {
+        "date": date_str,
+        "pick": str(pick_code),
+        "used_ai": used_ai,
+        "candidates": [
+            {k: row[k] for k in ("code", "name", "industry", "price", "features", "score")}
+            for row in ranked
+        ],
+    }
+    try:
+        with open(settings.RANKING_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except Exception as e:
+        log_error(f"⚠️ 排名快照写入失败: {e}")
+
+
+def load_rankings():
+    """读取全部排名快照，损坏的行跳过"""
+    records = []
+    if not os.path.exists(settings.RANKING_FILE):
+        return records
+    with open(settings.RANKING_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
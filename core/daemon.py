@@ -0,0 +1,92 @@
+import asyncio
+import signal
+import time
+from config import settings
+from utils.notifier import log_info, log_error
+from core.analyzer import MonitorState, run_monitor
+
+
+class MonitorDaemon:
+    """
+    常驻监控：单进程内按固定间隔轮询快讯
+    - 关键词索引、已推送指纹、HTTP/AI 客户端都留在内存里，不再每轮冷启动
+    - 收到 SIGINT/SIGTERM 后等当前一轮结束再退出
+    - clock/sleep/cycle 均可注入，便于用假时钟和桩函数驱动测试
+    """
+
+    def __init__(self, interval=None, heartbeat_interval=None, clock=time.monotonic, sleep=None, cycle=None):
+        self.interval = interval or settings.SERVE_INTERVAL
+        self.heartbeat_interval = heartbeat_interval or settings.SERVE_HEARTBEAT
+        self.clock = clock
+        self._sleep = sleep
+        self._cycle = cycle or run_monitor
+        self._stop = None
+        self.state = None
+        self.cycles = 0
+        self.alerts = 0
+        self.errors = 0
+
+    def stop(self):
+        """请求停止（可在信号处理或其他协程中调用）"""
+        if self._stop is not None:
+            self._stop.set()
+
+    def _install_signal_handlers(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                # Windows 或非主线程下不支持，退化为 Ctrl+C 直接中断
+                pass
+
+    async def _wait(self, seconds):
+        """等待下一轮；收到停止信号时立即返回"""
+        if self._sleep is not None:
+            await self._sleep(seconds)
+            return
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    def _heartbeat(self, started):
+        uptime = int(self.clock() - started)
+        log_info(f"💓 常驻监控心跳 | 运行 {uptime}s | 轮次 {self.cycles} | 推送 {self.alerts} | 异常 {self.errors}")
+
+    async def run(self, max_cycles=None):
+        """主循环；max_cycles 用于测试时限定轮数"""
+        self._stop = asyncio.Event()
+        self._install_signal_handlers()
+        if self.state is None:
+            self.state = MonitorState()
+
+        started = last_beat = self.clock()
+        log_info(f"🛰️ 常驻监控启动 | 轮询间隔 {self.interval}s")
+
+        while not self._stop.is_set():
+            cycle_started = self.clock()
+            try:
+                sent = await asyncio.to_thread(self._cycle, self.state)
+                self.alerts += sent or 0
+            except Exception as e:
+                self.errors += 1
+                log_error(f"❌ 监控轮次执行失败: {e}")
+            self.cycles += 1
+
+            now = self.clock()
+            if now - last_beat >= self.heartbeat_interval:
+                self._heartbeat(started)
+                last_beat = now
+
+            if max_cycles and self.cycles >= max_cycles:
+                break
+            await self._wait(max(self.interval - (now - cycle_started), 0))
+
+        self._heartbeat(started)
+        log_info("🛑 常驻监控已停止")
+
+
+def run_daemon():
+    """【常驻模式】启动常驻监控，直到收到退出信号"""
+    asyncio.run(MonitorDaemon().run())
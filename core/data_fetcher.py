@@ -1,82 +1,198 @@
-import requests
 import json
-import re
+import os
+import threading
 import time
 import datetime
-import random
+import heapq
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 from config import settings
 from utils.notifier import log_error, log_info
+from utils.http_client import http_get
+from utils.tracing import span, traced
+from core.news_item import normalize, item_id, NewsSnapshot
+from core.news_archive import archive_news
+from core.market_snapshot import get_market_snapshot, peek_market_snapshot, fetch_market_top
 
-def get_random_header():
-    """生成随机请求头，伪装成浏览器"""
-    return {
-        "User-Agent": random.choice(settings.USER_AGENTS),
-        "Referer": "https://eastmoney.com/"
+# 最近一次 get_news 的解析统计 (parsed: 实际解析的条数, skipped: 因已读/过期跳过的条数)
+last_news_stats = {"parsed": 0, "skipped": 0}
+
+# 增量抓取看到、但还没提交到游标的原始快讯 (见 commit_news_cursor)
+_pending_cursor = None
+
+# 进程内快讯快照：有效期内各回溯窗口都从这里切片，不再重复抓取
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def _fetch_news_page(size, page):
+    """抓取一页快讯原始列表 (LivesList)"""
+    timestamp = int(time.time() * 1000)
+    url = f"{settings.URL_NEWS_PAGE.format(size=size, page=page)}?_={timestamp}"
+    resp = http_get(url, timeout=15)
+    content = resp.text.strip()
+
+    # 东方财富返回的是非标准JSON，需要截取
+    start_idx = content.find('{')
+    end_idx = content.rfind('}')
+    if start_idx == -1 or end_idx == -1:
+        return []
+    data = json.loads(content[start_idx : end_idx + 1])
+    return data.get('LivesList', []) or []
+
+
+def _load_news_cursor():
+    """读取已读游标：{"showtime": 最新已处理时间, "ids": [该秒内已处理的 id]}"""
+    try:
+        if os.path.exists(settings.NEWS_CURSOR_FILE):
+            with open(settings.NEWS_CURSOR_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+    except Exception as e:
+        log_error(f"⚠️ 快讯游标读取失败: {e}，将全量处理")
+    return None
+
+
+def _save_news_cursor(items):
+    """以本次看到的最新一秒内的快讯作为新的游标"""
+    newest = max((item.get('showtime') or '') for item in items)
+    if not newest:
+        return
+    cursor = {
+        "showtime": newest,
+        "ids": [item_id(item) for item in items if item.get('showtime') == newest]
     }
+    try:
+        with open(settings.NEWS_CURSOR_FILE, "w", encoding="utf-8") as f:
+            json.dump(cursor, f, ensure_ascii=False)
+    except Exception as e:
+        log_error(f"⚠️ 快讯游标写入失败: {e}")
+
+
+def commit_news_cursor():
+    """
+    把最近一次增量抓取看到的快讯写入游标
+    调用方在本轮处理、推送成功后才调用，失败时游标不动，下一轮会重新拿到这批快讯
+    """
+    global _pending_cursor
+    items, _pending_cursor = _pending_cursor, None
+    if items:
+        _save_news_cursor(items)
+
+
+def _is_seen(item, cursor):
+    """判断快讯是否在游标之前（已处理过）"""
+    if not cursor:
+        return False
+    show_time_str = item.get('showtime') or ''
+    if show_time_str != cursor.get('showtime'):
+        return show_time_str < cursor.get('showtime', '')
+    return item_id(item) in cursor.get('ids', [])
+
 
-def get_news(minutes_lookback=None):
+def get_news_snapshot(max_age=None):
+    """
+    获取进程内共享的快讯快照，超过有效期才重新抓取（并发调用只抓一次）
+    :param max_age: 有效期秒数，默认 settings.NEWS_SNAPSHOT_TTL；0 表示强制刷新
+    """
+    global _snapshot
+    ttl = settings.NEWS_SNAPSHOT_TTL if max_age is None else max_age
+    with _snapshot_lock:
+        now = time.monotonic()
+        if _snapshot is None or now - _snapshot.fetched_at >= ttl:
+            raw_items = _fetch_news_page(settings.NEWS_MAX_ITEMS, 1)
+            with span("parse.news", items=len(raw_items)):
+                items = [n for n in map(normalize, raw_items) if n is not None]
+                _snapshot = NewsSnapshot(items, len(raw_items), now)
+            archive_news(items)
+        return _snapshot
+
+
+def clear_news_snapshot():
+    """丢弃进程内的快讯快照，下次 get_news 重新抓取"""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
+
+
+@traced("fetch.news")
+def get_news(minutes_lookback=None, incremental=False):
     """
     抓取财经快讯
     :param minutes_lookback: 回溯多少分钟内的新闻，None表示24小时
+    :param incremental: 增量模式，只返回游标之后的新快讯，并按需翻页
     """
-    timestamp = int(time.time() * 1000)
-    url = f"{settings.URL_NEWS}?_={timestamp}"
-    
+    now = datetime.datetime.now(settings.SHA_TZ)
+    # 默认回溯24小时
+    delta = timedelta(minutes=minutes_lookback if minutes_lookback else 1440)
+    time_threshold = now - delta
+
     try:
-        resp = requests.get(url, headers=get_random_header(), timeout=15)
-        content = resp.text.strip()
-        
-        # 东方财富返回的是非标准JSON，需要截取
-        start_idx = content.find('{')
-        end_idx = content.rfind('}')
-        if start_idx != -1 and end_idx != -1:
-            data = json.loads(content[start_idx : end_idx + 1])
-        else:
-            return []
-        
-        items = data.get('LivesList', [])
-        valid_news = []
-        now = datetime.datetime.now(settings.SHA_TZ)
-        # 默认回溯24小时
-        delta = timedelta(minutes=minutes_lookback if minutes_lookback else 1440)
-        time_threshold = now - delta
-        
-        for item in items:
-            # 时间解析与过滤
-            show_time_str = item.get('showtime')
-            try:
-                news_time = datetime.datetime.strptime(show_time_str, "%Y-%m-%d %H:%M:%S").replace(tzinfo=settings.SHA_TZ)
-            except:
-                continue
-            
-            if news_time < time_threshold:
-                continue
-            
-            # 内容清洗
-            digest = item.get('digest', '')
-            title = item.get('title', '')
-            if len(title) < 5: 
-                title = digest[:50] + "..." if len(digest) > 50 else digest
-            
-            # 去除HTML标签
-            title = re.sub(r'<[^>]+>', '', title)
-            link = item.get('url_unique') or "https://kuaixun.eastmoney.com/"
-            
-            valid_news.append({
-                "title": title, 
-                "digest": re.sub(r'<[^>]+>', '', digest), 
-                "link": link, 
-                "time_str": news_time.strftime('%H:%M'),
-                "datetime": news_time 
-            })
+        if incremental:
+            return _get_news_incremental(time_threshold)
+
+        snapshot = get_news_snapshot()
+        valid_news = snapshot.since(time_threshold)
+        last_news_stats.update(parsed=snapshot.raw_count, skipped=snapshot.raw_count - len(valid_news))
         return valid_news
     except Exception as e:
         log_error(f"❌ 新闻抓取失败: {e}")
         return []
 
-def get_market_funds():
-    """抓取行业资金流向"""
+
+def _get_news_incremental(time_threshold):
+    """
+    增量抓取：快讯按时间倒序返回，遇到已读或过期条目即停止解析，
+    整页都是新内容时才继续翻下一页
+    游标不在这里推进，由调用方处理完后调用 commit_news_cursor
+    """
+    global _pending_cursor
+    _pending_cursor = None
+    cursor = _load_news_cursor()
+    page_size = settings.NEWS_PAGE_SIZE
+    max_pages = max(settings.NEWS_MAX_ITEMS // page_size, 1)
+
+    valid_news = []
+    seen_items = []
+    parsed = 0
+    skipped = 0
+    for page in range(1, max_pages + 1):
+        items = _fetch_news_page(page_size, page)
+        seen_items.extend(items)
+
+        reached_end = len(items) < page_size
+        for idx, item in enumerate(items):
+            if _is_seen(item, cursor):
+                skipped += len(items) - idx
+                reached_end = True
+                break
+
+            parsed += 1
+            news = normalize(item)
+            if news is None:
+                continue
+            if news.datetime < time_threshold:
+                skipped += len(items) - idx
+                reached_end = True
+                break
+            valid_news.append(news)
+
+        if reached_end:
+            break
+
+    _pending_cursor = seen_items
+    archive_news(valid_news)
+
+    last_news_stats.update(parsed=parsed, skipped=skipped)
+    log_info(f"📰 增量快讯：解析 {parsed} 条，跳过 {skipped} 条，新增 {len(valid_news)} 条")
+    return valid_news
+
+
+@traced("fetch.sector_flows")
+def get_sector_flows():
+    """
+    抓取全部行业板块的资金流向
+    :return: [{"code", "name", "change", "flow"(亿元)}]，保持接口原顺序；失败返回 []
+    """
     params = {
         "pn": "1", "pz": "200", "po": "1", "np": "1", 
         "ut": "bd1d9ddb04089700cf9c27f6f7426281",
@@ -84,42 +200,59 @@ def get_market_funds():
         "fields": "f12,f14,f2,f3,f62" 
     }
     try:
-        resp = requests.get(settings.URL_FUNDS, headers=get_random_header(), params=params, timeout=10)
+        resp = http_get(settings.URL_FUNDS, params=params, timeout=10)
         data = resp.json().get('data', {}).get('diff', [])
         sectors = []
         for item in data:
             flow = item.get('f62', 0)
             if flow is None: flow = 0
             sectors.append({
+                "code": item.get('f12', ''),
                 "name": item.get('f14', '未知'),
                 "change": f"{item.get('f3', 0)}%",
                 "flow": round(flow / 100000000, 2)
             })
-        # 按资金流向排序
-        sectors.sort(key=lambda x: x['flow'], reverse=True)
-        return sectors[:8], sectors[-8:] # 返回前8和后8
+        return sectors
     except Exception as e:
         log_error(f"❌ 资金流向获取失败: {e}")
-        return [], []
+        return []
 
-def get_hot_stocks_data():
-    """抓取成交额前20的热门股"""
-    params = {
-        "pn": "1", "pz": "20", "po": "1", "np": "1", 
-        "fltt": "2", "invt": "2", "fid": "f6", # 按成交额排序
-        "fs": "m:0+t:6,m:0+t:80", # 沪深A股
-        "fields": "f12,f14,f3,f6" 
-    }
+def split_top_flows(sectors, k=None):
+    """
+    从板块资金中选出净流入前 k 和后 k（堆选 top-k，不做全量排序）
+    :return: (净流入从高到低, 净流入最少的 k 个按从高到低排列)，与原先排序后切片的顺序一致
+    """
+    k = k or settings.FUNDS_TOP_K
+    top_in = heapq.nlargest(k, sectors, key=lambda x: x['flow'])
+    top_out = heapq.nsmallest(k, sectors, key=lambda x: x['flow'])[::-1]
+    return top_in, top_out
+
+def get_market_funds():
+    """抓取行业资金流向，返回净流入前 k 和后 k"""
+    return split_top_flows(get_sector_flows())
+
+@traced("fetch.hot_stocks")
+def get_hot_stocks_data(n=20, by="amount"):
+    """
+    选出热门股（默认成交额前20）
+    - 已有有效的全市场快照时直接在内存中选，不再请求
+    - 否则只请求一页接口排好序的排行榜；综合评分 score 需要全市场数据，才拉取全市场快照
+    :param by: 排序列 amount / pct / flow / score
+    """
     try:
-        resp = requests.get(settings.URL_FUNDS, headers=get_random_header(), params=params, timeout=10)
-        data = resp.json().get('data', {}).get('diff', [])
+        snapshot = peek_market_snapshot()
+        if snapshot is None:
+            snapshot = get_market_snapshot() if by == "score" else fetch_market_top(n, by)
         stock_list = []
-        for item in data:
+        for i in snapshot.top(n, by=by):
+            row = snapshot.row(i)
             stock_list.append({
-                "name": item['f14'],
-                "code": item['f12'],
-                "pct": f"{item['f3']}%",
-                "amount": f"{round(item['f6']/100000000, 1)}亿"
+                "name": row['name'],
+                "code": row['code'],
+                "pct": f"{row['pct']}%",
+                "amount": f"{round(row['amount']/100000000, 1)}亿",
+                "price": row['price'],
+                "industry": row['industry']
             })
         return stock_list
     except Exception as e:
@@ -127,7 +260,6 @@ def get_hot_stocks_data():
         return []
 
 
-
 def _normalize_eastmoney_decimal(raw_value, scale=100, digits=2):
     """将东方财富常见的放大整数行情字段还原为小数文本。"""
     if raw_value in (None, '-', ''):
@@ -140,13 +272,17 @@ def _normalize_eastmoney_decimal(raw_value, scale=100, digits=2):
         return str(raw_value)
 
 
+def _to_secid(code):
+    """简单的市场判断：6开头是沪市(1)，其他认为是深市(0)"""
+    return f"1.{code}" if str(code).startswith("6") else f"0.{code}"
+
+
 def get_stock_quote(code):
     """抓取单只股票行情"""
-    # 简单的市场判断：6开头是沪市(1)，其他认为是深市(0)
-    sec_id = f"1.{code}" if str(code).startswith("6") else f"0.{code}"
+    sec_id = _to_secid(code)
     url = f"{settings.URL_QUOTE}?secid={sec_id}&fields=f43,f170,f14"
     try:
-        resp = requests.get(url, headers=get_random_header(), timeout=5)
+        resp = http_get(url, timeout=5)
         data = resp.json().get('data', {})
         if not data: return None
         return {
@@ -159,3 +295,105 @@ def get_stock_quote(code):
     except Exception as e:
         log_error(f"❌ 个股行情获取失败 [{code}]: {e}")
         return None
+
+
+def _fetch_quote_batch(codes):
+    """用一次 ulist 请求抓取一批股票行情，返回 {code: quote}"""
+    params = {
+        "fltt": "2", "invt": "2",  # fltt=2 直接返回小数，无需再做放大还原
+        "secids": ",".join(_to_secid(c) for c in codes),
+        "fields": "f12,f14,f2,f3"
+    }
+    resp = http_get(settings.URL_QUOTES, params=params, timeout=5)
+    data = (resp.json().get('data') or {}).get('diff') or []
+    # diff 在部分接口版本中是以序号为键的字典
+    if isinstance(data, dict):
+        data = list(data.values())
+
+    quotes = {}
+    for item in data:
+        code = str(item.get('f12', ''))
+        if not code:
+            continue
+        quotes[code] = {
+            "name": item.get('f14', '未知'),
+            "price": _normalize_eastmoney_decimal(item.get('f2'), scale=1, digits=2),
+            "pct": _normalize_eastmoney_decimal(item.get('f3'), scale=1, digits=2)
+        }
+    return quotes
+
+
+@traced("fetch.quotes")
+def get_stock_quotes(codes):
+    """
+    批量抓取股票行情
+    :param codes: 股票代码列表，允许重复（会自动去重）
+    :return: {code: {"name", "price", "pct"}}，取不到行情的代码不会出现在结果中
+    """
+    # 去重但保持原顺序
+    unique_codes = list(dict.fromkeys(str(c).strip() for c in codes if c))
+    if not unique_codes:
+        return {}
+
+    # 优先使用全市场快照：已有有效快照直接查表；代码很多时拉一次快照比逐批请求更省
+    snapshot = peek_market_snapshot()
+    if snapshot is None and len(unique_codes) >= settings.MARKET_SNAPSHOT_MIN_CODES:
+        try:
+            snapshot = get_market_snapshot()
+        except Exception as e:
+            log_error(f"⚠️ 全市场快照获取失败: {e}，改为批量查询")
+
+    quotes = {}
+    if snapshot is not None:
+        for code in unique_codes:
+            quote = snapshot.quote(code)
+            if quote:
+                quotes[code] = quote
+
+    pending = [c for c in unique_codes if c not in quotes]
+    size = settings.QUOTE_BATCH_SIZE
+    for i in range(0, len(pending), size):
+        chunk = pending[i:i + size]
+        try:
+            quotes.update(_fetch_quote_batch(chunk))
+        except Exception as e:
+            log_error(f"❌ 批量行情获取失败 ({len(chunk)}只): {e}，降级为逐只查询")
+
+    # 批量接口缺失的代码，用有限并发逐只补齐
+    missing = [c for c in unique_codes if c not in quotes]
+    if missing:
+        workers = min(settings.QUOTE_MAX_WORKERS, len(missing))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for code, quote in zip(missing, pool.map(get_stock_quote, missing)):
+                if quote:
+                    quotes[code] = quote
+    return quotes
+
+
+@traced("fetch.kline")
+def get_daily_klines(code, beg="19900101"):
+    """
+    抓取日K线（不复权，与历史记录里的买入价口径一致）
+    :param beg: 起始日期 YYYYMMDD（含）
+    :return: [(日期 YYYY-MM-DD, 开, 收, 高, 低, 成交量), ...]，按日期升序；失败返回 None
+    """
+    params = {
+        "secid": _to_secid(code),
+        "fields1": "f1,f2,f3",
+        "fields2": "f51,f52,f53,f54,f55,f56",
+        "klt": "101", "fqt": "0",
+        "beg": beg, "end": "20500101"
+    }
+    try:
+        resp = http_get(settings.URL_KLINE, params=params, timeout=10)
+        data = resp.json().get('data') or {}
+        bars = []
+        for line in data.get('klines') or []:
+            parts = line.split(",")
+            if len(parts) < 6:
+                continue
+            bars.append((parts[0], float(parts[1]), float(parts[2]), float(parts[3]), float(parts[4]), float(parts[5])))
+        return bars
+    except Exception as e:
+        log_error(f"❌ 日K线获取失败 [{code}]: {e}")
+        return None
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from config import settings
+from utils.notifier import log_error
+
+# MinHash 签名长度与 LSH 分段：64 个哈希拆成 32 段、每段 2 行
+# 相似度约 0.2 以上的两条文本大概率落入同一个桶，再用签名估算的 Jaccard 精确判定
+NUM_PERM = 64
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+
+# 固定种子生成哈希族，保证指纹跨进程、跨运行可比较
+_rng = random.Random(20240213)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+# 去掉【…】标签、标点和空白，只保留正文字符参与计算
+_TAG_PREFIX_RE = re.compile(r'【[^】]*】')
+_NOISE_RE = re.compile(r'[\s\W_]+', re.UNICODE)
+
+
+def shingles(text, k=2):
+    """字符级 k-gram 集合，中文无需分词"""
+    text = _NOISE_RE.sub('', _TAG_PREFIX_RE.sub('', text or '')).lower()
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def minhash(text):
+    """计算文本的 MinHash 签名 (长度 NUM_PERM 的整数元组)"""
+    # 内置 hash 每次进程启动都会随机化，持久化场景必须用稳定哈希
+    base = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+        for s in shingles(text)
+    ]
+    if not base:
+        return tuple([_PRIME] * NUM_PERM)
+    return tuple(min((a * h + b) % _PRIME for h in base) for a, b in _PERMS)
+
+
+_EVENT_CODE_RE = re.compile(r'(?<!\d)\d{6}(?!\d)')
+_COMPANY_RE = re.compile(r'[\u4e00-\u9fff]{2}(?:%s)' % "|".join(map(re.escape, settings.DEDUP_COMPANY_SUFFIXES)))
+
+
+def event_key(text):
+    """
+    事件要素：股票代码、指数、公司简称与方向词的集合
+    MinHash 只衡量字面相似度，两条快讯还必须要素完全一致才算同一事件
+    """
+    text = _TAG_PREFIX_RE.sub('', text or '')
+    key = {f"c:{code}" for code in _EVENT_CODE_RE.findall(text)}
+    key.update(f"i:{canonical}" for name, canonical in settings.DEDUP_INDEX_NAMES.items() if name in text)
+    key.update(f"e:{name}" for name in _COMPANY_RE.findall(text))
+    key.update(f"p:{term}" for term in settings.DEDUP_POLARITY_TERMS if term in text)
+    return frozenset(key)
+
+
+def similarity(sig_a, sig_b):
+    """用签名估算两段文本的 Jaccard 相似度"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def _bands(signature):
+    """签名拆段，返回 (段序号, 段值) 作为 LSH 桶键"""
+    return [(i, signature[i * ROWS:(i + 1) * ROWS]) for i in range(BANDS)]
+
+
+class MinHashIndex:
+    """MinHash-LSH 索引：查询只比较同桶候选，整体接近线性"""
+
+    def __init__(self, threshold=None):
+        self.threshold = settings.DEDUP_SIMILARITY if threshold is None else threshold
+        self._buckets = {}
+
+    def add(self, signature, payload=None, event=None):
+        """:param event: 事件要素 (event_key)，查询时只与要素相同的条目比较"""
+        entry = (signature, payload, event)
+        for key in _bands(signature):
+            self._buckets.setdefault(key, []).append(entry)
+
+    def find(self, signature, event=None):
+        """返回第一个要素相同且相似的签名对应的 payload（未设置 payload 时返回签名），没有则返回 None"""
+        checked = set()
+        for key in _bands(signature):
+            for entry in self._buckets.get(key, ()):
+                if id(entry) in checked:
+                    continue
+                checked.add(id(entry))
+                other, payload, other_event = entry
+                if other_event == event and similarity(signature, other) >= self.threshold:
+                    return payload if payload is not None else other
+        return None
+
+
+def cluster(items, key=lambda x: x):
+    """
+    近似重复聚类：按输入顺序贪心归簇，每簇第一个元素作为代表
+    :param key: 取出参与计算的文本
+    :return: [[代表, 相似项...], ...]
+    """
+    index = MinHashIndex()
+    clusters = []
+    for item in items:
+        text = key(item)
+        signature, event = minhash(text), event_key(text)
+        hit = index.find(signature, event)
+        if hit is not None:
+            clusters[hit].append(item)
+            continue
+        index.add(signature, len(clusters), event)
+        clusters.append([item])
+    return clusters
+
+
+class FingerprintStore:
+    """跨运行持久化的已推送事件签名，用于抑制上一轮已经报过的事件"""
+
+    def __init__(self, path=None, ttl_hours=None):
+        self.path = path or settings.NEWS_FINGERPRINT_FILE
+        self.ttl = (settings.DEDUP_TTL_HOURS if ttl_hours is None else ttl_hours) * 3600
+        self._entries = []
+        self._index = MinHashIndex()
+        self._oldest = None
+        self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+                cutoff = time.time() - self.ttl
+                for entry in raw:
+                    # 旧版文件没有事件要素，无法做要素比对，直接丢弃（最多影响一个 TTL 周期）
+                    if entry["ts"] >= cutoff and len(entry["sig"]) == NUM_PERM and "event" in entry:
+                        self._remember(tuple(entry["sig"]), entry["ts"], frozenset(entry["event"]))
+        except Exception as e:
+            log_error(f"⚠️ 新闻指纹文件读取失败: {e}")
+
+    def _remember(self, signature, ts, event):
+        self._entries.append((signature, ts, event))
+        self._index.add(signature, event=event)
+        if self._oldest is None or ts < self._oldest:
+            self._oldest = ts
+
+    def _prune(self):
+        """
+        淘汰超过 TTL 的指纹并重建索引
+        常驻进程 (serve) 里同一个实例会一直使用，不能只在加载时按 TTL 过滤
+        """
+        cutoff = time.time() - self.ttl
+        if self._oldest is None or self._oldest >= cutoff:
+            return
+        entries = [entry for entry in self._entries if entry[1] >= cutoff]
+        self._entries = []
+        self._index = MinHashIndex()
+        self._oldest = None
+        for entry in entries:
+            self._remember(*entry)
+
+    def contains(self, text):
+        """是否与已推送的事件近似重复（字面相似且事件要素相同）"""
+        self._prune()
+        return self._index.find(minhash(text), event_key(text)) is not None
+
+    def add(self, text, ts=None):
+        self._prune()
+        self._remember(minhash(text), ts or time.time(), event_key(text))
+
+    def save(self):
+        self._prune()
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump([{"sig": list(sig), "ts": ts, "event": sorted(event)} for sig, ts, event in self._entries], f)
+        except Exception as e:
+            log_error(f"⚠️ 新闻指纹文件写入失败: {e}")
@@ -0,0 +1,187 @@
+import heapq
+import json
+import os
+import re
+import shutil
+import threading
+from array import array
+from config import settings
+from utils.notifier import log_error
+
+# 每个交易日一个目录：
+#   sectors.json  板块代码/名称列表，行号即板块索引（只追加）
+#   flows.bin     每次快照追加一个数据块：n 行 (板块索引, 净流入亿元, 涨跌幅%) + 1 行块尾 (时间戳, n, 0)
+# 读取时从文件末尾按块尾倒着定位，只读最近几次快照，不重算历史
+# array('d') 只用来读写定长的二进制记录（紧凑存储），速度与加速度的计算仍是普通 Python 循环
+RECORD_WIDTH = 3
+RECORD_BYTES = RECORD_WIDTH * array('d').itemsize
+
+_DAY_RE = re.compile(r'^\d{8}$')
+
+_lock = threading.Lock()
+
+
+def _day_dir(day):
+    return os.path.join(settings.FUNDS_DIR, day.replace("-", ""))
+
+
+def prune_days(keep=None):
+    """
+    只保留最近 keep 个交易日的目录，删除更早的
+    :return: 删除的目录数
+    """
+    keep = keep or settings.FUNDS_RETENTION_DAYS
+    if not os.path.isdir(settings.FUNDS_DIR):
+        return 0
+    days = sorted(d for d in os.listdir(settings.FUNDS_DIR) if _DAY_RE.match(d))
+    stale = days[:-keep]
+    for d in stale:
+        shutil.rmtree(os.path.join(settings.FUNDS_DIR, d), ignore_errors=True)
+    return len(stale)
+
+
+def _load_sectors(day):
+    path = os.path.join(_day_dir(day), "sectors.json")
+    if not os.path.exists(path):
+        return {"codes": [], "names": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_sectors(day, sectors):
+    with open(os.path.join(_day_dir(day), "sectors.json"), "w", encoding="utf-8") as f:
+        json.dump(sectors, f, ensure_ascii=False)
+
+
+def append_snapshot(rows, timestamp, day):
+    """
+    追加一次板块资金快照
+    :param rows: get_sector_flows 的结果 [{"code", "name", "flow", "change"}]
+    :param timestamp: 快照时间 (epoch 秒)
+    :param day: 交易日 YYYY-MM-DD
+    """
+    with _lock:
+        # 每个交易日第一次写入时顺带清理过期目录
+        if not os.path.isdir(_day_dir(day)):
+            os.makedirs(_day_dir(day), exist_ok=True)
+            prune_days()
+        sectors = _load_sectors(day)
+        index = {code: i for i, code in enumerate(sectors["codes"])}
+
+        block = array('d')
+        for row in rows:
+            code = row.get("code") or row["name"]
+            i = index.get(code)
+            if i is None:
+                i = index[code] = len(sectors["codes"])
+                sectors["codes"].append(code)
+                sectors["names"].append(row["name"])
+            block.extend((i, row["flow"], _pct(row.get("change"))))
+        block.extend((timestamp, len(rows), 0.0))
+
+        _save_sectors(day, sectors)
+        with open(os.path.join(_day_dir(day), "flows.bin"), "ab") as f:
+            f.write(block.tobytes())
+
+
+def _pct(text):
+    try:
+        return float(str(text).rstrip("%"))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def read_recent(day, k=3):
+    """
+    倒序读取最近 k 次快照
+    :return: [(时间戳, {板块索引: 净流入}), ...]，按时间从旧到新
+    """
+    path = os.path.join(_day_dir(day), "flows.bin")
+    if not os.path.exists(path):
+        return []
+    snapshots = []
+    with open(path, "rb") as f:
+        end = os.fstat(f.fileno()).st_size
+        end -= end % RECORD_BYTES
+        while end > 0 and len(snapshots) < k:
+            f.seek(end - RECORD_BYTES)
+            trailer = array('d')
+            trailer.frombytes(f.read(RECORD_BYTES))
+            timestamp, count = trailer[0], int(trailer[1])
+            start = end - (count + 1) * RECORD_BYTES
+            if start < 0:
+                break
+            f.seek(start)
+            block = array('d')
+            block.frombytes(f.read(count * RECORD_BYTES))
+            # 步长切片拆出板块索引列、净流入列（只是取数方式，不是向量化计算）
+            snapshots.append((timestamp, dict(zip(map(int, block[0::RECORD_WIDTH]), block[1::RECORD_WIDTH]))))
+            end = start
+    snapshots.reverse()
+    return snapshots
+
+
+def compute_dynamics(snapshots):
+    """
+    由最近几次快照计算每个板块的净流入变化速度（亿元/小时）与加速度（亿元/小时²）
+    :return: {板块索引: {"flow", "delta", "rate", "accel"}}；不足两次快照时返回 {}
+    """
+    if len(snapshots) < 2:
+        return {}
+    (t1, f1), (t2, f2) = snapshots[-2], snapshots[-1]
+    hours = max((t2 - t1) / 3600, 1e-6)
+    prev = None
+    if len(snapshots) >= 3:
+        t0, f0 = snapshots[-3]
+        prev = (f0, max((t1 - t0) / 3600, 1e-6))
+
+    result = {}
+    for i, flow in f2.items():
+        if i not in f1:
+            continue
+        delta = flow - f1[i]
+        rate = delta / hours
+        accel = None
+        if prev and i in prev[0]:
+            prev_rate = (f1[i] - prev[0][i]) / prev[1]
+            accel = (rate - prev_rate) / hours
+        result[i] = {"flow": flow, "delta": delta, "rate": rate, "accel": accel}
+    return result
+
+
+def record_and_analyze(rows, timestamp, day, k=None):
+    """
+    追加本次快照并返回资金动向
+    :return: {"minutes": 距上次快照分钟数 或 None, "by_code": {板块代码: 动向},
+              "accelerated": 是否有加速度 (至少三次快照), "inflow": [...], "outflow": [...]}
+             每项动向 {"code", "name", "flow", "delta", "rate", "accel"}
+             有加速度时 inflow 为加速流入 (速度>0 且加速度>0)，outflow 为加速流出 (速度<0 且加速度<0)；
+             只有两次快照时按速度正负划分
+    """
+    k = k or settings.FUNDS_ACCEL_TOP_K
+    try:
+        append_snapshot(rows, timestamp, day)
+        snapshots = read_recent(day, 3)
+        sectors = _load_sectors(day)
+    except Exception as e:
+        log_error(f"⚠️ 资金时序存储失败: {e}")
+        return {"minutes": None, "by_code": {}, "accelerated": False, "inflow": [], "outflow": []}
+
+    dynamics = compute_dynamics(snapshots)
+    items = [dict(v, code=sectors["codes"][i], name=sectors["names"][i]) for i, v in dynamics.items()]
+    accelerated = any(x["accel"] is not None for x in items)
+    if accelerated:
+        inflow = [x for x in items if x["accel"] is not None and x["rate"] > 0 and x["accel"] > 0]
+        outflow = [x for x in items if x["accel"] is not None and x["rate"] < 0 and x["accel"] < 0]
+        key = lambda x: x["accel"]
+    else:
+        inflow = [x for x in items if x["rate"] > 0]
+        outflow = [x for x in items if x["rate"] < 0]
+        key = lambda x: x["rate"]
+    return {
+        "minutes": round((snapshots[-1][0] - snapshots[-2][0]) / 60) if len(snapshots) >= 2 else None,
+        "by_code": {x["code"]: x for x in items},
+        "accelerated": accelerated,
+        "inflow": heapq.nlargest(k, inflow, key=key),
+        "outflow": heapq.nsmallest(k, outflow, key=key),
+    }
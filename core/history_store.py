@@ -0,0 +1,135 @@
+import csv
+import os
+import sqlite3
+from config import settings
+from utils.notifier import log_info, log_error
+
+# CSV 表头 (与历史 history.csv 保持一致)
+CSV_FIELDS = ["Date", "Name", "Code", "Start_Price", "Reason"]
+
+
+class HistoryStore:
+    """
+    选股历史存储：SQLite 追加写 + 日期/代码索引
+    - tail(k) 走主键倒序，只读 k 行
+    - range/by_code 走二级索引
+    - history.csv 作为只追加的导出镜像继续保留，方便人工查看和入库
+    """
+
+    def __init__(self, path=None, csv_path=None):
+        self.path = path or settings.HISTORY_DB
+        self.csv_path = csv_path or settings.HISTORY_FILE
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is not None:
+            return self._conn
+
+        self._conn = sqlite3.connect(self.path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS picks ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " date TEXT NOT NULL, name TEXT NOT NULL, code TEXT NOT NULL,"
+            " start_price REAL, reason TEXT);"
+            "CREATE INDEX IF NOT EXISTS idx_picks_date ON picks(date);"
+            "CREATE INDEX IF NOT EXISTS idx_picks_code ON picks(code, date);"
+        )
+        # 首次建库时从旧 CSV 迁移
+        empty = self._conn.execute("SELECT 1 FROM picks LIMIT 1").fetchone() is None
+        if empty and os.path.exists(self.csv_path):
+            self.migrate_from_csv(self.csv_path)
+        return self._conn
+
+    @staticmethod
+    def _to_row(record):
+        """数据库记录 -> 与 CSV 同名字段的字典"""
+        return {
+            "Date": record["date"],
+            "Name": record["name"],
+            "Code": record["code"],
+            "Start_Price": record["start_price"],
+            "Reason": record["reason"],
+        }
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM picks").fetchone()[0]
+
+    def append(self, date, name, code, start_price, reason):
+        """追加一条选股记录（同时追加到 CSV 镜像）"""
+        conn = self._connect()
+        reason = (reason or "").replace("\n", " ")
+        with conn:
+            conn.execute(
+                "INSERT INTO picks (date, name, code, start_price, reason) VALUES (?, ?, ?, ?, ?)",
+                (date, name, str(code), _to_float(start_price), reason)
+            )
+
+        file_exists = os.path.isfile(self.csv_path)
+        with open(self.csv_path, "a", newline='', encoding="utf-8") as f:
+            writer = csv.writer(f)
+            # 如果是新文件，先写表头
+            if not file_exists:
+                writer.writerow(CSV_FIELDS)
+            writer.writerow([date, name, code, start_price, reason])
+
+    def tail(self, k):
+        """最近 k 条记录（按写入顺序，旧 -> 新）"""
+        rows = self._connect().execute(
+            "SELECT * FROM picks ORDER BY id DESC LIMIT ?", (k,)
+        ).fetchall()
+        return [self._to_row(r) for r in reversed(rows)]
+
+    def all(self):
+        rows = self._connect().execute("SELECT * FROM picks ORDER BY id").fetchall()
+        return [self._to_row(r) for r in rows]
+
+    def range(self, start_date=None, end_date=None):
+        """按日期区间查询（含两端，日期格式 YYYY-MM-DD）"""
+        rows = self._connect().execute(
+            "SELECT * FROM picks WHERE date >= ? AND date <= ? ORDER BY date, id",
+            (start_date or "0000-00-00", end_date or "9999-99-99")
+        ).fetchall()
+        return [self._to_row(r) for r in rows]
+
+    def by_code(self, code):
+        rows = self._connect().execute(
+            "SELECT * FROM picks WHERE code = ? ORDER BY date, id", (str(code),)
+        ).fetchall()
+        return [self._to_row(r) for r in rows]
+
+    def codes(self):
+        """历史上出现过的全部代码（去重）"""
+        return [r[0] for r in self._connect().execute("SELECT DISTINCT code FROM picks")]
+
+    def migrate_from_csv(self, csv_path):
+        """把旧版 history.csv 整体导入数据库"""
+        try:
+            with open(csv_path, "r", encoding="utf-8") as f:
+                records = [
+                    (row["Date"], row["Name"], row["Code"], _to_float(row["Start_Price"]), row.get("Reason", ""))
+                    for row in csv.DictReader(f)
+                ]
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO picks (date, name, code, start_price, reason) VALUES (?, ?, ?, ?, ?)",
+                    records
+                )
+            log_info(f"📦 已从 CSV 迁移 {len(records)} 条历史记录")
+        except Exception as e:
+            log_error(f"❌ 历史记录迁移失败: {e}")
+
+    def export_csv(self, path):
+        """完整导出为 CSV"""
+        with open(path, "w", newline='', encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_FIELDS)
+            for row in self._connect().execute("SELECT date, name, code, start_price, reason FROM picks ORDER BY id"):
+                writer.writerow(list(row))
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
@@ -0,0 +1,41 @@
+import re
+
+
+class KeywordIndex:
+    """
+    关键词索引：把关键词表一次性编译成单个正则交替式，一遍扫描找出全部命中词
+    （正则引擎是 C 实现，几百个关键词也只扫描文本一次）
+    """
+
+    def __init__(self, keywords):
+        # 去重、去空，长词优先，保证 "北向资金" 优先于 "北向" 命中
+        self.keywords = sorted({k.strip() for k in keywords if k and k.strip()}, key=len, reverse=True)
+        self._pattern = re.compile("|".join(re.escape(k) for k in self.keywords)) if self.keywords else None
+
+        # 正则交替式不会返回被长词"吞掉"的短词，这里预先记下每个词包含的其他关键词
+        self._contained = {}
+        for i, word in enumerate(self.keywords):
+            inner = [k for k in self.keywords[i + 1:] if k in word]
+            if inner:
+                self._contained[word] = inner
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def match(self, text):
+        """
+        返回文本命中的全部关键词（按首次出现顺序，去重）
+        """
+        if not self._pattern or not text:
+            return []
+
+        hits = {}
+        for word in self._pattern.findall(text):
+            hits.setdefault(word, None)
+            for inner in self._contained.get(word, ()):
+                hits.setdefault(inner, None)
+        return list(hits)
+
+    def matches_any(self, text):
+        """只判断是否命中任意关键词"""
+        return bool(self._pattern and text and self._pattern.search(text))
@@ -0,0 +1,219 @@
+import json
+import mmap
+import os
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from config import settings
+from utils.notifier import log_error, log_info
+from core.data_fetcher import get_daily_klines
+from core.history_store import HistoryStore
+
+# 每根K线按 6 个 double 紧凑存储：日期(YYYYMMDD)、开、收、高、低、成交量
+FIELDS = ("date", "open", "close", "high", "low", "volume")
+RECORD_WIDTH = len(FIELDS)
+RECORD_BYTES = RECORD_WIDTH * array('d').itemsize
+
+# 收盘后（15:30 之后）当天的K线才算走完，之前只在内存里使用，不落盘
+_CLOSE_MINUTE = 15 * 60 + 30
+
+# 已检查记录 {code: 最后一次确认"已是最新完整K线"的日期}
+_CHECKED_FILE = "_checked.json"
+_checked_lock = threading.Lock()
+
+
+def _bin_path(code):
+    return os.path.join(settings.KLINE_DIR, f"{code}.bin")
+
+
+def _date_num(date_str):
+    """'2026-02-13' -> 20260213.0"""
+    return float(date_str.replace("-", ""))
+
+
+def _date_str(date_num):
+    """20260213.0 -> '2026-02-13'"""
+    d = int(date_num)
+    return f"{d // 10000:04d}-{d // 100 % 100:02d}-{d % 100:02d}"
+
+
+def read_bars(code):
+    """
+    通过 mmap 读取某只股票的全部已存K线，按列返回
+    :return: {"date": array('d'), "open": ..., ...}；没有数据时各列为空数组
+    """
+    columns = {name: array('d') for name in FIELDS}
+    path = _bin_path(code)
+    if not os.path.exists(path):
+        return columns
+
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        usable = size - size % RECORD_BYTES
+        if usable == 0:
+            return columns
+        with mmap.mmap(f.fileno(), usable, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm).cast('d')
+            try:
+                for i, name in enumerate(FIELDS):
+                    # 步长切片直接在 C 层按列拷贝
+                    column = view[i::RECORD_WIDTH]
+                    columns[name] = array('d', column)
+                    column.release()
+            finally:
+                view.release()
+    return columns
+
+
+def _last_stored_date(code):
+    """读取文件最后一条记录的日期，不存在返回 None"""
+    path = _bin_path(code)
+    if not os.path.exists(path):
+        return None
+    size = os.path.getsize(path)
+    usable = size - size % RECORD_BYTES
+    if usable == 0:
+        return None
+    with open(path, "rb") as f:
+        f.seek(usable - RECORD_BYTES)
+        record = array('d')
+        record.frombytes(f.read(RECORD_BYTES))
+    return record[0]
+
+
+def _append_bars(code, bars):
+    """把新的完整K线追加到文件末尾"""
+    if not bars:
+        return
+    os.makedirs(settings.KLINE_DIR, exist_ok=True)
+    packed = array('d')
+    for date_str, o, c, h, l, v in bars:
+        packed.extend((_date_num(date_str), o, c, h, l, v))
+    with open(_bin_path(code), "ab") as f:
+        f.write(packed.tobytes())
+
+
+def _load_checked():
+    path = os.path.join(settings.KLINE_DIR, _CHECKED_FILE)
+    try:
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+    except Exception as e:
+        log_error(f"⚠️ K线检查记录读取失败: {e}")
+    return {}
+
+
+def _save_checked(checked):
+    try:
+        os.makedirs(settings.KLINE_DIR, exist_ok=True)
+        with open(os.path.join(settings.KLINE_DIR, _CHECKED_FILE), "w", encoding="utf-8") as f:
+            json.dump(checked, f)
+    except Exception as e:
+        log_error(f"⚠️ K线检查记录写入失败: {e}")
+
+
+def _sync_one(code, today, market_closed):
+    """
+    增量同步一只股票：只请求最后一根已存K线之后的数据
+    :return: 当天尚未走完的K线（只在内存中使用），没有则为 None
+    """
+    last = _last_stored_date(code)
+    beg = "19900101"
+    if last is not None:
+        # 从最后一根已存K线当天开始请求（直接 +1 会得到 20260132 这类非法日期），重叠的那根由下面的 > last 过滤掉
+        beg = str(int(last))
+
+    bars = get_daily_klines(code, beg=beg)
+    if bars is None:
+        return None, False
+
+    complete = [b for b in bars if b[0] < today or (b[0] == today and market_closed)]
+    if last is not None:
+        complete = [b for b in complete if _date_num(b[0]) > last]
+    _append_bars(code, complete)
+
+    partial = next((b for b in bars if b[0] == today and not market_closed), None)
+    return partial, True
+
+
+def sync_codes(codes):
+    """
+    批量增量同步K线：当天收盘后已同步过的代码直接跳过
+    :return: {code: 当天未走完的K线}，供调用方在内存中拼接
+    """
+    now = datetime.now(settings.SHA_TZ)
+    today = now.strftime("%Y-%m-%d")
+    market_closed = now.hour * 60 + now.minute >= _CLOSE_MINUTE
+
+    with _checked_lock:
+        checked = _load_checked()
+    unique_codes = list(dict.fromkeys(str(c) for c in codes if c))
+    pending = [c for c in unique_codes if checked.get(c) != today]
+    if not pending:
+        return {}
+
+    partials = {}
+    workers = min(settings.KLINE_MAX_WORKERS, len(pending))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda c: _sync_one(c, today, market_closed), pending)
+        for code, (partial, ok) in zip(pending, results):
+            if partial:
+                partials[code] = partial
+            # 收盘后同步成功，当天就不必再请求
+            if ok and market_closed:
+                checked[code] = today
+
+    with _checked_lock:
+        _save_checked(checked)
+    log_info(f"🕯️ K线增量同步 {len(pending)} 只，跳过 {len(unique_codes) - len(pending)} 只")
+    return partials
+
+
+def get_daily_closes(codes):
+    """
+    批量获取日收盘价序列（先做增量同步，再从本地读取）
+    :return: {code: (日期列表 YYYY-MM-DD, 收盘价 array('d'))}
+    """
+    unique_codes = list(dict.fromkeys(str(c) for c in codes if c))
+    partials = sync_codes(unique_codes)
+
+    result = {}
+    for code in unique_codes:
+        bars = read_bars(code)
+        dates = [_date_str(d) for d in bars["date"]]
+        closes = bars["close"]
+        partial = partials.get(code)
+        if partial and (not dates or partial[0] > dates[-1]):
+            dates.append(partial[0])
+            closes.append(partial[2])
+        if dates:
+            result[code] = (dates, closes)
+    return result
+
+
+def trend_summary(code, days=5):
+    """
+    基于本地K线生成近期走势描述（不联网），没有数据时返回 "暂无"
+    """
+    closes = read_bars(code)["close"]
+    if len(closes) < 2:
+        return "暂无"
+    recent = closes[-days:]
+    change = (recent[-1] / recent[0] - 1) * 100
+    ma = sum(recent) / len(recent)
+    return (
+        f"近{len(recent)}日收盘 {recent[0]:.2f} → {recent[-1]:.2f} ({change:+.2f}%)，"
+        f"{len(recent)}日均价 {ma:.2f}，最高 {max(recent):.2f}，最低 {min(recent):.2f}"
+    )
+
+
+def tracked_codes(extra=()):
+    """需要维护K线的全部代码：历史上选过的股票 + 调用方给出的额外代码（如当前热门股）"""
+    codes = list(extra)
+    try:
+        codes.extend(HistoryStore().codes())
+    except Exception as e:
+        log_error(f"⚠️ 读取历史代码失败: {e}")
+    return list(dict.fromkeys(str(c) for c in codes if c))
@@ -0,0 +1,216 @@
+import heapq
+import math
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from config import settings
+from utils.notifier import log_error, log_info
+from utils.http_client import http_get
+from utils.tracing import span, traced
+
+# 沪深 A 股：深市主板/中小板 + 创业板 + 沪市主板 + 科创板
+_MARKET_FS = "m:0+t:6,m:0+t:80,m:1+t:2,m:1+t:23"
+_FIELDS = "f12,f14,f2,f3,f6,f62,f100"
+
+# 可用于排序的数值列
+NUMERIC_COLUMNS = ("price", "pct", "amount", "flow")
+# 可由接口直接排序的列 -> clist 排序字段
+SORT_FIELDS = {"price": "f2", "pct": "f3", "amount": "f6", "flow": "f62"}
+
+# 综合评分权重：按各列标准化后的 z 分数加权
+SCORE_WEIGHTS = {"amount": 0.4, "pct": 0.3, "flow": 0.3}
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def _num(value):
+    """接口缺失值 ("-" / None) 统一记为 NaN"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class MarketSnapshot:
+    """
+    全市场行情快照（按列存放）
+    - codes/names/industries 为列表，数值列为 array('d')，同一行号对应同一只股票
+    - array('d') 只为紧凑存储（每个值 8 字节，比 float 对象列表省内存），评分与排序仍是 Python 循环
+    - 排序选股用 heapq 在内存中完成，不再额外请求接口
+    """
+
+    def __init__(self, items, fetched_at=None):
+        self.codes = []
+        self.names = []
+        self.industries = []
+        self.price = array('d')
+        self.pct = array('d')
+        self.amount = array('d')
+        self.flow = array('d')
+        for item in items:
+            code = str(item.get('f12') or '')
+            if not code:
+                continue
+            self.codes.append(code)
+            self.names.append(item.get('f14') or '未知')
+            self.industries.append(item.get('f100') or '')
+            self.price.append(_num(item.get('f2')))
+            self.pct.append(_num(item.get('f3')))
+            self.amount.append(_num(item.get('f6')))
+            self.flow.append(_num(item.get('f62')))
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        self.fetched_at = time.monotonic() if fetched_at is None else fetched_at
+        self._score = None
+
+    def __len__(self):
+        return len(self.codes)
+
+    def column(self, name):
+        """取数值列；"score" 为综合评分列（首次使用时计算）"""
+        if name == "score":
+            if self._score is None:
+                self._score = self._composite_score()
+            return self._score
+        if name not in NUMERIC_COLUMNS:
+            raise ValueError(f"未知的排序列: {name}")
+        return getattr(self, name)
+
+    def _composite_score(self):
+        """成交额、涨幅、主力净流入分别标准化后加权，缺失值按 0 分计"""
+        score = array('d', [0.0]) * len(self.codes)
+        for name, weight in SCORE_WEIGHTS.items():
+            col = getattr(self, name)
+            valid = [v for v in col if not math.isnan(v)]
+            if len(valid) < 2:
+                continue
+            mean = sum(valid) / len(valid)
+            std = math.sqrt(sum((v - mean) ** 2 for v in valid) / len(valid)) or 1.0
+            for i, v in enumerate(col):
+                if not math.isnan(v):
+                    score[i] += weight * (v - mean) / std
+        return score
+
+    def top(self, n, by="amount", ascending=False):
+        """
+        按某一列选出前 n 只，返回行号列表（NaN 不参与排序）
+        :param by: price / pct / amount / flow / score
+        :param ascending: True 时取最小的 n 只
+        """
+        col = self.column(by)
+        rows = (i for i, v in enumerate(col) if not math.isnan(v))
+        pick = heapq.nsmallest if ascending else heapq.nlargest
+        return pick(n, rows, key=col.__getitem__)
+
+    def row(self, i):
+        """单行转为字典（数值保留原始单位：元 / %）"""
+        return {
+            "code": self.codes[i],
+            "name": self.names[i],
+            "industry": self.industries[i],
+            "price": self.price[i],
+            "pct": self.pct[i],
+            "amount": self.amount[i],
+            "flow": self.flow[i],
+        }
+
+    def quote(self, code):
+        """与 get_stock_quotes 相同格式的行情，不在快照中返回 None"""
+        i = self.index.get(str(code))
+        if i is None:
+            return None
+        price, pct = self.price[i], self.pct[i]
+        return {
+            "name": self.names[i],
+            "price": '-' if math.isnan(price) else f"{price:.2f}",
+            "pct": '-' if math.isnan(pct) else f"{pct:.2f}",
+        }
+
+
+def _fetch_page(page, size, by="amount"):
+    """抓取一页全市场行情（按 by 列从大到小），返回 (总数, 本页列表)"""
+    params = {
+        "pn": str(page), "pz": str(size), "po": "1", "np": "1",
+        "ut": "bd1d9ddb04089700cf9c27f6f7426281",
+        "fltt": "2", "invt": "2", "fid": SORT_FIELDS[by],
+        "fs": _MARKET_FS, "fields": _FIELDS
+    }
+    resp = http_get(settings.URL_FUNDS, params=params, timeout=10)
+    data = resp.json().get('data') or {}
+    diff = data.get('diff') or []
+    if isinstance(diff, dict):
+        diff = list(diff.values())
+    return int(data.get('total') or 0), diff
+
+
+@traced("fetch.market_top", count_items=False)
+def fetch_market_top(n, by="amount"):
+    """
+    只请求一页由接口排好序的排行榜，返回仅含这 n 只的快照
+    只需要榜单头部时用它，不必拉取全市场；结果不写入进程内共享快照
+    :param by: price / pct / amount / flow（综合评分 score 依赖全市场数据，不支持）
+    """
+    if by not in SORT_FIELDS:
+        raise ValueError(f"接口不支持按 {by} 排序")
+    _, items = _fetch_page(1, n, by)
+    return MarketSnapshot(items)
+
+
+@traced("fetch.market_snapshot", count_items=False)
+def fetch_market_snapshot():
+    """
+    分页并发抓取沪深全部 A 股：先取第一页拿到总数，其余页并发请求
+    单页失败只记录日志，快照中缺少对应股票
+    """
+    started = time.perf_counter()
+    size = settings.MARKET_PAGE_SIZE
+    total, items = _fetch_page(1, size)
+    pages = range(2, math.ceil(total / size) + 1)
+    failed = 0
+
+    if pages:
+        with ThreadPoolExecutor(max_workers=min(settings.MARKET_MAX_WORKERS, len(pages))) as pool:
+            futures = [pool.submit(_fetch_page, page, size) for page in pages]
+            for future in futures:
+                try:
+                    items.extend(future.result()[1])
+                except Exception as e:
+                    failed += 1
+                    log_error(f"⚠️ 全市场行情分页获取失败: {e}")
+
+    with span("parse.market", items=len(items)):
+        snapshot = MarketSnapshot(items)
+    log_info(
+        f"🗺️ 全市场快照 {len(snapshot)}/{total} 只，{len(pages) + 1} 页"
+        f"{f'（失败 {failed} 页）' if failed else ''}，耗时 {time.perf_counter() - started:.2f}s"
+    )
+    return snapshot
+
+
+def get_market_snapshot(max_age=None):
+    """
+    获取进程内共享的全市场快照，超过有效期才重新抓取
+    :param max_age: 有效期秒数，默认 settings.MARKET_SNAPSHOT_TTL
+    """
+    global _snapshot
+    ttl = settings.MARKET_SNAPSHOT_TTL if max_age is None else max_age
+    with _snapshot_lock:
+        if _snapshot is None or time.monotonic() - _snapshot.fetched_at >= ttl:
+            _snapshot = fetch_market_snapshot()
+        return _snapshot
+
+
+def clear_market_snapshot():
+    """丢弃进程内的全市场快照"""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
+
+
+def peek_market_snapshot():
+    """返回仍在有效期内的快照，没有则返回 None（不触发抓取）"""
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - snapshot.fetched_at < settings.MARKET_SNAPSHOT_TTL:
+        return snapshot
+    return None
@@ -0,0 +1,295 @@
+import datetime
+import os
+import re
+import sqlite3
+import threading
+import time
+from config import settings
+from utils.notifier import log_info, log_error
+from utils.tracing import span
+from core.news_item import NewsItem, DEFAULT_LINK
+
+# 标题按连续的汉字 / 字母数字切段后取二元组（单字段落保留单字）
+_SEGMENT_RE = re.compile(r'[一-鿿]+|[a-z0-9]+')
+# 正文里的 A 股代码：沪深主板、创业板、科创板、北交所
+# 六位数字本身会和金额、日期混淆，只认带边界的写法：括号 (300251) / 【300251】，
+# 或带市场标识 300251.SZ / SH600000 / sz.000001
+_CODE = r'((?:00|30|60|68|8[3-8]|43|92)\d{4})'
+_MARKET = r'(?:SH|SZ|BJ)'
+_CODE_RE = re.compile(
+    rf'[(（\[【]\s*(?:{_MARKET}\.?)?{_CODE}(?:\.{_MARKET})?\s*[)）\]】]'
+    rf'|(?<![A-Za-z0-9]){_MARKET}\.?{_CODE}(?!\d)'
+    rf'|(?<![\d.]){_CODE}\.{_MARKET}(?![A-Za-z])',
+    re.IGNORECASE
+)
+
+
+def bigrams(text):
+    """文本 -> 去重后的二元组集合"""
+    grams = set()
+    for seg in _SEGMENT_RE.findall((text or "").lower()):
+        if len(seg) == 1:
+            grams.add(seg)
+        grams.update(seg[i:i + 2] for i in range(len(seg) - 1))
+    return grams
+
+
+class NewsArchive:
+    """
+    本地快讯归档：SQLite 存储 + 倒排索引
+    - news 按 url_unique 去重，只存标题、摘要与时间
+    - postings 以 (词项, 时间, 快讯) 为主键，"某词项最近 N 天" 是一次索引区间扫描
+    - 词项：标题二元组 b:xx，股票代码 c:xxxxxx（正文出现带括号/市场标识的代码或已登记的股票名称都记为该代码）
+    """
+
+    def __init__(self, path=None):
+        self.path = path or settings.NEWS_ARCHIVE_DB
+        self._lock = threading.Lock()
+        self._conn = None
+        self._term_ids = {}
+        self._names = {}     # 已登记股票 {名称: 代码}
+        self._name_lengths = set()
+
+    def _connect(self):
+        if self._conn is not None:
+            return self._conn
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        # 必须在建表前设置，压缩时才能用 incremental_vacuum 归还空间
+        self._conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS news ("
+            " id INTEGER PRIMARY KEY, uid TEXT NOT NULL UNIQUE, ts INTEGER NOT NULL,"
+            " title TEXT NOT NULL, digest TEXT);"
+            "CREATE INDEX IF NOT EXISTS idx_news_ts ON news(ts);"
+            "CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, term TEXT NOT NULL UNIQUE);"
+            "CREATE TABLE IF NOT EXISTS postings ("
+            " term_id INTEGER NOT NULL, ts INTEGER NOT NULL, news_id INTEGER NOT NULL,"
+            " PRIMARY KEY (term_id, ts, news_id)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS stocks (code TEXT PRIMARY KEY, name TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+        )
+        for code, name in self._conn.execute("SELECT code, name FROM stocks"):
+            self._add_name(name, code)
+        return self._conn
+
+    def _add_name(self, name, code):
+        self._names[name] = code
+        self._name_lengths.add(len(name))
+
+    def _term_id(self, term, create=True):
+        """词项 -> 整数 id（进程内缓存）；create=False 时不存在返回 None"""
+        term_id = self._term_ids.get(term)
+        if term_id is not None:
+            return term_id
+        if create:
+            self._conn.execute("INSERT OR IGNORE INTO terms (term) VALUES (?)", (term,))
+        row = self._conn.execute("SELECT id FROM terms WHERE term = ?", (term,)).fetchone()
+        if row is None:
+            return None
+        self._term_ids[term] = row[0]
+        return row[0]
+
+    def _codes_in(self, text):
+        """正文中出现的股票代码，以及已登记股票名称对应的代码"""
+        codes = {code for groups in _CODE_RE.findall(text) for code in groups if code}
+        for length in self._name_lengths:
+            for i in range(len(text) - length + 1):
+                code = self._names.get(text[i:i + length])
+                if code:
+                    codes.add(code)
+        return codes
+
+    @staticmethod
+    def _uid(item):
+        """去重键：url_unique，缺失时退化为快讯 id"""
+        return item.link if item.link and item.link != DEFAULT_LINK else f"id:{item.id}"
+
+    def add(self, items):
+        """
+        归档一批快讯（已存在或超出保留期的跳过），并为新快讯建立索引
+        :return: 新增条数
+        """
+        added = 0
+        cutoff = time.time() - settings.NEWS_ARCHIVE_RETENTION_DAYS * 86400
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                for item in items:
+                    ts = int(item.datetime.timestamp())
+                    if ts < cutoff:
+                        continue
+                    digest = item.digest if item.digest != item.title else None
+                    cur = conn.execute(
+                        "INSERT OR IGNORE INTO news (uid, ts, title, digest) VALUES (?, ?, ?, ?)",
+                        (self._uid(item), ts, item.title, digest)
+                    )
+                    if cur.rowcount != 1:
+                        continue
+                    news_id = cur.lastrowid
+                    terms = [f"b:{g}" for g in bigrams(item.title)]
+                    terms += [f"c:{c}" for c in self._codes_in(f"{item.title} {item.digest}")]
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO postings (term_id, ts, news_id) VALUES (?, ?, ?)",
+                        [(self._term_id(t), ts, news_id) for t in terms]
+                    )
+                    added += 1
+        return added
+
+    def register_stocks(self, stocks):
+        """
+        登记需要按名称检索的股票 [(代码, 名称)]
+        新登记的股票会回填：在已归档快讯中按名称二元组求交集，把命中的标题补记到该代码下
+        """
+        with self._lock:
+            conn = self._connect()
+            fresh = [(str(code), name) for code, name in stocks if name and self._names.get(name) != str(code)]
+            if not fresh:
+                return
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO stocks (code, name) VALUES (?, ?)", fresh)
+                for code, name in fresh:
+                    self._add_name(name, code)
+                    hits = self._match_title(name, None, None)
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO postings (term_id, ts, news_id) VALUES (?, ?, ?)",
+                        [(self._term_id(f"c:{code}"), ts, news_id) for news_id, ts in hits]
+                    )
+
+    def _match_title(self, text, since, limit):
+        """二元组倒排求交集后，再用子串校验排除误命中 -> [(news_id, ts)]，新 -> 旧"""
+        grams = bigrams(text)
+        term_ids = [self._term_id(f"b:{g}", create=False) for g in grams]
+        if not grams or None in term_ids:
+            return []
+        marks = ",".join("?" * len(term_ids))
+        sql = (
+            "SELECT n.id, n.ts, n.title FROM news n JOIN ("
+            f" SELECT news_id FROM postings WHERE term_id IN ({marks}) AND ts >= ?"
+            " GROUP BY news_id HAVING COUNT(*) = ?) m ON n.id = m.news_id"
+            " ORDER BY n.ts DESC"
+        )
+        needle = text.lower()
+        hits = []
+        for news_id, ts, title in self._conn.execute(sql, term_ids + [since or 0, len(term_ids)]):
+            if needle in title.lower():
+                hits.append((news_id, ts))
+                if limit and len(hits) >= limit:
+                    break
+        return hits
+
+    def _load(self, news_ids):
+        if not news_ids:
+            return []
+        marks = ",".join("?" * len(news_ids))
+        rows = self._conn.execute(
+            f"SELECT id, uid, ts, title, digest FROM news WHERE id IN ({marks})", news_ids
+        ).fetchall()
+        by_id = {row[0]: row for row in rows}
+        items = []
+        for news_id in news_ids:
+            _, uid, ts, title, digest = by_id[news_id]
+            moment = datetime.datetime.fromtimestamp(ts, settings.SHA_TZ)
+            link = uid if not uid.startswith("id:") else DEFAULT_LINK
+            items.append(NewsItem(uid, title, digest or title, link, moment.strftime("%H:%M"), moment))
+        return items
+
+    def by_code(self, code, days=None, limit=None):
+        """
+        某只股票最近 days 天的相关快讯（最新在前），只走 c:代码 一个词项的索引区间
+        """
+        since = time.time() - (days or settings.NEWS_ARCHIVE_LOOKBACK_DAYS) * 86400
+        with self._lock:
+            self._connect()
+            term_id = self._term_id(f"c:{code}", create=False)
+            if term_id is None:
+                return []
+            ids = [r[0] for r in self._conn.execute(
+                "SELECT news_id FROM postings WHERE term_id = ? AND ts >= ? ORDER BY ts DESC LIMIT ?",
+                (term_id, since, limit or settings.NEWS_ARCHIVE_MAX_ITEMS)
+            )]
+            return self._load(ids)
+
+    def count(self):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM news").fetchone()[0]
+
+    def compact(self, retention_days=None):
+        """
+        按保留天数清理过期快讯及其倒排记录，并归还空闲页
+        :return: 删除的快讯条数
+        """
+        cutoff = int(time.time() - (retention_days or settings.NEWS_ARCHIVE_RETENTION_DAYS) * 86400)
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM postings WHERE ts < ?", (cutoff,))
+                removed = conn.execute("DELETE FROM news WHERE ts < ?", (cutoff,)).rowcount
+                conn.execute(
+                    "DELETE FROM terms WHERE id NOT IN (SELECT DISTINCT term_id FROM postings)"
+                    " AND term NOT IN (SELECT 'c:' || code FROM stocks)"
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('compacted', ?)",
+                    (datetime.datetime.now(settings.SHA_TZ).strftime("%Y-%m-%d"),)
+                )
+            self._term_ids.clear()
+            conn.execute("PRAGMA incremental_vacuum").fetchall()
+        return removed
+
+    def compact_daily(self):
+        """每天最多压缩一次"""
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM meta WHERE key = 'compacted'").fetchone()
+        if row and row[0] == datetime.datetime.now(settings.SHA_TZ).strftime("%Y-%m-%d"):
+            return 0
+        removed = self.compact()
+        if removed:
+            log_info(f"🗜️ 快讯归档已清理 {removed} 条过期快讯")
+        return removed
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive():
+    """获取进程内共享的归档实例（路径变化时重新打开）"""
+    global _archive
+    with _archive_lock:
+        if _archive is None or _archive.path != settings.NEWS_ARCHIVE_DB:
+            _archive = NewsArchive(settings.NEWS_ARCHIVE_DB)
+        return _archive
+
+
+def archive_news(items):
+    """抓取到的快讯顺手归档；失败只记日志，不影响主流程"""
+    if not settings.NEWS_ARCHIVE_ENABLED or not items:
+        return 0
+    try:
+        with span("archive.news", items=len(items)):
+            archive = get_archive()
+            added = archive.add(items)
+            archive.compact_daily()
+            return added
+    except Exception as e:
+        log_error(f"⚠️ 快讯归档失败: {e}")
+        return 0
+
+
+def stock_news(stocks, days=None, limit=None):
+    """
+    批量查询股票的相关快讯
+    :param stocks: [(代码, 名称)]，名称会先登记到归档
+    :return: {代码: [NewsItem]}；归档关闭或失败时返回 {}
+    """
+    if not settings.NEWS_ARCHIVE_ENABLED or not stocks:
+        return {}
+    try:
+        archive = get_archive()
+        archive.register_stocks(stocks)
+        return {str(code): archive.by_code(code, days, limit) for code, _ in stocks}
+    except Exception as e:
+        log_error(f"⚠️ 快讯归档查询失败: {e}")
+        return {}
@@ -0,0 +1,59 @@
+import math
+import re
+
+# 开头的【…】栏目标签（如【快讯】【突发】）对模型没有信息量，装箱前去掉
+_TAG_PREFIX_RE = re.compile(r'^(?:\s*【[^】]{0,12}】)+\s*')
+# CJK 统一表意文字、全角标点
+_CJK_RE = re.compile(r'[\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]')
+
+# 本地近似：DeepSeek 官方给出的经验值，1 个中文字符约 0.6 token，1 个英文字符约 0.3 token
+CJK_TOKEN_RATIO = 0.6
+ASCII_TOKEN_RATIO = 0.3
+
+
+def estimate_tokens(text):
+    """离线估算文本 token 数（中英混排）"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return math.ceil(cjk * CJK_TOKEN_RATIO + (len(text) - cjk) * ASCII_TOKEN_RATIO)
+
+
+def clean_title(title):
+    """去掉标题开头冗余的【…】标签"""
+    return _TAG_PREFIX_RE.sub('', title or '').strip() or (title or '').strip()
+
+
+def rank_news(news, keyword_index=None):
+    """按优先级排序：命中关键词多的在前，同分时越新越靠前"""
+    def priority(n):
+        hits = len(keyword_index.match(f"{n.title} {n.digest}")) if keyword_index else 0
+        return hits, n.datetime
+    return sorted(news, key=priority, reverse=True)
+
+
+def pack_lines(entries, budget, max_items=None):
+    """
+    按给定顺序贪心装箱，直到用完 token 预算
+    :param entries: [(payload, line), ...]，已按优先级排好序
+    :param budget: 允许的 token 数
+    :param max_items: 条数上限（可选）
+    :return: (选中的 payload 列表, 选中的行列表, 已用 token 数)
+    """
+    payloads, lines = [], []
+    used = 0
+    seen = set()
+    for payload, line in entries:
+        if max_items is not None and len(lines) >= max_items:
+            break
+        if line in seen:
+            continue
+        # 每行额外算 1 个 token 的换行开销
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            continue
+        seen.add(line)
+        payloads.append(payload)
+        lines.append(line)
+        used += cost
+    return payloads, lines, used
@@ -0,0 +1,111 @@
+import statistics
+from array import array
+from bisect import bisect_left
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+def _pick_paths(rows, closes_by_code):
+    """
+    把每次选股对齐到它的日K线：返回 [(row, 买入价, 选股日起的收盘价序列)]
+    选股日当天（含）之后的第一根K线视为持有第 1 天
+    """
+    paths = []
+    for row in rows:
+        series = closes_by_code.get(str(row['Code']))
+        try:
+            start_price = float(row['Start_Price'])
+        except (ValueError, TypeError):
+            continue
+        if not series or start_price <= 0:
+            continue
+        dates, closes = series
+        idx = bisect_left(dates, row['Date'])
+        paths.append((row, start_price, closes[idx:]))
+    return paths
+
+
+def compute_review_stats(rows, closes_by_code, forward_days, tagger=None):
+    """
+    一次遍历计算整段历史的绩效指标
+    收益、回撤序列用 array('d') 只是为了紧凑存放（每个值 8 字节），计算本身仍是逐元素的 Python 循环，
+    耗时与 选股数 × 持有天数 成正比
+    :param rows: 历史选股记录 (Date/Code/Start_Price/Reason)
+    :param closes_by_code: {code: (日期列表, 收盘价 array)}
+    :param forward_days: 统计的前瞻天数，如 (1, 3, 5, 10)
+    :param tagger: 可选，reason -> 主题标签列表，用于分组统计
+    :return: 指标字典；没有可用数据时返回 None
+    """
+    paths = _pick_paths(rows, closes_by_code)
+    if not paths:
+        return None
+
+    # N 日前瞻收益：只统计已经走完 N 个交易日的选股
+    forward = {}
+    for n in forward_days:
+        returns = array('d', (closes[n - 1] / start - 1 for _, start, closes in paths if len(closes) >= n))
+        if returns:
+            forward[n] = {
+                "count": len(returns),
+                "mean": _mean(returns),
+                "win_rate": sum(1 for r in returns if r > 0) / len(returns),
+            }
+
+    # 持有至今收益 + 持有期最大回撤（以买入价为初始高点）
+    holding = array('d')
+    drawdowns = array('d')
+    for _, start, closes in paths:
+        if not closes:
+            continue
+        holding.append(closes[-1] / start - 1)
+        peak = start
+        worst = 0.0
+        for c in closes:
+            if c > peak:
+                peak = c
+            dd = c / peak - 1
+            if dd < worst:
+                worst = dd
+        drawdowns.append(worst)
+
+    stdev = statistics.pstdev(holding) if len(holding) > 1 else 0.0
+    stats = {
+        "count": len(paths),
+        "forward": forward,
+        "holding_mean": _mean(holding),
+        "max_drawdown_mean": _mean(drawdowns),
+        "max_drawdown_worst": min(drawdowns) if drawdowns else 0.0,
+        # 类夏普：平均收益 / 收益波动（未扣无风险利率，仅作横向比较）
+        "sharpe": _mean(holding) / stdev if stdev > 0 else None,
+        "groups": {},
+    }
+
+    # 按主题分组（一个选股可以同时属于多个主题）
+    if tagger:
+        groups = {}
+        for (row, start, closes) in paths:
+            if not closes:
+                continue
+            ret = closes[-1] / start - 1
+            for tag in tagger(row.get('Reason') or ''):
+                groups.setdefault(tag, array('d')).append(ret)
+        stats["groups"] = {tag: {"count": len(v), "mean": _mean(v)} for tag, v in groups.items()}
+    return stats
+
+
+def format_review_stats(stats, max_groups=3):
+    """把指标字典渲染成 Telegram HTML 文本"""
+    lines = []
+    if stats["forward"]:
+        parts = [f"T+{n} {v['mean'] * 100:+.2f}% (胜率{v['win_rate'] * 100:.0f}%)" for n, v in sorted(stats["forward"].items())]
+        lines.append("📈 <b>前瞻收益</b>: " + " | ".join(parts))
+    lines.append(f"📉 <b>平均最大回撤</b>: {stats['max_drawdown_mean'] * 100:.2f}% (最差 {stats['max_drawdown_worst'] * 100:.2f}%)")
+    if stats["sharpe"] is not None:
+        lines.append(f"⚖️ <b>收益波动比</b>: {stats['sharpe']:.2f}")
+    if stats["groups"]:
+        top = sorted(stats["groups"].items(), key=lambda kv: kv[1]["count"], reverse=True)[:max_groups]
+        parts = [f"{tag}({v['count']}次) {v['mean'] * 100:+.2f}%" for tag, v in top]
+        lines.append("🏷️ <b>主题表现</b>: " + " | ".join(parts))
+    return "\n".join(lines)
@@ -0,0 +1,107 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.notifier import log_info, log_error, deferred_notifications, deferred_slot
+from utils.http_client import shared_fetch_scope, get_stats
+from core.data_fetcher import get_news, get_market_funds, get_hot_stocks_data
+
+# 各模式依赖的公共数据源；同一数据源在一次 run 中只抓取一次
+# monitor 按自己的游标增量翻页抓取，用不上预取的快讯快照，因此不在此列
+MODE_SOURCES = {
+    "daily": ("news",),
+    "periodic": ("news",),
+    "after_market": ("news",),
+    "funds": ("funds",),
+    "recommend": ("hot", "news"),
+    "klines": ("hot",),
+}
+
+# 读写选股文件 / 历史记录 / K线缓存的模式：同一次 run 中按此顺序串行执行
+# （先生成当日选股，再追踪、复盘），其余模式与这条链并发
+PICK_CHAIN = ("recommend", "track", "review", "klines")
+
+# 数据源 -> 预取函数（结果由 http_client 的共享作用域缓存，各模式再次请求时直接复用）
+_SOURCE_FETCHERS = {
+    "news": get_news,
+    "funds": get_market_funds,
+    "hot": get_hot_stocks_data,
+}
+
+
+def _in_slot(order, func):
+    """包装模式入口：在执行线程内标记延迟消息的发送序号"""
+    def run():
+        with deferred_slot(order):
+            func()
+    return run
+
+
+def _run_chain(modes, runners, orders, timings):
+    """在同一线程内依次执行一组模式，各模式仍使用自己的消息序号"""
+    for m in modes:
+        _timed(m, _in_slot(orders[m], runners[m]), timings)
+
+
+def _timed(name, func, timings):
+    """执行并记录单个阶段耗时，异常只记录不外抛，避免一个模式拖垮整批"""
+    started = time.perf_counter()
+    try:
+        func()
+    except Exception as e:
+        log_error(f"❌ 阶段 [{name}] 执行失败: {e}")
+    finally:
+        timings[name] = time.perf_counter() - started
+
+
+def run_modes(modes, runners):
+    """
+    单进程内一次执行多个模式
+    1. 汇总各模式依赖的数据源，并发预取一次
+    2. 各模式并发执行（AI 调用彼此独立，可同时进行），重复的抓取命中共享缓存；
+       PICK_CHAIN 中的模式共用选股/历史文件，在同一条链上按固定顺序串行
+    3. 所有 Telegram 消息在最后按模式顺序统一发送
+    :param modes: 模式名列表，如 ["periodic", "track", "funds"]
+    :param runners: {模式名: 无参可调用对象}
+    """
+    modes = list(dict.fromkeys(modes))
+    unknown = [m for m in modes if m not in runners]
+    if unknown:
+        log_error(f"❌ run 不支持的模式: {', '.join(unknown)}")
+        modes = [m for m in modes if m in runners]
+    if not modes:
+        return
+
+    sources = list(dict.fromkeys(s for m in modes for s in MODE_SOURCES.get(m, ())))
+    before = get_stats()
+    timings = {}
+    started = time.perf_counter()
+
+    notify_started = None
+    with deferred_notifications() as pending:
+        with shared_fetch_scope():
+            # 预取公共数据源
+            if sources:
+                with ThreadPoolExecutor(max_workers=len(sources)) as pool:
+                    for s in sources:
+                        pool.submit(_timed, f"fetch:{s}", _SOURCE_FETCHERS[s], timings)
+
+            # 并发执行各模式，重复的抓取命中共享缓存；消息按模式序号标记，发送时恢复模式顺序
+            orders = {m: i for i, m in enumerate(modes)}
+            chain = [m for m in PICK_CHAIN if m in orders]
+            jobs = [[m] for m in modes if m not in chain] + ([chain] if chain else [])
+            with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+                for job in jobs:
+                    pool.submit(_run_chain, job, runners, orders, timings)
+
+        after = get_stats()
+        sent = len(pending)
+        notify_started = time.perf_counter()
+    # 退出 deferred_notifications 时统一发送
+    timings["notify"] = time.perf_counter() - notify_started
+
+    stage_txt = " | ".join(f"{name} {sec:.2f}s" for name, sec in timings.items())
+    log_info(f"⏱️ 阶段耗时: {stage_txt}")
+    log_info(
+        f"📊 多模式运行完成 {','.join(modes)} | 总耗时 {time.perf_counter() - started:.2f}s | "
+        f"HTTP 请求 {after['requests'] - before['requests']} 次，"
+        f"共享复用节省 {after['shared_hits'] - before['shared_hits']} 次 | 推送 {sent} 条"
+    )
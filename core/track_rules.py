@@ -0,0 +1,89 @@
+import json
+import os
+from config import settings
+from utils.notifier import log_error
+
+
+def _to_float(value):
+    try:
+        return float(str(value).replace('%', '').strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def load_track_state():
+    """读取追踪状态：{code: {"price": 上次提醒价, "date", "side", "fired": {规则: 日期}}}"""
+    try:
+        if os.path.exists(settings.TRACK_STATE_FILE):
+            with open(settings.TRACK_STATE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+    except Exception as e:
+        log_error(f"⚠️ 追踪状态读取失败: {e}，按首次追踪处理")
+    return {}
+
+
+def save_track_state(state):
+    try:
+        with open(settings.TRACK_STATE_FILE, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        log_error(f"⚠️ 追踪状态写入失败: {e}")
+
+
+def evaluate(pick, quote, prev, rules, today):
+    """
+    对一只股票评估全部触发规则（纯本地计算，不联网）
+    :param pick: {"code", "name", "start_price"}
+    :param quote: get_stock_quotes 返回的行情
+    :param prev: 该代码上一次的追踪状态，没有则为 None
+    :param rules: 规则配置，见 settings.DEFAULT_TRACK_RULES
+    :param today: 当天日期 YYYY-MM-DD，用于"每天只提醒一次"的规则
+    :return: (触发原因列表, 新的状态)
+    """
+    prev = prev or {}
+    price = _to_float(quote.get('price'))
+    pct = _to_float(quote.get('pct'))
+    start = _to_float(pick.get('start_price'))
+    fired = {k: v for k, v in (prev.get("fired") or {}).items() if v == today}
+    reasons = []
+
+    # 1. 当日涨跌幅达到阈值（每天只提醒一次）
+    threshold = rules.get("pct_abs")
+    if threshold and pct is not None and abs(pct) >= threshold and "pct_abs" not in fired:
+        reasons.append(f"当日{'涨' if pct > 0 else '跌'}幅 {pct:+.2f}% 超过 ±{threshold}%")
+        fired["pct_abs"] = today
+
+    # 2. 跌破 / 重新站上推荐价（按上次所在一侧判断，首次追踪视为在推荐价上方）
+    side = None
+    if start and price is not None:
+        side = "above" if price >= start else "below"
+        if rules.get("start_break") and side != prev.get("side", "above"):
+            action = "跌破" if side == "below" else "重新站上"
+            reasons.append(f"{action}推荐价 {start:.2f}")
+
+    # 3. 距上次提醒时的价格变动超过阈值（只在触发时更新基准价，小幅连涨也能累积触发）
+    move = rules.get("since_last")
+    last_price = _to_float(prev.get("price"))
+    if move and price is not None and last_price:
+        change = (price / last_price - 1) * 100
+        if abs(change) >= move:
+            reasons.append(f"较上次提醒 ({last_price:.2f}) {change:+.2f}%")
+
+    # 4. 相对推荐价的累计盈亏达到阈值（每天只提醒一次）
+    profit_abs = rules.get("profit_abs")
+    if profit_abs and start and price is not None and "profit_abs" not in fired:
+        profit = (price / start - 1) * 100
+        if abs(profit) >= profit_abs:
+            reasons.append(f"较推荐价累计 {profit:+.2f}%")
+            fired["profit_abs"] = today
+
+    anchor = prev.get("price")
+    if price is not None and (reasons or anchor is None):
+        anchor = price
+    state = {
+        "price": anchor,
+        "date": today,
+        "side": side or prev.get("side"),
+        "fired": fired,
+    }
+    return reasons, state
@@ -1,5 +1,6 @@
 import sys
 import os
+from importlib.util import find_spec
 
 # 将当前目录添加到 sys.path，确保在任何环境下都能找到 core, config 等模块
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -7,11 +8,19 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 def _bootstrap_modules():
     """延迟加载业务模块，并在依赖缺失时给出明确提示。"""
+    # requests/openai 改为首次使用时才导入，这里只检查是否已安装（不触发导入）
+    for dep in ("requests", "openai"):
+        if find_spec(dep) is None:
+            print(f"❌ 依赖缺失: {dep}")
+            print("请先安装依赖后再运行，例如：")
+            print("  pip install -r requirements.txt")
+            sys.exit(1)
+
     try:
         # 注意：这里增加导入了 run_review
-        from core.analyzer import run_recommend, run_track, run_analysis, run_review
+        from core.analyzer import run_recommend, run_track, run_analysis, run_review, run_sync_klines
         from utils.notifier import log_info, log_error
-        return run_recommend, run_track, run_analysis, run_review, log_info, log_error
+        return run_recommend, run_track, run_analysis, run_review, run_sync_klines, log_info, log_error
     except ModuleNotFoundError as exc:
         # 常见场景：本地环境没有安装 requests/openai
         print(f"❌ 依赖缺失: {exc.name}")
@@ -24,28 +33,88 @@ def _bootstrap_modules():
         sys.exit(1)
 
 
+def _mode_runners(run_recommend, run_track, run_analysis, run_review, run_sync_klines):
+    """可在单进程内组合运行的模式：{模式名: 无参可调用对象}"""
+    runners = {
+        "recommend": run_recommend,
+        "track": run_track,
+        "review": run_review,
+        "klines": run_sync_klines,
+    }
+    for name in ["daily", "funds", "monitor", "periodic", "after_market"]:
+        runners[name] = lambda name=name: run_analysis(name)
+    return runners
+
+
+def _split_modes(args):
+    """解析 "periodic,track,funds" 形式的模式列表"""
+    selected = args[1].split(",") if len(args) > 1 else []
+    return [m.strip() for m in selected if m.strip()]
+
+
 def main():
-    # 1. 获取运行模式，默认为 'daily'
-    mode = sys.argv[1] if len(sys.argv) > 1 else "daily"
+    # 1. 获取运行模式，默认为 'daily'；以 -- 开头的参数视为开关
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    flags = {a for a in sys.argv[1:] if a.startswith("--")}
+    mode = args[0] if args else "daily"
+
+    # 启动耗时分析：以 -X importtime 只导入该模式的模块并汇总，不执行模式、不进入下面的正常流程
+    if "--profile-startup" in flags:
+        from utils.startup_profile import profile_startup
+        sys.exit(profile_startup(sys.argv[1:]))
 
     # 接收 run_review
-    run_recommend, run_track, run_analysis, run_review, log_info, log_error = _bootstrap_modules()
+    run_recommend, run_track, run_analysis, run_review, run_sync_klines, log_info, log_error = _bootstrap_modules()
 
     log_info(f"🚀 指挥中心启动 | 目标模式: [{mode}]")
 
+    # 阶段追踪：TRACE=1 或 --trace 开启，结束时输出汇总
+    from utils import tracing
+    if "--trace" in flags:
+        tracing.enable()
+
     try:
         # 2. 根据模式分发任务
         if mode == "recommend":
-            # AI 选股模式
-            run_recommend()
+            # AI 选股模式 (--async 启用并发抓取流水线)
+            run_recommend(use_async="--async" in flags)
 
         elif mode == "track":
             # 个股追踪模式
             run_track()
             
         elif mode == "review":
-            # ✨ 新增：战绩复盘模式
-            run_review()
+            # ✨ 新增：战绩复盘模式 (可选窗口: review 30 / review all)
+            run_review(args[1] if len(args) > 1 else None)
+
+        elif mode == "serve" or (mode == "monitor" and "--daemon" in flags):
+            # 常驻监控模式：单进程轮询快讯，状态常驻内存
+            from core.daemon import run_daemon
+            run_daemon()
+
+        elif mode == "klines":
+            # 日K线增量同步 (历史选股 + 当前热门股)
+            run_sync_klines()
+
+        elif mode == "backtest":
+            # 选股策略回测，可选临时权重: backtest momentum=0.5,news=0.5
+            from core.backtest import run_backtest
+            weights = None
+            if len(args) > 1:
+                weights = {k.strip(): float(v) for k, v in (pair.split("=") for pair in args[1].split(","))}
+            run_backtest(weights)
+
+        elif mode == "run":
+            # 多模式单进程运行：python main.py run periodic,track,funds
+            from core.scheduler import run_modes
+            runners = _mode_runners(run_recommend, run_track, run_analysis, run_review, run_sync_klines)
+            run_modes(_split_modes(args), runners)
+
+        elif mode == "bench":
+            # 离线基准：回放 FIXTURE_DIR 中的夹具，逐个模式测量 (bench [recommend,track] [--save-baseline])
+            from core.benchmark import run_benchmark
+            runners = _mode_runners(run_recommend, run_track, run_analysis, run_review, run_sync_klines)
+            run_benchmark(runners, _split_modes(args) or None, save_baseline="--save-baseline" in flags)
 
         elif mode in ["daily", "funds", "monitor", "periodic", "after_market"]:
             # 通用分析模式 (早报、资金、监控、复盘)
@@ -53,12 +122,18 @@ def main():
 
         else:
             log_error(f"❌ 未知模式: {mode}")
-            print("支持的模式: recommend, track, review, daily, funds, monitor, periodic, after_market")
+            print("支持的模式: recommend, track, review, backtest, klines, serve, run, bench, daily, funds, monitor, periodic, after_market")
 
     except Exception as e:
         log_error(f"❌ 程序执行发生严重错误: {e}")
         # 在 GitHub Actions 中，非零退出码会让 Workflow 显示为失败🔴，方便你收到报警
         sys.exit(1)
+    finally:
+        if tracing.is_enabled():
+            # 先等推送队列发完，tg.send 的 span 才能计入本次汇总
+            from utils.notifier import flush_notifications
+            flush_notifications()
+            tracing.finish()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings  # noqa: E402
+
+# 测试中会被写入的状态文件 / 目录：全部重定向到临时目录，不碰仓库里的真实数据
+_STATE_PATHS = (
+    "PICK_FILE", "NEWS_CURSOR_FILE", "TRACK_STATE_FILE", "NEWS_FINGERPRINT_FILE", "AI_CACHE_FILE",
+    "KLINE_DIR", "NEWS_ARCHIVE_DB", "FUNDS_DIR", "TRACE_FILE", "HISTORY_FILE", "RANKING_FILE", "HISTORY_DB",
+)
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    """每个测试使用独立的状态目录，并关闭真实的 Telegram / AI 配置"""
+    for name in _STATE_PATHS:
+        monkeypatch.setattr(settings, name, str(tmp_path / os.path.basename(getattr(settings, name))))
+    monkeypatch.setattr(settings, "TG_BOT_TOKEN", None)
+    monkeypatch.setattr(settings, "TG_CHAT_ID", None)
+    monkeypatch.setattr(settings, "DEEPSEEK_API_KEY", None)
+    monkeypatch.setattr(settings, "FIXTURE_MODE", None)
+    return tmp_path
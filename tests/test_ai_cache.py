@@ -0,0 +1,157 @@
+from types import SimpleNamespace
+
+import pytest
+
+from config import settings
+from utils import ai_cache, ai_client
+from utils.ai_cache import ResponseCache, make_key
+
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(ai_cache.time, "time", fake.time)
+    return fake
+
+
+@pytest.fixture
+def fake_ai(monkeypatch):
+    """替换 OpenAI 客户端：记录每次真实请求的提示词"""
+    prompts = []
+
+    def create(model, messages, temperature):
+        prompts.append(messages[-1]["content"])
+        message = SimpleNamespace(content=f"回复{len(prompts)}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(ai_client, "_client", client)
+    monkeypatch.setattr(settings, "DEEPSEEK_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "AI_CACHE_ENABLED", True)
+    return prompts
+
+
+def test_make_key_depends_on_every_field():
+    base = make_key("m", "role", 1.0, "prompt")
+    assert base == make_key("m", "role", 1, "prompt")
+    assert len({base, make_key("m2", "role", 1.0, "prompt"), make_key("m", "other", 1.0, "prompt"),
+                make_key("m", "role", 0.7, "prompt"), make_key("m", "role", 1.0, "prompt!")}) == 5
+
+
+def test_hit_and_miss_are_counted(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "ai.sqlite3"), 10)
+    assert cache.get("k", 60) is None
+    cache.set("k", "内容")
+    assert cache.get("k", 60) == "内容"
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_rate() == 0.5
+
+
+def test_entry_expires_after_ttl(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "ai.sqlite3"), 10)
+    cache.set("k", "内容")
+    clock.now += 60
+    assert cache.get("k", 60) == "内容"
+    clock.now += 1
+    assert cache.get("k", 60) is None
+    # 有效期由读取方决定：同一条记录对更长 TTL 的模式仍然有效
+    assert cache.get("k", 3600) == "内容"
+
+
+def test_least_recently_accessed_entry_is_evicted(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "ai.sqlite3"), 2)
+    cache.set("a", "A")
+    clock.now += 1
+    cache.set("b", "B")
+    clock.now += 1
+    assert cache.get("a", 60) == "A"
+    clock.now += 1
+    cache.set("c", "C")
+    assert cache.get("b", 60) is None
+    assert cache.get("a", 60) == "A"
+    assert cache.get("c", 60) == "C"
+
+
+def test_cache_survives_reopen(tmp_path, clock):
+    path = str(tmp_path / "ai.sqlite3")
+    ResponseCache(path, 10).set("k", "内容")
+    assert ResponseCache(path, 10).get("k", 60) == "内容"
+
+
+def test_get_ai_response_reuses_cached_reply(fake_ai, clock):
+    assert ai_client.get_ai_response("提示词", mode="monitor") == "回复1"
+    assert ai_client.get_ai_response("提示词", mode="monitor") == "回复1"
+    assert fake_ai == ["提示词"]
+    # 不同提示词、或显式跳过缓存时都会重新请求
+    assert ai_client.get_ai_response("另一个提示词", mode="monitor") == "回复2"
+    assert ai_client.get_ai_response("提示词", mode="monitor", use_cache=False) == "回复3"
+    assert len(fake_ai) == 3
+
+
+def test_get_ai_response_refreshes_after_mode_ttl(fake_ai, clock, monkeypatch):
+    monkeypatch.setitem(settings.AI_CACHE_TTL, "track", 600)
+    ai_client.get_ai_response("提示词", mode="track")
+    clock.now += 601
+    assert ai_client.get_ai_response("提示词", mode="track") == "回复2"
+    assert len(fake_ai) == 2
+
+
+def test_zero_ttl_mode_is_never_cached(fake_ai, clock, monkeypatch):
+    monkeypatch.setitem(settings.AI_CACHE_TTL, "track", 0)
+    ai_client.get_ai_response("提示词", mode="track")
+    ai_client.get_ai_response("提示词", mode="track")
+    assert len(fake_ai) == 2
+
+
+class FakeStream:
+    """流式响应：逐段产出，记录是否被关闭"""
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.closed = False
+
+    def __iter__(self):
+        for part in self.parts:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))])
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_stream(monkeypatch):
+    streams = []
+
+    def create(model, messages, temperature, stream):
+        streams.append(FakeStream(["第一行\n", "第二", "行\n", "第三行"]))
+        return streams[-1]
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(ai_client, "_client", client)
+    monkeypatch.setattr(settings, "DEEPSEEK_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "AI_CACHE_ENABLED", True)
+    return streams
+
+
+def test_full_stream_is_cached(fake_stream, clock):
+    assert "".join(ai_client.stream_ai_response("提示词", mode="monitor")) == "第一行\n第二行\n第三行"
+    assert fake_stream[0].closed
+    assert list(ai_client.stream_ai_response("提示词", mode="monitor")) == ["第一行\n第二行\n第三行"]
+    assert len(fake_stream) == 1
+
+
+def test_abandoned_stream_is_closed_and_not_cached(fake_stream, clock):
+    chunks = ai_client.stream_ai_response("提示词", mode="monitor")
+    assert next(chunks) == "第一行\n"
+    chunks.close()
+    assert fake_stream[0].closed
+    list(ai_client.stream_ai_response("提示词", mode="monitor"))
+    assert len(fake_stream) == 2
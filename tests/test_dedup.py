@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from config import settings
+from core import dedup
+from core.dedup import cluster, event_key, FingerprintStore
+
+# 字面相近、含义不同的快讯：任何情况下都不能合并
+MUST_NOT_MERGE = [
+    ("央行宣布加息25个基点", "央行宣布降息25个基点"),
+    ("美国宣布对中国商品加征关税", "美国宣布暂停对中国商品加征关税"),
+    ("中信证券公告拟回购股份不超过10亿元", "华泰证券公告拟回购股份不超过10亿元"),
+    ("沪指午后拉升涨超1%", "深成指午后拉升涨超1%"),
+    ("A股三大指数集体收涨", "A股三大指数集体收跌"),
+    ("光线传媒午后直线涨停", "光线传媒午后直线跌停"),
+    ("300251午后直线涨停", "300308午后直线涨停"),
+]
+
+# 同一事件的不同措辞：应归为一簇
+MUST_MERGE = [
+    ("光线传媒午后直线涨停，成交额超20亿元", "光线传媒午后直线拉升涨停 成交额超20亿"),
+    ("沪指午后拉升涨超1%，券商股集体走强", "沪指午后拉升涨超1% 券商板块集体走强"),
+    ("美国宣布暂停对中国商品加征关税90天", "快讯：美国宣布暂停对华商品加征关税90天"),
+    ("A股三大指数集体收涨，创业板指涨2%", "三大指数集体收涨 创业板指涨超2%"),
+]
+
+
+@pytest.mark.parametrize("first,second", MUST_NOT_MERGE)
+def test_opposite_or_different_entities_are_not_merged(first, second):
+    assert len(cluster([first, second])) == 2
+
+
+@pytest.mark.parametrize("first,second", MUST_MERGE)
+def test_reworded_event_is_merged(first, second):
+    assert len(cluster([first, second])) == 1
+
+
+def test_event_key_extracts_entities_and_polarity():
+    key = event_key("【快讯】中信证券(600030)午后涨超5%，沪指翻红")
+    assert {"c:600030", "e:中信证券", "i:沪指", "p:涨"} <= key
+
+
+def test_cluster_keeps_first_item_as_representative():
+    items = [MUST_MERGE[0][0], MUST_NOT_MERGE[0][0], MUST_MERGE[0][1]]
+    clusters = cluster(items)
+    assert [c[0] for c in clusters] == [MUST_MERGE[0][0], MUST_NOT_MERGE[0][0]]
+    assert clusters[0] == [MUST_MERGE[0][0], MUST_MERGE[0][1]]
+
+
+@pytest.mark.parametrize("alerted,incoming", MUST_NOT_MERGE)
+def test_store_does_not_suppress_opposite_event(alerted, incoming):
+    store = FingerprintStore()
+    store.add(alerted)
+    assert store.contains(alerted)
+    assert not store.contains(incoming)
+
+
+def test_store_suppresses_reworded_event_across_runs():
+    first, second = MUST_MERGE[2]
+    store = FingerprintStore()
+    store.add(first)
+    store.save()
+
+    reloaded = FingerprintStore()
+    assert reloaded.contains(second)
+    assert not reloaded.contains("美国宣布对中国商品加征关税90天")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(dedup.time, "time", lambda: now[0])
+    return now
+
+
+def test_long_running_store_expires_fingerprints(clock):
+    """常驻进程里同一个实例持续使用：超过 TTL 的事件不再抑制，也不会写回文件"""
+    store = FingerprintStore(ttl_hours=12)
+    store.add(MUST_MERGE[0][0])
+    clock[0] += 11 * 3600
+    store.add(MUST_MERGE[1][0])
+    assert store.contains(MUST_MERGE[0][1])
+
+    clock[0] += 2 * 3600
+    assert not store.contains(MUST_MERGE[0][1])
+    assert store.contains(MUST_MERGE[1][1])
+
+    store.save()
+    with open(settings.NEWS_FINGERPRINT_FILE, "r", encoding="utf-8") as f:
+        assert len(json.load(f)) == 1
+
+
+def test_expired_fingerprints_are_dropped_on_load(clock):
+    store = FingerprintStore(ttl_hours=12)
+    store.add(MUST_MERGE[0][0])
+    store.save()
+    clock[0] += 13 * 3600
+    assert not FingerprintStore(ttl_hours=12).contains(MUST_MERGE[0][1])
@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from config import settings
+from utils import fixtures, http_client
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "v1")
+
+
+@pytest.fixture
+def replay(monkeypatch):
+    monkeypatch.setattr(settings, "FIXTURE_MODE", "replay")
+    monkeypatch.setattr(settings, "FIXTURE_DIR", FIXTURE_DIR)
+    fixtures.reset_replay()
+    yield
+    fixtures.reset_replay()
+
+
+def test_replay_serves_recorded_response(replay):
+    resp = http_client.request("GET", settings.URL_NEWS_PAGE.format(size=100, page=1))
+    assert resp.status_code == 200
+    assert "LivesList" in resp.text
+
+
+def test_replay_miss_returns_404(replay):
+    assert http_client.request("GET", "https://example.invalid/none").status_code == 404
+
+
+def test_replay_bypasses_rate_limit_and_sessions(replay, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("回放时不应限流或建立连接")
+
+    monkeypatch.setattr(http_client, "_get_bucket", fail)
+    monkeypatch.setattr(http_client, "get_session", fail)
+    for _ in range(20):
+        assert http_client.request("GET", settings.URL_FUNDS, params={"pn": 1}).status_code == 200
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from config import settings
+from core import funds_store
+
+DAY = "2026-03-02"
+
+
+def _rows(**flows):
+    return [{"code": code, "name": f"板块{code}", "flow": flow, "change": "1.00%"} for code, flow in flows.items()]
+
+
+def test_read_recent_returns_last_snapshots_oldest_first():
+    for n in range(5):
+        funds_store.append_snapshot(_rows(BK1=float(n), BK2=-float(n)), 1000.0 + n * 600, DAY)
+    snapshots = funds_store.read_recent(DAY, 3)
+    assert [ts for ts, _ in snapshots] == [2200.0, 2800.0, 3400.0]
+    assert snapshots[-1][1] == {0: 4.0, 1: -4.0}
+
+
+def test_new_sector_gets_appended_index():
+    funds_store.append_snapshot(_rows(BK1=1.0), 0.0, DAY)
+    funds_store.append_snapshot(_rows(BK2=2.0, BK1=3.0), 3600.0, DAY)
+    assert funds_store.read_recent(DAY, 1)[0][1] == {1: 2.0, 0: 3.0}
+
+
+def test_two_snapshots_split_by_rate_sign():
+    funds_store.record_and_analyze(_rows(UP=1.0, DOWN=1.0), 0.0, DAY)
+    result = funds_store.record_and_analyze(_rows(UP=3.0, DOWN=-1.0), 1800.0, DAY)
+    assert result["minutes"] == 30 and not result["accelerated"]
+    assert result["by_code"]["UP"]["rate"] == pytest.approx(4.0)
+    assert [x["code"] for x in result["inflow"]] == ["UP"]
+    assert [x["code"] for x in result["outflow"]] == ["DOWN"]
+
+
+def test_acceleration_requires_same_sign_as_rate():
+    # FAST: 流入且越来越快；SLOW: 仍在流入但在放缓；DUMP: 流出且越来越快；EASE: 流出但在收窄
+    funds_store.record_and_analyze(_rows(FAST=0.0, SLOW=0.0, DUMP=0.0, EASE=0.0), 0.0, DAY)
+    funds_store.record_and_analyze(_rows(FAST=1.0, SLOW=4.0, DUMP=-1.0, EASE=-4.0), 3600.0, DAY)
+    result = funds_store.record_and_analyze(_rows(FAST=4.0, SLOW=5.0, DUMP=-4.0, EASE=-5.0), 7200.0, DAY)
+    assert result["accelerated"]
+    assert result["by_code"]["FAST"]["accel"] == pytest.approx(2.0)
+    assert result["by_code"]["SLOW"]["accel"] == pytest.approx(-3.0)
+    assert [x["code"] for x in result["inflow"]] == ["FAST"]
+    assert [x["code"] for x in result["outflow"]] == ["DUMP"]
+
+
+def test_old_day_directories_are_pruned(monkeypatch):
+    monkeypatch.setattr(settings, "FUNDS_RETENTION_DAYS", 2)
+    for day in ("2026-02-26", "2026-02-27", "2026-03-02"):
+        funds_store.append_snapshot(_rows(BK1=1.0), 0.0, day)
+    funds_store.append_snapshot(_rows(BK1=2.0), 60.0, "2026-03-02")
+    assert sorted(os.listdir(settings.FUNDS_DIR)) == ["20260227", "20260302"]
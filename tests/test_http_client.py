@@ -0,0 +1,141 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from config import settings
+from utils import http_client
+from utils.http_client import TokenBucket
+
+
+class FakeServer:
+    """本地 HTTP 服务：按路径依次返回预设的响应，并记录每个请求所用的客户端端口（即连接）"""
+
+    def __init__(self):
+        self.script = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # 支持长连接
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                server.requests.append((self.command, self.path, self.client_address[1]))
+                queue = server.script.get(self.path.split("?")[0]) or [(200, {}, b"ok", 0)]
+                status, headers, body, delay = queue.pop(0) if len(queue) > 1 else queue[0]
+                time.sleep(delay)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = _reply
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True).start()
+
+    def respond(self, path, *responses):
+        self.script[path] = [r if len(r) == 4 else r + (0,) for r in responses]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    srv = FakeServer()
+    # 每个测试使用全新的 Session 与令牌桶，不共享连接池
+    monkeypatch.setattr(http_client, "_sessions", {})
+    monkeypatch.setattr(http_client, "_buckets", {})
+    yield srv
+    for session in http_client._sessions.values():
+        session.close()
+    srv.close()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """记录重试前的等待时间而不真正等待"""
+    waits = []
+    fake_time = SimpleNamespace(sleep=waits.append, monotonic=time.monotonic, perf_counter=time.perf_counter, time=time.time)
+    monkeypatch.setattr(http_client, "time", fake_time)
+    return waits
+
+
+def test_same_host_reuses_session_and_connection(server):
+    first = http_client.get_session(server.base + "/a")
+    assert http_client.get_session(server.base + "/b?x=1") is first
+
+    for _ in range(5):
+        assert http_client.http_get(server.base + "/ping", timeout=5).text == "ok"
+    ports = {port for _, _, port in server.requests}
+    assert len(server.requests) == 5 and len(ports) == 1
+
+
+def test_retries_retriable_status_then_succeeds(server, sleeps):
+    server.respond("/flaky", (503, {}, b"busy"), (502, {}, b"busy"), (200, {}, b"done"))
+    resp = http_client.http_get(server.base + "/flaky", timeout=5)
+    assert resp.status_code == 200 and resp.text == "done"
+    assert len(server.requests) == 3 and len(sleeps) == 2
+
+
+def test_retry_after_header_is_respected(server, sleeps):
+    server.respond("/limited", (429, {"Retry-After": "3"}, b""), (200, {}, b"ok"))
+    assert http_client.http_get(server.base + "/limited", timeout=5).status_code == 200
+    assert sleeps == [3.0]
+
+
+def test_gives_up_after_max_retries(server, sleeps, monkeypatch):
+    monkeypatch.setattr(settings, "HTTP_MAX_RETRIES", 2)
+    server.respond("/down", (500, {}, b"err"))
+    assert http_client.http_get(server.base + "/down", timeout=5).status_code == 500
+    assert len(server.requests) == 3
+
+    assert http_client.http_get(server.base + "/down", timeout=5, max_retries=0).status_code == 500
+    assert len(server.requests) == 4
+
+
+def test_non_retriable_status_returns_immediately(server, sleeps):
+    server.respond("/missing", (404, {}, b""))
+    assert http_client.http_get(server.base + "/missing", timeout=5).status_code == 404
+    assert len(server.requests) == 1 and sleeps == []
+
+
+def test_post_read_timeout_is_not_retried(server, sleeps):
+    server.respond("/slow", (200, {}, b"late", 0.5))
+    with pytest.raises(requests.ReadTimeout):
+        http_client.http_post(server.base + "/slow", json={}, timeout=(5, 0.1))
+    assert len(server.requests) == 1 and sleeps == []
+
+
+def test_get_read_timeout_is_retried(server, sleeps):
+    server.respond("/slow", (200, {}, b"late", 0.5), (200, {}, b"fast", 0))
+    assert http_client.http_get(server.base + "/slow", timeout=(5, 0.2)).text == "fast"
+    assert len(sleeps) == 1
+
+
+def test_token_bucket_waits_for_refill():
+    now = [0.0]
+    waits = []
+
+    def sleep(seconds):
+        waits.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0], sleep=sleep)
+    assert bucket.acquire() == 0 and bucket.acquire() == 0
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert waits == [pytest.approx(0.5)]
@@ -0,0 +1,62 @@
+import pytest
+
+from core import data_fetcher, market_snapshot
+from core.market_snapshot import MarketSnapshot
+
+
+def _item(i, amount=None, pct=None):
+    return {"f12": f"{300000 + i:06d}", "f14": f"股{i}", "f2": 10.0 + i, "f3": pct if pct is not None else i,
+            "f6": amount if amount is not None else 1e8 * i, "f62": 1e7 * (i - 5), "f100": "行业"}
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    """替换分页抓取：记录请求参数，返回 120 只股票的全市场数据"""
+    calls = []
+    market = [_item(i) for i in range(120)]
+
+    def fetch_page(page, size, by="amount"):
+        calls.append((page, size, by))
+        ranked = sorted(market, key=lambda x: x[market_snapshot.SORT_FIELDS[by]], reverse=True)
+        return len(market), ranked[(page - 1) * size:page * size]
+
+    monkeypatch.setattr(market_snapshot, "_fetch_page", fetch_page)
+    market_snapshot.clear_market_snapshot()
+    yield calls
+    market_snapshot.clear_market_snapshot()
+
+
+def test_hot_stocks_use_single_ranked_page(pages):
+    hot = data_fetcher.get_hot_stocks_data(30)
+    assert pages == [(1, 30, "amount")]
+    assert [s["code"] for s in hot[:3]] == ["300119", "300118", "300117"]
+
+    data_fetcher.get_hot_stocks_data(10, by="pct")
+    assert pages[-1] == (1, 10, "pct")
+    assert market_snapshot.peek_market_snapshot() is None
+
+
+def test_hot_stocks_reuse_live_full_snapshot(pages, monkeypatch):
+    monkeypatch.setattr(market_snapshot.settings, "MARKET_PAGE_SIZE", 50)
+    market_snapshot.get_market_snapshot()
+    fetched = len(pages)
+    hot = data_fetcher.get_hot_stocks_data(5)
+    assert len(pages) == fetched
+    assert [s["code"] for s in hot] == ["300119", "300118", "300117", "300116", "300115"]
+
+
+def test_score_ranking_needs_full_snapshot(pages, monkeypatch):
+    monkeypatch.setattr(market_snapshot.settings, "MARKET_PAGE_SIZE", 50)
+    data_fetcher.get_hot_stocks_data(5, by="score")
+    assert [p for p, _, _ in pages] == [1, 2, 3]
+
+
+def test_fetch_market_top_rejects_score():
+    with pytest.raises(ValueError):
+        market_snapshot.fetch_market_top(5, by="score")
+
+
+def test_top_skips_missing_values():
+    snapshot = MarketSnapshot([_item(1, amount=3e8), _item(2, amount="-"), _item(3, amount=5e8)])
+    assert [snapshot.codes[i] for i in snapshot.top(3)] == ["300003", "300001"]
+    assert [snapshot.codes[i] for i in snapshot.top(1, ascending=True)] == ["300001"]
@@ -0,0 +1,102 @@
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from config import settings
+from core import analyzer, data_fetcher
+from core.analyzer import MonitorState, run_monitor, _stream_lines
+from utils import notifier
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = "{}"
+        self.headers = {}
+
+    def json(self):
+        return {}
+
+
+@pytest.fixture
+def monitor(monkeypatch):
+    """替换快讯接口、AI 与 Bot API：两条最新快讯，AI 回复和推送结果由测试指定"""
+    now = datetime.now(settings.SHA_TZ)
+    raw = [{"id": str(200 + i), "showtime": (now - timedelta(minutes=i + 1)).strftime("%Y-%m-%d %H:%M:%S"),
+            "title": title, "digest": title, "url_unique": f"https://x/{i}"}
+           for i, title in enumerate(["央行宣布降准0.5个百分点", "半导体板块午后集体拉升"])]
+    env = SimpleNamespace(reply="ALERT|0|降准利好", tg_status=200, ai_calls=0, sends=[], streamed=[])
+
+    def ai(prompt, mode=None):
+        """按 3 个字符一段流式产出回复，记录调用方实际读取到的片段"""
+        env.ai_calls += 1
+        reply = env.reply or ""
+        for i in range(0, len(reply), 3):
+            env.streamed.append(reply[i:i + 3])
+            yield reply[i:i + 3]
+
+    def post(url, json=None, **kwargs):
+        env.sends.append(json["text"])
+        return FakeResponse(env.tg_status)
+
+    monkeypatch.setattr(data_fetcher, "_fetch_news_page", lambda size, page: [dict(item) for item in raw])
+    monkeypatch.setattr(analyzer, "stream_ai_response", ai)
+    monkeypatch.setattr(settings, "NEWS_ARCHIVE_ENABLED", False)
+    monkeypatch.setattr(settings, "TG_BOT_TOKEN", "token")
+    monkeypatch.setattr(settings, "TG_CHAT_ID", "chat")
+    monkeypatch.setattr(settings, "TG_MAX_RETRIES", 0)
+    monkeypatch.setattr(notifier, "http_post", post)
+    return env
+
+
+def _round():
+    return run_monitor(MonitorState())
+
+
+def test_cursor_advances_after_alert_is_sent(monitor):
+    assert _round() == 1
+    assert len(monitor.sends) == 1 and os.path.exists(settings.NEWS_CURSOR_FILE)
+
+    assert _round() == 0
+    assert monitor.ai_calls == 1
+
+
+def test_cursor_stays_when_ai_fails(monitor):
+    monitor.reply = None
+    assert _round() == 0
+    assert not os.path.exists(settings.NEWS_CURSOR_FILE)
+
+    monitor.reply = "ALERT|0|降准利好"
+    assert _round() == 1
+    assert monitor.ai_calls == 2
+
+
+def test_cursor_stays_when_send_fails(monitor):
+    monitor.tg_status = 403
+    assert _round() == 0
+    assert not os.path.exists(settings.NEWS_CURSOR_FILE)
+    assert not os.path.exists(settings.NEWS_FINGERPRINT_FILE)
+
+    monitor.tg_status = 200
+    assert _round() == 1
+    assert len(monitor.sends) == 2
+
+
+def test_cursor_advances_when_nothing_is_worth_alerting(monitor):
+    monitor.reply = "无重要信号"
+    assert _round() == 0
+    assert os.path.exists(settings.NEWS_CURSOR_FILE)
+    assert _round() == 0 and monitor.ai_calls == 1
+
+
+def test_stream_lines_joins_chunks_into_lines():
+    assert list(_stream_lines(["AL", "ERT|0|a\nALERT|1", "|b\n", "尾行"])) == ["ALERT|0|a", "ALERT|1|b", "尾行"]
+    assert list(_stream_lines([])) == []
+
+
+def test_stream_is_abandoned_after_three_alerts(monitor):
+    monitor.reply = "\n".join(["ALERT|0|第一", "ALERT|1|第二", "ALERT|0|第三", "ALERT|1|第四" + "很长的分析" * 50])
+    assert _round() == 3
+    assert len("".join(monitor.streamed)) < len(monitor.reply)
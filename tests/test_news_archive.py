@@ -0,0 +1,42 @@
+from datetime import datetime
+
+import pytest
+
+from config import settings
+from core.news_archive import NewsArchive
+from core.news_item import NewsItem
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return NewsArchive(str(tmp_path / "archive.sqlite3"))
+
+
+def _item(i, title, digest=""):
+    return NewsItem(str(i), title, digest or title, f"https://x/{i}", "10:00", datetime.now(settings.SHA_TZ))
+
+
+@pytest.mark.parametrize("text, codes", [
+    ("光线传媒(300251)午后拉升", {"300251"}),
+    ("贵州茅台（600519.SH）涨停", {"600519"}),
+    ("【688981】公告", {"688981"}),
+    ("SZ300251 回购进展", {"300251"}),
+    ("600519.SH 放量", {"600519"}),
+])
+def test_codes_with_a_boundary_are_indexed(archive, text, codes):
+    archive._connect()
+    assert archive._codes_in(text) == codes
+
+
+@pytest.mark.parametrize("text", ["成交额300251万元", "截至2026年600000手", "报价300251.5元", "日期20260301"])
+def test_bare_numbers_are_not_codes(archive, text):
+    archive._connect()
+    assert archive._codes_in(text) == set()
+
+
+def test_by_code_finds_bracketed_codes_and_registered_names(archive):
+    archive.add([_item(1, "光线传媒(300251)午后拉升"), _item(2, "成交额300251万元创新高"), _item(3, "贵州茅台发布年报")])
+    assert [n.id for n in archive.by_code("300251")] == ["https://x/1"]
+
+    archive.register_stocks([("600519", "贵州茅台")])
+    assert [n.title for n in archive.by_code("600519")] == ["贵州茅台发布年报"]
@@ -0,0 +1,74 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from config import settings
+from core import data_fetcher
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    """替换快讯接口：每 10 分钟一条，共 12 条（最新在前），记录抓取次数"""
+    now = datetime.now(settings.SHA_TZ)
+    raw = [{"id": str(100 + i), "showtime": (now - timedelta(minutes=10 * i)).strftime("%Y-%m-%d %H:%M:%S"),
+            "title": f"第{i}条快讯标题", "digest": f"摘要{i}", "url_unique": f"https://x/{i}"} for i in range(12)]
+    fetches = []
+
+    def fetch(size, page):
+        fetches.append((size, page))
+        return [dict(item) for item in raw]
+
+    monkeypatch.setattr(data_fetcher, "_fetch_news_page", fetch)
+    monkeypatch.setattr(settings, "NEWS_ARCHIVE_ENABLED", False)
+    data_fetcher.clear_news_snapshot()
+    yield fetches
+    data_fetcher.clear_news_snapshot()
+
+
+def _ids(news):
+    return [n.id for n in news]
+
+
+def test_windows_share_one_fetch_and_keep_newest_first(feed):
+    assert _ids(data_fetcher.get_news(25)) == ["100", "101", "102"]
+    assert _ids(data_fetcher.get_news(55)) == ["100", "101", "102", "103", "104", "105"]
+    assert len(data_fetcher.get_news()) == 12
+    assert feed == [(settings.NEWS_MAX_ITEMS, 1)]
+
+
+def test_mutating_a_view_does_not_touch_the_snapshot(feed):
+    view = data_fetcher.get_news(55)
+    view.sort(key=lambda n: n.datetime)
+    view.pop()
+    view.append(view[0])
+    del view[1:]
+
+    snapshot = data_fetcher.get_news_snapshot()
+    assert len(snapshot) == 12
+    assert [n.id for n in snapshot.items] == [str(100 + i) for i in reversed(range(12))]
+    assert _ids(data_fetcher.get_news(55)) == ["100", "101", "102", "103", "104", "105"]
+
+
+def test_each_call_returns_a_fresh_list(feed):
+    first = data_fetcher.get_news(55)
+    second = data_fetcher.get_news(55)
+    assert first is not second
+    assert first == second
+
+
+def test_concurrent_callers_fetch_once(feed):
+    results = []
+    barrier = threading.Barrier(8)
+
+    def worker(minutes):
+        barrier.wait()
+        results.append(len(data_fetcher.get_news(minutes)))
+
+    threads = [threading.Thread(target=worker, args=(25 + 10 * i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(feed) == 1
+    assert sorted(results) == [3, 4, 5, 6, 7, 8, 9, 10]
@@ -0,0 +1,119 @@
+import re
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from config import settings
+from utils import notifier
+from utils.notifier import TelegramQueue, split_message, _pack
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body or {}
+        self.text = str(self.body)
+        self.headers = headers or {}
+
+    def json(self):
+        return self.body
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    """替换 Bot API：按顺序返回预设响应（用完后一律 200），记录每次请求的 payload 与重试等待"""
+    bot = SimpleNamespace(responses=[], payloads=[], sleeps=[])
+
+    def post(url, json=None, **kwargs):
+        bot.payloads.append(dict(json))
+        result = bot.responses.pop(0) if bot.responses else FakeResponse(200, {"ok": True})
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(settings, "TG_BOT_TOKEN", "token")
+    monkeypatch.setattr(settings, "TG_CHAT_ID", "chat")
+    monkeypatch.setattr(notifier, "http_post", post)
+    monkeypatch.setattr(notifier, "time", SimpleNamespace(
+        sleep=bot.sleeps.append, monotonic=time.monotonic, perf_counter=time.perf_counter))
+    return bot
+
+
+def _send(*messages):
+    queue = TelegramQueue(linger=5)  # 靠 flush 结束等待，保证同一批消息合并
+    for msg in messages:
+        queue.put(msg)
+    assert queue.flush(5)
+    return queue.stats
+
+
+def test_split_keeps_parts_within_limit_and_tags_balanced():
+    text = "<b>标题</b>\n\n" + "\n".join(f"<b>第{i}行</b> <a href=\"https://x/{i}\">链接&amp;{i}</a> 内容" * 3 for i in range(200))
+    parts = split_message(text, 500)
+    assert len(parts) > 1
+    for part in parts:
+        assert len(part) <= 500
+        assert part.count("<b>") == part.count("</b>")
+        assert part.count("<a ") == part.count("</a>")
+        assert not re.search(r"&[a-z]*$", part)
+    assert re.sub(r"\s+|</?b>", "", "".join(parts)).count("内容") == 600
+
+
+def test_pack_merges_short_messages_in_order():
+    assert _pack(["一", "二", "三"], 100) == ["一\n\n二\n\n三"]
+    assert _pack(["a" * 60, "b" * 60], 100) == ["a" * 60, "b" * 60]
+
+
+def test_messages_are_merged_and_sent_in_order(bot):
+    stats = _send("第一条", "第二条")
+    assert [p["text"] for p in bot.payloads] == ["第一条\n\n第二条"]
+    assert stats["sent"] == 1 and stats["failed"] == 0
+
+
+def test_429_waits_for_retry_after_then_sends(bot):
+    bot.responses = [FakeResponse(429, {"ok": False, "parameters": {"retry_after": 2}})]
+    stats = _send("消息")
+    assert bot.sleeps == [2.0]
+    assert stats["sent"] == 1 and stats["retries"] == 1
+
+
+def test_429_wait_is_capped(bot, monkeypatch):
+    monkeypatch.setattr(settings, "TG_RETRY_AFTER_MAX", 5)
+    bot.responses = [FakeResponse(429, {}, {"Retry-After": "600"})]
+    _send("消息")
+    assert bot.sleeps == [5]
+
+
+def test_html_parse_error_falls_back_to_plain_text(bot):
+    bot.responses = [FakeResponse(400, {"description": "can't parse entities"})]
+    stats = _send("<b>未闭合")
+    assert "parse_mode" in bot.payloads[0] and "parse_mode" not in bot.payloads[1]
+    assert stats["sent"] == 1 and bot.sleeps == [0]
+
+
+def test_other_client_errors_are_not_retried(bot):
+    bot.responses = [FakeResponse(403, {"description": "bot was blocked"})]
+    stats = _send("消息")
+    assert len(bot.payloads) == 1 and stats["failed"] == 1
+
+
+def test_read_timeout_is_not_resent(bot):
+    bot.responses = [requests.ReadTimeout("slow")]
+    stats = _send("消息")
+    assert len(bot.payloads) == 1 and stats["failed"] == 1
+
+
+def test_server_errors_retry_until_limit(bot, monkeypatch):
+    monkeypatch.setattr(settings, "TG_MAX_RETRIES", 2)
+    bot.responses = [FakeResponse(502)] * 3
+    stats = _send("消息")
+    assert len(bot.payloads) == 3 and len(bot.sleeps) == 2
+    assert stats["failed"] == 1 and stats["retries"] == 2
+
+
+def test_long_message_is_split_into_several_sends(bot):
+    _send("段落内容。" * 2000)
+    assert len(bot.payloads) == 3
+    assert all(len(p["text"]) <= settings.TG_MAX_LENGTH for p in bot.payloads)
@@ -0,0 +1,83 @@
+from datetime import datetime
+
+import pytest
+
+from core import backtest
+from core.backtest import build_backtest_rows
+from core.candidate_ranker import (build_features, dominant_pick, load_rankings, save_ranking,
+                                   score_candidates)
+from core.news_item import NewsItem
+
+
+def _candidate(code, name, pct, amount, industry="半导体"):
+    return {"code": code, "name": name, "pct": f"{pct}%", "amount": f"{amount}亿", "price": 10.0, "industry": industry}
+
+
+def _row(code, **features):
+    base = {"momentum": 0.0, "turnover": 0.0, "sector_flow": 0.0, "news": 0}
+    base.update(features)
+    return {"code": code, "name": code, "industry": "", "price": 10.0, "features": base}
+
+
+def test_build_features_counts_mentions_and_sector_flow():
+    now = datetime(2026, 3, 2, 10, 0)
+    news = [NewsItem("1", "中芯国际午后拉升", "", "", "10:00", now),
+            NewsItem("2", "半导体板块走强", "中芯国际、华虹公司涨超5%", "", "10:00", now)]
+    rows = build_features([_candidate("688981", "中芯国际", 5.2, 80.5), _candidate("688347", "华虹公司", 6.1, 30)],
+                          [{"name": "半导体", "flow": 12.5}], news)
+    assert rows[0]["features"] == {"momentum": 5.2, "turnover": 80.5, "sector_flow": 12.5, "news": 2}
+    assert rows[1]["features"]["news"] == 1
+
+
+def test_scores_rank_by_weighted_z_scores():
+    rows = [_row("000001", momentum=1.0, news=0), _row("000002", momentum=3.0, news=2), _row("000003", momentum=2.0, news=1)]
+    ranked = score_candidates(rows, {"momentum": 0.5, "news": 0.5})
+    assert [r["code"] for r in ranked] == ["000002", "000003", "000001"]
+    assert ranked[1]["score"] == pytest.approx(0.0)
+    assert ranked[0]["score"] == pytest.approx(-ranked[2]["score"])
+
+
+def test_ties_are_broken_by_code():
+    rows = [_row("300003", momentum=1.0), _row("300001", momentum=1.0), _row("300002", momentum=1.0)]
+    assert [r["code"] for r in score_candidates(rows)] == ["300001", "300002", "300003"]
+
+
+def test_weights_change_the_order():
+    rows = [_row("A", momentum=9.0, news=0), _row("B", momentum=1.0, news=5)]
+    assert score_candidates([dict(r) for r in rows], {"momentum": 1.0})[0]["code"] == "A"
+    assert score_candidates([dict(r) for r in rows], {"news": 1.0})[0]["code"] == "B"
+
+
+def test_dominant_pick_needs_a_clear_gap():
+    assert dominant_pick([{"score": 2.0}, {"score": 0.5}], gap=1.0) == {"score": 2.0}
+    assert dominant_pick([{"score": 1.2}, {"score": 0.5}], gap=1.0) is None
+    assert dominant_pick([{"score": -1.0}], gap=1.0) == {"score": -1.0}
+
+
+def test_backtest_rescores_snapshots_with_given_weights():
+    rankings = [
+        {"date": "2026-03-02", "pick": "A", "candidates": [_row("A", momentum=9.0), _row("B", news=5)]},
+        {"date": "2026-03-03", "pick": "D", "candidates": [_row("C", momentum=9.0), _row("D", news=5)]},
+    ]
+    history = [{"Date": "2026-03-02", "Code": "A", "Start_Price": 10.0}]
+
+    strategies, agree = build_backtest_rows(history, rankings, {"momentum": 1.0})
+    assert [r["Code"] for r in strategies["quant"]] == ["A", "C"]
+    assert [r["Code"] for r in strategies["pool"]] == ["A", "B", "C", "D"]
+    assert strategies["history"] == history and agree == 1
+
+    strategies, agree = build_backtest_rows(history, rankings, {"news": 1.0})
+    assert [r["Code"] for r in strategies["quant"]] == ["B", "D"] and agree == 1
+    # 重新打分不改写快照本身
+    assert "score" not in rankings[0]["candidates"][0]
+
+
+def test_saved_rankings_round_trip_for_backtest(monkeypatch):
+    ranked = score_candidates([_row("A", momentum=9.0), _row("B", news=5)], {"momentum": 1.0})
+    save_ranking("2026-03-02", ranked, "A", used_ai=False)
+    records = load_rankings()
+    assert [c["code"] for c in records[0]["candidates"]] == ["A", "B"]
+
+    monkeypatch.setattr(backtest, "get_daily_closes", lambda codes: {})
+    results = backtest.run_backtest({"news": 1.0})
+    assert set(results) == {"history", "quant", "pool"}
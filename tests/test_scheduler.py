@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+
+from config import settings
+from core import scheduler
+from utils import notifier
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """截获最终发出的 Telegram 消息"""
+    messages = []
+    monkeypatch.setattr(settings, "TG_BOT_TOKEN", "token")
+    monkeypatch.setattr(settings, "TG_CHAT_ID", "chat")
+    monkeypatch.setattr(notifier._queue, "put", messages.append)
+    return messages
+
+
+@pytest.fixture
+def fetched(monkeypatch):
+    calls = []
+    fetchers = {name: (lambda name=name: calls.append(name)) for name in scheduler._SOURCE_FETCHERS}
+    monkeypatch.setattr(scheduler, "_SOURCE_FETCHERS", fetchers)
+    return calls
+
+
+def _runner(name, events, delay=0.0):
+    def run():
+        events.append(("start", name))
+        time.sleep(delay)
+        notifier.send_tg(name)
+        events.append(("end", name))
+    return run
+
+
+def test_pick_chain_runs_recommend_before_track(sent, fetched):
+    events = []
+    runners = {
+        "track": _runner("track", events),
+        "review": _runner("review", events),
+        "recommend": _runner("recommend", events, delay=0.05),
+        "funds": _runner("funds", events),
+    }
+    scheduler.run_modes(["track", "funds", "review", "recommend"], runners)
+
+    chain = [e for e in events if e[1] != "funds"]
+    assert chain == [("start", "recommend"), ("end", "recommend"), ("start", "track"), ("end", "track"),
+                     ("start", "review"), ("end", "review")]
+    # 发送顺序仍按命令行中的模式顺序
+    assert sent == ["track", "funds", "review", "recommend"]
+
+
+def test_other_modes_run_alongside_the_chain(sent, fetched):
+    overlap = threading.Event()
+    running = threading.Event()
+
+    def recommend():
+        running.set()
+        overlap.wait(1)
+
+    def periodic():
+        if running.wait(1):
+            overlap.set()
+
+    scheduler.run_modes(["recommend", "periodic"], {"recommend": recommend, "periodic": periodic})
+    assert overlap.is_set()
+
+
+def test_monitor_is_not_prefetched(sent, fetched):
+    scheduler.run_modes(["monitor"], {"monitor": lambda: None})
+    assert fetched == []
+    scheduler.run_modes(["periodic", "monitor"], {"periodic": lambda: None, "monitor": lambda: None})
+    assert fetched == ["news"]
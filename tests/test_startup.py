@@ -0,0 +1,74 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import pytest
+
+from config import settings
+from utils import fixtures
+from utils.startup_profile import profile_startup
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子进程内执行：状态文件指向临时目录、只回放夹具，然后按命令行方式运行 monitor
+_DRIVER = """
+import json, sys, time
+sys.path.insert(0, {base!r})
+from config import settings
+for name, path in {paths!r}.items():
+    setattr(settings, name, path)
+settings.FIXTURE_MODE = "replay"
+settings.FIXTURE_DIR = {fixture_dir!r}
+settings.DEEPSEEK_API_KEY = settings.TG_BOT_TOKEN = settings.TG_CHAT_ID = "replay"
+started = time.perf_counter()
+import main
+sys.argv = ["main.py", "monitor"]
+main.main()
+print("RESULT " + json.dumps({{"ms": (time.perf_counter() - started) * 1000, "openai": "openai" in sys.modules}}))
+"""
+
+
+@pytest.mark.parametrize("mode", sorted(settings.STARTUP_BUDGET_MS))
+def test_startup_imports_within_budget(mode):
+    assert profile_startup([mode]) == 0
+
+
+def _news_item(i, showtime):
+    return {"id": str(1000 + i), "showtime": showtime, "title": f"快讯标题{i}", "digest": f"快讯摘要{i}",
+            "url_unique": f"https://finance.eastmoney.com/a/{1000 + i}.html"}
+
+
+def _write_fixtures(directory, items):
+    os.makedirs(directory)
+    with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"version": settings.FIXTURE_VERSION, "recorded_at": time.time()}, f)
+    url = settings.URL_NEWS_PAGE.format(size=settings.NEWS_PAGE_SIZE, page=1)
+    body = "var ajaxResult=" + json.dumps({"LivesList": items}, ensure_ascii=False)
+    with open(os.path.join(directory, "http.jsonl"), "w", encoding="utf-8") as f:
+        f.write(json.dumps({"key": fixtures.request_key("GET", url), "status": 200, "headers": {},
+                            "body": body, "encoding": "text"}, ensure_ascii=False) + "\n")
+
+
+def test_monitor_without_new_news_skips_ai_end_to_end(tmp_path):
+    """游标之后没有新快讯：整轮只抓一页就退出，不加载 openai，总耗时在预算内"""
+    showtime = datetime.now(settings.SHA_TZ).strftime("%Y-%m-%d %H:%M:%S")
+    items = [_news_item(i, showtime) for i in range(3)]
+    _write_fixtures(str(tmp_path / "fixtures"), items)
+    with open(settings.NEWS_CURSOR_FILE, "w", encoding="utf-8") as f:
+        json.dump({"showtime": showtime, "ids": [item["id"] for item in items]}, f)
+
+    paths = {name: getattr(settings, name) for name in ("NEWS_CURSOR_FILE", "NEWS_FINGERPRINT_FILE", "AI_CACHE_FILE",
+                                                       "NEWS_ARCHIVE_DB", "TRACE_FILE", "KLINE_DIR")}
+    driver = _DRIVER.format(base=BASE_DIR, paths=paths, fixture_dir=str(tmp_path / "fixtures"))
+    proc = subprocess.run([sys.executable, "-c", driver], cwd=str(tmp_path), stdout=subprocess.PIPE,
+                          stderr=subprocess.STDOUT, universal_newlines=True, encoding="utf-8", timeout=60)
+
+    assert proc.returncode == 0, proc.stdout
+    assert "没有新快讯，跳过 AI 分析" in proc.stdout
+    result = json.loads(proc.stdout.split("RESULT ", 1)[1])
+    assert not result["openai"]
+    # 导入 + 一次回放抓取 + 退出，整体应与纯导入同一量级
+    assert result["ms"] < settings.STARTUP_BUDGET_MS["monitor"] * 2, proc.stdout
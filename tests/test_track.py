@@ -0,0 +1,52 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from config import settings
+from core import analyzer
+from core.history_store import HistoryStore
+
+
+@pytest.fixture
+def picks():
+    today = datetime.now(settings.SHA_TZ).strftime("%Y-%m-%d")
+    store = HistoryStore()
+    store.append("2026-02-13", "太辰光", "300570", 154.05, "光模块")
+    store.append(today, "光线传媒", "300251", 27.22, "传媒")
+    with open(settings.PICK_FILE, "w", encoding="utf-8") as f:
+        json.dump({"name": "光线传媒", "code": "300251", "reason": "传媒"}, f, ensure_ascii=False)
+    return today
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    """替换行情 / K线 / AI / 推送，返回发给 AI 的 Prompt 列表"""
+    captured = []
+    quotes = {"300570": {"name": "太辰光", "price": "160.00", "pct": "6.00"},
+              "300251": {"name": "光线传媒", "price": "29.00", "pct": "6.50"}}
+    monkeypatch.setattr(analyzer, "get_stock_quotes", lambda codes: {c: quotes[c] for c in codes})
+    monkeypatch.setattr(analyzer, "sync_codes", lambda codes: None)
+    monkeypatch.setattr(analyzer, "get_ai_responses", lambda calls: [captured.append(c["prompt_text"]) for c in calls])
+    monkeypatch.setattr(analyzer, "send_tg", lambda msg: None)
+    return captured
+
+
+def test_tracked_picks_carry_latest_pick_date(picks):
+    tracked = {p["code"]: p for p in analyzer._tracked_picks(5)}
+    assert tracked["300251"]["date"] == picks
+    assert tracked["300570"]["date"] == "2026-02-13"
+    assert tracked["300570"]["start_price"] == 154.05
+
+
+def test_track_prompt_names_the_pick_date(picks, prompts):
+    analyzer.run_track()
+    by_code = {p.split("(")[1][:6]: p for p in prompts}
+    assert by_code["300251"].startswith("你在今天推荐了【光线传媒 (300251)】")
+    assert by_code["300570"].startswith("你在2026-02-13推荐了【太辰光 (300570)】")
+    assert all("今天早上" not in p for p in prompts)
+
+
+def test_pick_date_text_without_history():
+    assert analyzer._pick_date_text(None, "2026-03-02") == "近期"
+    assert analyzer._pick_date_text("2026-03-02", "2026-03-02") == "今天"
@@ -0,0 +1,92 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from config import settings
+
+
+def make_key(model, system_role, temperature, prompt_text):
+    """缓存键：(模型, 系统角色, 温度, 提示词) 的 sha256"""
+    raw = "\x1f".join([model, system_role or "", f"{float(temperature):.3f}", prompt_text])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    基于 SQLite 的 AI 回复缓存
+    - 读取时按调用方给出的 TTL 判断是否过期
+    - 超过 max_entries 时按最近访问时间淘汰 (LRU)
+    """
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, content TEXT NOT NULL,"
+                " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON responses(accessed_at)")
+        return self._conn
+
+    def get(self, key, ttl):
+        """命中且未过期时返回内容，否则返回 None"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT content, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] <= ttl:
+                conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                conn.commit()
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def set(self, key, content):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, content, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, content, now, now)
+            )
+            # 超出容量时淘汰最久未访问的记录
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            conn.commit()
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """获取进程内共享的缓存实例（路径变化时重新打开）"""
+    global _cache
+    with _cache_lock:
+        if _cache is None or _cache.path != settings.AI_CACHE_FILE:
+            _cache = ResponseCache(settings.AI_CACHE_FILE, settings.AI_CACHE_MAX_ENTRIES)
+        return _cache
+
+
+def ttl_for(mode):
+    """按模式取缓存有效期（秒），0 表示不缓存"""
+    return settings.AI_CACHE_TTL.get(mode, settings.AI_CACHE_DEFAULT_TTL)
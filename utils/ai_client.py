@@ -1,13 +1,108 @@
-from openai import OpenAI
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from config import settings
 from utils.notifier import log_error, log_info
+from utils.ai_cache import get_cache, make_key, ttl_for
+from utils import fixtures
+from utils.tracing import span
 
-def get_ai_response(prompt_text, system_role=None, temperature=1.0):
+# 进程内共享的客户端：首次调用时创建，之后复用其连接池
+_client = None
+_client_lock = threading.Lock()
+
+# 调用统计：实际发起（或回放）的 AI 调用次数与累计耗时
+_stats = {"calls": 0, "seconds": 0.0}
+_stats_lock = threading.Lock()
+
+def get_ai_stats():
+    """返回 AI 调用统计的副本"""
+    with _stats_lock:
+        return dict(_stats)
+
+def _count_call(started):
+    with _stats_lock:
+        _stats["calls"] += 1
+        _stats["seconds"] += time.perf_counter() - started
+
+def _get_client():
+    """懒加载 OpenAI 客户端（连接/读取超时分开设置）"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            # openai 导入很重 (数百毫秒)，只在真正需要调用 AI 时才加载
+            from openai import OpenAI, Timeout
+            _client = OpenAI(
+                api_key=settings.DEEPSEEK_API_KEY,
+                base_url=settings.DEEPSEEK_BASE_URL,
+                timeout=Timeout(settings.AI_READ_TIMEOUT, connect=settings.AI_CONNECT_TIMEOUT),
+                max_retries=settings.AI_MAX_RETRIES
+            )
+        return _client
+
+def _build_messages(prompt_text, system_role):
+    """构建消息体"""
+    messages = []
+    if system_role:
+        messages.append({"role": "system", "content": system_role})
+
+    messages.append({"role": "user", "content": prompt_text})
+    return messages
+
+def _record_usage(s, resp):
+    """把接口返回的 token 用量记到 span 上"""
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return
+    s.set(
+        prompt_tokens=getattr(usage, "prompt_tokens", None),
+        completion_tokens=getattr(usage, "completion_tokens", None),
+        tokens=getattr(usage, "total_tokens", None) or 0
+    )
+
+def _fixture_key(prompt_text, system_role, temperature):
+    """夹具中 AI 回复的键，与缓存键同一算法"""
+    return make_key(settings.DEEPSEEK_MODEL, system_role, temperature, prompt_text)
+
+def _cache_lookup(prompt_text, system_role, temperature, mode, use_cache):
+    """
+    查缓存：完全相同的请求在有效期内直接复用结果
+    :return: (缓存内容或 None, 未命中时用于回写的缓存键或 None)
+    """
+    ttl = ttl_for(mode)
+    if not (use_cache and settings.AI_CACHE_ENABLED and ttl > 0):
+        return None, None
+
+    cache = get_cache()
+    cache_key = make_key(settings.DEEPSEEK_MODEL, system_role, temperature, prompt_text)
+    try:
+        cached = cache.get(cache_key, ttl)
+    except Exception as e:
+        log_error(f"⚠️ AI 缓存读取失败: {e}")
+        return None, None
+    if cached is not None:
+        log_info(f"🧠 AI 缓存命中 [{mode or '-'}] (命中率 {cache.hit_rate():.0%}, {cache.hits}/{cache.hits + cache.misses})")
+    return cached, cache_key
+
+def _cache_store(cache_key, content, mode):
+    """把新结果写回缓存"""
+    if not cache_key or not content:
+        return
+    cache = get_cache()
+    try:
+        cache.set(cache_key, content)
+        log_info(f"🧠 AI 缓存未命中，已写入 [{mode or '-'}] (命中率 {cache.hit_rate():.0%}, {cache.hits}/{cache.hits + cache.misses})")
+    except Exception as e:
+        log_error(f"⚠️ AI 缓存写入失败: {e}")
+
+def get_ai_response(prompt_text, system_role=None, temperature=1.0, mode=None, use_cache=True):
     """
     统一的 AI 调用接口
     :param prompt_text: 用户输入的提示词
     :param system_role: 系统角色设定 (可选)
     :param temperature: 随机度 (0-2)，默认1.0
+    :param mode: 调用方的运行模式，用于选择缓存有效期
+    :param use_cache: False 时跳过缓存，强制请求 AI
     :return: AI 的回复文本 (str) 或 None
     """
     # 1. 安全检查
@@ -15,27 +110,107 @@ def get_ai_response(prompt_text, system_role=None, temperature=1.0):
         log_error("🚫 未检测到 DEEPSEEK_API_KEY，跳过 AI 调用")
         return None
 
-    # 2. 构建消息体
-    messages = []
-    if system_role:
-        messages.append({"role": "system", "content": system_role})
-    
-    messages.append({"role": "user", "content": prompt_text})
+    with span("llm", mode=mode or "-") as s:
+        # 2. 查缓存
+        cached, cache_key = _cache_lookup(prompt_text, system_role, temperature, mode, use_cache)
+        if cached is not None:
+            s.set(cached=True)
+            return cached
 
-    # 3. 初始化客户端 (这里可以复用，但在 Serverless 环境下每次新建也无妨)
-    client = OpenAI(
-        api_key=settings.DEEPSEEK_API_KEY, 
-        base_url="https://api.deepseek.com"
-    )
+        # 3. 发起请求并处理异常
+        started = time.perf_counter()
+        fixture_mode = fixtures.mode()
+        if fixture_mode == "replay":
+            content = fixtures.replay_ai(_fixture_key(prompt_text, system_role, temperature), mode)
+            _count_call(started)
+            return content
+        try:
+            resp = _get_client().chat.completions.create(
+                model=settings.DEEPSEEK_MODEL,
+                messages=_build_messages(prompt_text, system_role),
+                temperature=temperature
+            )
+            content = resp.choices[0].message.content
+            _record_usage(s, resp)
+        except Exception as e:
+            log_error(f"❌ DeepSeek API 调用失败: {e}")
+            return None
+        finally:
+            _count_call(started)
+    log_info(f"⏱️ AI 响应 [{mode or '-'}] 耗时 {time.perf_counter() - started:.2f}s")
+    if fixture_mode == "record":
+        fixtures.record_ai(_fixture_key(prompt_text, system_role, temperature), mode, content)
+
+    _cache_store(cache_key, content, mode)
+    return content
+
+def stream_ai_response(prompt_text, system_role=None, temperature=1.0, mode=None, use_cache=True):
+    """
+    流式 AI 调用：逐段产出回复文本，调用方可以边收边处理
+    缓存命中时一次性产出完整内容；出错时记录日志并提前结束
+    调用方提前停止读取时关闭连接，不再等待剩余内容（不完整的回复不写缓存）
+    """
+    if not settings.DEEPSEEK_API_KEY:
+        log_error("🚫 未检测到 DEEPSEEK_API_KEY，跳过 AI 调用")
+        return
+
+    cached, cache_key = _cache_lookup(prompt_text, system_role, temperature, mode, use_cache)
+    if cached is not None:
+        yield cached
+        return
+
+    started = time.perf_counter()
+    fixture_mode = fixtures.mode()
+    if fixture_mode == "replay":
+        content = fixtures.replay_ai(_fixture_key(prompt_text, system_role, temperature), mode)
+        _count_call(started)
+        if content:
+            yield content
+        return
 
-    # 4. 发起请求并处理异常
+    first_token_at = None
+    parts = []
+    stream = None
     try:
-        resp = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=messages,
-            temperature=temperature
+        stream = _get_client().chat.completions.create(
+            model=settings.DEEPSEEK_MODEL,
+            messages=_build_messages(prompt_text, system_role),
+            temperature=temperature,
+            stream=True
         )
-        return resp.choices[0].message.content
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            parts.append(delta)
+            yield delta
     except Exception as e:
-        log_error(f"❌ DeepSeek API 调用失败: {e}")
-        return None
+        log_error(f"❌ DeepSeek 流式调用失败: {e}")
+        return
+    finally:
+        _count_call(started)
+        if stream is not None and hasattr(stream, "close"):
+            stream.close()
+
+    ttft = f"{first_token_at - started:.2f}s" if first_token_at else "-"
+    log_info(f"⏱️ AI 流式响应 [{mode or '-'}] 首字 {ttft}，总耗时 {time.perf_counter() - started:.2f}s")
+    if fixture_mode == "record":
+        fixtures.record_ai(_fixture_key(prompt_text, system_role, temperature), mode, "".join(parts))
+    _cache_store(cache_key, "".join(parts), mode)
+
+def get_ai_responses(calls, max_workers=None):
+    """
+    并发执行多次 AI 调用
+    :param calls: 列表，每项是 get_ai_response 的关键字参数字典 (至少包含 prompt_text)
+    :param max_workers: 最大并发数，默认取 settings.AI_MAX_CONCURRENCY
+    :return: 与 calls 顺序一致的结果列表 (str 或 None)
+    """
+    if not calls:
+        return []
+    workers = min(max_workers or settings.AI_MAX_CONCURRENCY, len(calls))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda kwargs: get_ai_response(**kwargs), calls))
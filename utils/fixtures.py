@@ -0,0 +1,191 @@
+import base64
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import datetime
+from urllib.parse import urlparse, parse_qsl
+
+from config import settings
+
+# 与 http_client 相同：直接使用同名 logger，避免循环导入
+logger = logging.getLogger("StockBot")
+
+_HTTP_FILE = "http.jsonl"
+_AI_FILE = "ai.jsonl"
+_MANIFEST_FILE = "manifest.json"
+
+# 响应正文中的 "YYYY-MM-DD HH:MM:SS" 时间（快讯 showtime 等），回放时整体平移
+_DATETIME_RE = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
+_DATETIME_FMT = "%Y-%m-%d %H:%M:%S"
+
+# URL 中的 Bot Token 不能写进夹具文件
+_TOKEN_RE = re.compile(r'/bot[^/]+/')
+
+_lock = threading.Lock()
+_replay = None
+
+
+def mode():
+    """当前夹具模式："record" / "replay" / None"""
+    return settings.FIXTURE_MODE if settings.FIXTURE_MODE in ("record", "replay") else None
+
+
+def request_key(method, url, params=None):
+    """请求键：方法 + 去掉 Token 的路径 + 排序后的查询参数（忽略防缓存的 "_"）"""
+    parsed = urlparse(url)
+    query = [kv for kv in parse_qsl(parsed.query) if kv[0] != "_"]
+    query.extend((str(k), str(v)) for k, v in (params or {}).items())
+    path = _TOKEN_RE.sub("/bot<token>/", parsed.path)
+    query_txt = "&".join(f"{k}={v}" for k, v in sorted(query))
+    return f"{method.upper()} {parsed.netloc}{path}?{query_txt}"
+
+
+def _path_key(key):
+    """不带查询参数的请求键，精确键未命中时按路径兜底"""
+    return key.split("?", 1)[0]
+
+
+def _append(filename, record):
+    os.makedirs(settings.FIXTURE_DIR, exist_ok=True)
+    with _lock:
+        manifest_path = os.path.join(settings.FIXTURE_DIR, _MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            with open(manifest_path, "w", encoding="utf-8") as f:
+                json.dump({"version": settings.FIXTURE_VERSION, "recorded_at": time.time()}, f)
+        with open(os.path.join(settings.FIXTURE_DIR, filename), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def record_http(method, url, params, resp):
+    """录制一次 HTTP 响应"""
+    body = resp.content
+    try:
+        text, encoding = body.decode("utf-8"), "text"
+    except UnicodeDecodeError:
+        text, encoding = base64.b64encode(body).decode("ascii"), "base64"
+    _append(_HTTP_FILE, {
+        "key": request_key(method, url, params),
+        "status": resp.status_code,
+        "headers": {k: v for k, v in resp.headers.items() if k.lower() in ("content-type", "retry-after")},
+        "body": text,
+        "encoding": encoding,
+    })
+
+
+def record_ai(cache_key, mode_name, content):
+    """录制一次 AI 回复"""
+    _append(_AI_FILE, {"key": cache_key, "mode": mode_name, "content": content})
+
+
+class _Replay:
+    """加载后的夹具：精确键优先，其次同路径（或同模式）的最近一条"""
+
+    def __init__(self, directory):
+        self.http = {}
+        self.http_by_path = {}
+        self.ai = {}
+        self.ai_by_mode = {}
+        self.shift = datetime.timedelta(0)
+
+        manifest_path = os.path.join(directory, _MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"夹具目录不存在或未录制: {directory}")
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != settings.FIXTURE_VERSION:
+            logger.warning(f"⚠️ 夹具版本 {manifest.get('version')} 与当前 {settings.FIXTURE_VERSION} 不一致，回放结果可能不准")
+        # 把录制时的时间平移到现在，按时间窗口过滤的逻辑才能与录制时一致
+        if manifest.get("recorded_at"):
+            self.shift = datetime.timedelta(seconds=int(time.time() - manifest["recorded_at"]))
+
+        for record in self._read(os.path.join(directory, _HTTP_FILE)):
+            record["body"] = self._decode(record)
+            self.http[record["key"]] = record
+            self.http_by_path[_path_key(record["key"])] = record
+        for record in self._read(os.path.join(directory, _AI_FILE)):
+            self.ai[record["key"]] = record["content"]
+            self.ai_by_mode[record.get("mode")] = record["content"]
+
+    @staticmethod
+    def _read(path):
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _decode(self, record):
+        if record.get("encoding") == "base64":
+            return base64.b64decode(record["body"])
+        text = record["body"]
+        if self.shift:
+            text = _DATETIME_RE.sub(self._shift_match, text)
+        return text.encode("utf-8")
+
+    def _shift_match(self, match):
+        try:
+            moment = datetime.datetime.strptime(match.group(0), _DATETIME_FMT)
+        except ValueError:
+            return match.group(0)
+        return (moment + self.shift).strftime(_DATETIME_FMT)
+
+
+def _get_replay():
+    global _replay
+    with _lock:
+        if _replay is None:
+            _replay = _Replay(settings.FIXTURE_DIR)
+        return _replay
+
+
+def reset_replay():
+    """丢弃已加载的夹具（切换目录后调用）"""
+    global _replay
+    with _lock:
+        _replay = None
+
+
+def _simulate_latency(base_ms, jitter_ms=0.0):
+    delay = base_ms + random.uniform(-jitter_ms, jitter_ms)
+    if delay > 0:
+        time.sleep(delay / 1000)
+
+
+def replay_http(method, url, params=None):
+    """
+    用夹具构造一个 requests.Response；没有对应夹具时返回 404
+    """
+    import requests
+
+    replay = _get_replay()
+    key = request_key(method, url, params)
+    record = replay.http.get(key) or replay.http_by_path.get(_path_key(key))
+    _simulate_latency(settings.FIXTURE_LATENCY_MS, settings.FIXTURE_JITTER_MS)
+
+    resp = requests.Response()
+    resp.url = url
+    if record is None:
+        logger.warning(f"⚠️ 回放未命中: {key}")
+        resp.status_code = 404
+        resp._content = b""
+        return resp
+    resp.status_code = record["status"]
+    resp.headers.update(record.get("headers") or {})
+    resp._content = record["body"]
+    resp.encoding = "utf-8"
+    return resp
+
+
+def replay_ai(cache_key, mode_name):
+    """回放 AI 回复：同一 Prompt 优先，其次同一模式录制过的回复；都没有返回 None"""
+    replay = _get_replay()
+    content = replay.ai.get(cache_key)
+    if content is None:
+        content = replay.ai_by_mode.get(mode_name)
+    _simulate_latency(settings.FIXTURE_AI_LATENCY_MS)
+    if content is None:
+        logger.warning(f"⚠️ AI 回放未命中 [{mode_name or '-'}]")
+    return content
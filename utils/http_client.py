@@ -0,0 +1,270 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse, parse_qsl
+
+from config import settings
+from utils import fixtures, tracing
+
+# 注意：notifier 也依赖本模块，这里直接使用同名 logger，避免循环导入
+logger = logging.getLogger("StockBot")
+
+# 可以重试的 HTTP 状态码：限流 + 服务端临时错误
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_lock = threading.Lock()
+_sessions = {}
+_buckets = {}
+_counters = {"requests": 0, "retries": 0, "throttle_wait": 0.0, "shared_hits": 0, "bytes": 0}
+
+# 共享抓取作用域：开启后相同的 GET 请求在作用域内只真正发送一次
+_shared = None
+
+
+class TokenBucket:
+    """令牌桶限流器：rate 为每秒补充的令牌数，capacity 为突发上限"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取走一个令牌，不足时阻塞等待，返回等待的秒数"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+            waited += wait
+
+
+def _new_session(host):
+    """为单个 host 建立长连接 Session，浏览器身份在会话级别随机一次"""
+    # requests 在首次发请求时才导入，无事可做的模式可以直接退出
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.HTTP_POOL_SIZE, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = random.choice(settings.USER_AGENTS)
+    if host.endswith("eastmoney.com"):
+        session.headers["Referer"] = settings.EASTMONEY_REFERER
+    return session
+
+
+def get_session(url):
+    """按 host 获取（或创建）共享 Session"""
+    host = urlparse(url).netloc
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = _sessions[host] = _new_session(host)
+        return session
+
+
+def _get_bucket(host):
+    """获取 host 对应的令牌桶，未配置限流时返回 None"""
+    limit = settings.HTTP_RATE_LIMITS.get(host)
+    if not limit:
+        return None
+    with _lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            bucket = _buckets[host] = TokenBucket(*limit)
+        return bucket
+
+
+def _backoff(attempt, resp=None):
+    """计算第 attempt 次重试前的等待时间，优先尊重服务端的 Retry-After"""
+    if resp is not None:
+        retry_after = resp.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), settings.HTTP_BACKOFF_MAX)
+    delay = settings.HTTP_BACKOFF_BASE * (2 ** attempt)
+    return min(delay * random.uniform(0.5, 1.5), settings.HTTP_BACKOFF_MAX)
+
+
+def request(method, url, max_retries=None, **kwargs):
+    """
+    统一的 HTTP 请求入口：共享连接池 + 限流 + 有限次重试
+    :param max_retries: 最大重试次数，默认 settings.HTTP_MAX_RETRIES；调用方自行处理重试时传 0
+    :return: requests.Response，重试耗尽后抛出最后一次的异常
+    """
+    import requests
+
+    retries = settings.HTTP_MAX_RETRIES if max_retries is None else max_retries
+
+    # 回放夹具不会真正联网：不建连接、不走限流，基准只测本地处理开销
+    if fixtures.mode() == "replay":
+        session, bucket = None, None
+    else:
+        session = get_session(url)
+        bucket = _get_bucket(urlparse(url).netloc)
+    # POST 读超时可能已经送达，不重试，避免重复发送
+    retry_on_timeout = method.upper() == "GET"
+
+    attempt = 0
+    while True:
+        if bucket:
+            waited = bucket.acquire()
+            if waited:
+                with _lock:
+                    _counters["throttle_wait"] += waited
+        with _lock:
+            _counters["requests"] += 1
+
+        try:
+            resp = _send(session, method, url, kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            retriable = retry_on_timeout or not isinstance(e, requests.ReadTimeout)
+            if not retriable or attempt >= retries:
+                raise
+            delay = _backoff(attempt)
+        else:
+            if resp.status_code not in RETRY_STATUS or attempt >= retries:
+                return resp
+            delay = _backoff(attempt, resp)
+
+        attempt += 1
+        with _lock:
+            _counters["retries"] += 1
+        logger.warning(f"⚠️ 请求重试 ({attempt}/{retries}) {urlparse(url).netloc}，{delay:.1f}s 后再试")
+        time.sleep(delay)
+
+
+def _send(session, method, url, kwargs):
+    """真正发出请求；录制/回放模式下经由夹具层"""
+    outer = tracing.current()
+    with tracing.span("http", method=method.upper(), host=urlparse(url).netloc) as s:
+        fixture_mode = fixtures.mode()
+        if fixture_mode == "replay":
+            resp = fixtures.replay_http(method, url, kwargs.get("params"))
+        else:
+            resp = session.request(method, url, **kwargs)
+            if fixture_mode == "record":
+                fixtures.record_http(method, url, kwargs.get("params"), resp)
+        size = len(resp.content)
+        s.set(status=resp.status_code, bytes=size)
+    # 同时累加到外层的抓取 span 上，方便按接口看数据量
+    outer.add("bytes", size)
+    with _lock:
+        _counters["bytes"] += size
+    return resp
+
+
+def _shared_key(url, params):
+    """共享作用域的请求键：忽略防缓存的时间戳参数 "_" """
+    parsed = urlparse(url)
+    query = [kv for kv in parse_qsl(parsed.query) if kv[0] != "_"]
+    query.extend((str(k), str(v)) for k, v in (params or {}).items())
+    return f"{parsed.scheme}://{parsed.netloc}{parsed.path}", tuple(sorted(query))
+
+
+def _shared_get(url, kwargs):
+    """
+    在共享作用域内执行 GET：第一个调用方真正发请求，并发或后续的相同请求等待并复用结果
+    """
+    key = _shared_key(url, kwargs.get("params"))
+    with _lock:
+        entry = _shared.get(key)
+        owner = entry is None
+        if owner:
+            entry = _shared[key] = {"done": threading.Event(), "resp": None, "error": None}
+        else:
+            _counters["shared_hits"] += 1
+
+    if owner:
+        try:
+            resp = request("GET", url, **kwargs)
+            resp.content  # 提前读完响应体，之后多次 .text/.json() 都可复用
+            entry["resp"] = resp
+        except Exception as e:
+            entry["error"] = e
+            with _lock:
+                _shared.pop(key, None)  # 失败的请求不缓存，后来者可以重试
+        finally:
+            entry["done"].set()
+    else:
+        entry["done"].wait()
+
+    if entry["error"] is not None:
+        raise entry["error"]
+    return entry["resp"]
+
+
+@contextmanager
+def shared_fetch_scope():
+    """
+    开启共享抓取作用域（多模式同进程运行时使用）
+    作用域结束后丢弃所有共享结果
+    """
+    global _shared
+    with _lock:
+        _shared = {}
+    try:
+        yield
+    finally:
+        with _lock:
+            _shared = None
+
+
+def http_get(url, **kwargs):
+    """GET 请求（处于共享抓取作用域时自动去重）"""
+    if _shared is not None:
+        return _shared_get(url, kwargs)
+    return request("GET", url, **kwargs)
+
+
+def http_post(url, **kwargs):
+    """POST 请求"""
+    return request("POST", url, **kwargs)
+
+
+def get_stats():
+    """
+    返回连接层统计：请求数、新建连接(握手)数、连接复用数、重试次数、限流等待秒数、共享作用域省下的请求数、接收字节数
+    """
+    handshakes = 0
+    pooled_requests = 0
+    with _lock:
+        sessions = list(_sessions.values())
+        stats = dict(_counters)
+
+    for session in sessions:
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                handshakes += pool.num_connections
+                pooled_requests += pool.num_requests
+
+    stats["handshakes"] = handshakes
+    stats["reuses"] = max(pooled_requests - handshakes, 0)
+    return stats
+
+
+def close_sessions():
+    """关闭所有 Session（测试或进程退出时调用）"""
+    with _lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+        _buckets.clear()
+    for session in sessions:
+        session.close()
@@ -1,6 +1,12 @@
-import requests
+import atexit
 import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
 from config import settings
+from utils.http_client import http_post
+from utils.tracing import span
 
 # === 配置日志格式 (Pro模式标配) ===
 # 这样打印出来的日志会带时间戳，方便排查问题
@@ -11,29 +17,274 @@ logging.basicConfig(
 )
 logger = logging.getLogger("StockBot")
 
+# 延迟发送缓冲区：不为 None 时 send_tg 只入队，由 deferred_notifications 结束时统一发送
+# 缓冲项为 (序号, 消息)；并发执行的各模式在自己的线程里用 deferred_slot 标记序号
+_deferred = None
+_slot = threading.local()
+
+@contextmanager
+def deferred_notifications():
+    """在作用域内暂存所有 Telegram 消息，结束时按序号（同序号按产生顺序）统一发送"""
+    global _deferred
+    _deferred = []
+    try:
+        yield _deferred
+    finally:
+        pending, _deferred = _deferred, None
+        for _, content in sorted(pending, key=lambda entry: entry[0]):
+            send_tg(content)
+
+@contextmanager
+def deferred_slot(order):
+    """标记当前线程产生的延迟消息的发送序号（如模式在命令行中的位置）"""
+    previous = getattr(_slot, "order", 0)
+    _slot.order = order
+    try:
+        yield
+    finally:
+        _slot.order = previous
+
+_TAG_RE = re.compile(r'<(/?)([a-zA-Z]+)[^>]*>')
+
+
+def split_message(text, limit=None):
+    """
+    把超长消息切成不超过 limit 字符的若干段（HTML 安全）
+    - 优先在空行、换行、空格处断开，不会切断标签或 &xx; 实体
+    - 跨段的未闭合标签在段尾补上闭合、在下一段开头重新打开
+    """
+    limit = limit or settings.TG_MAX_LENGTH
+    parts = []
+    reopen = ""
+    text = text or ""
+    while len(reopen) + len(text) > limit:
+        text = reopen + text
+        # 预留补闭合标签的空间
+        window = limit - 64
+        cut = -1
+        for sep in ("\n\n", "\n", " "):
+            cut = text.rfind(sep, 0, window)
+            if cut > window // 2:
+                break
+        if cut <= 0:
+            cut = window
+        # 不在标签或实体中间断开
+        lt = text.rfind("<", 0, cut)
+        if lt > text.rfind(">", 0, cut):
+            cut = lt
+        amp = text.rfind("&", 0, cut)
+        if amp > text.rfind(";", 0, cut) and cut - amp < 10:
+            cut = amp
+        if cut <= 0:
+            cut = window
+
+        head = text[:cut]
+        stack = []
+        for m in _TAG_RE.finditer(head):
+            if m.group(1):
+                if stack and stack[-1][0] == m.group(2).lower():
+                    stack.pop()
+            else:
+                stack.append((m.group(2).lower(), m.group(0)))
+        parts.append(head.rstrip() + "".join(f"</{name}>" for name, _ in reversed(stack)))
+        reopen = "".join(tag for _, tag in stack)
+        text = text[cut:].lstrip()
+    if text.strip():
+        parts.append(reopen + text)
+    return parts
+
+
+def _pack(messages, limit=None):
+    """把一批消息在不超过上限的前提下合并，超长的单条再切分"""
+    limit = limit or settings.TG_MAX_LENGTH
+    packed = []
+    current = ""
+    for msg in messages:
+        for part in split_message(msg, limit):
+            if current and len(current) + 2 + len(part) <= limit:
+                current = f"{current}\n\n{part}"
+            else:
+                if current:
+                    packed.append(current)
+                current = part
+    if current:
+        packed.append(current)
+    return packed
+
+
+class TelegramQueue:
+    """
+    Telegram 发送队列：send_tg 只入队立即返回，后台线程合并、分段后发送
+    - 429 按 retry_after 等待，5xx/连接失败指数退避
+    - 记录每段的发送耗时，供 get_tg_stats 汇总
+    """
+
+    def __init__(self, linger=1.0):
+        self.linger = linger
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._busy = False
+        self._flushing = False
+        self.stats = {"messages": 0, "sent": 0, "failed": 0, "retries": 0, "latencies": []}
+
+    def put(self, content):
+        with self._cond:
+            self._pending.append(content)
+            self.stats["messages"] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name="tg-sender", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """等待队列发送完毕，返回是否在超时前全部处理完"""
+        deadline = time.monotonic() + (timeout if timeout is not None else settings.TG_FLUSH_TIMEOUT)
+        with self._cond:
+            self._flushing = True
+            self._cond.notify_all()
+            try:
+                while self._pending or self._busy:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._flushing = False
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # 稍等片刻，把同一轮里陆续产生的消息合并发送
+                linger_until = time.monotonic() + self.linger
+                while not self._flushing and time.monotonic() < linger_until:
+                    self._cond.wait(linger_until - time.monotonic())
+                batch, self._pending = self._pending, []
+                self._busy = True
+            try:
+                for part in _pack(batch):
+                    self._send(part)
+            except Exception as e:
+                logger.error(f"❌ Telegram 队列异常: {e}")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _send(self, text):
+        """发送一段消息（带重试），返回是否成功"""
+        url = f"{settings.TG_API_BASE}/bot{settings.TG_BOT_TOKEN}/sendMessage"
+        payload = {
+            "chat_id": settings.TG_CHAT_ID,
+            "text": text,
+            "parse_mode": "HTML",
+            "disable_web_page_preview": True
+        }
+        with span("tg.send", payload_bytes=len(text.encode("utf-8"))) as s:
+            ok = self._send_with_retry(url, payload)
+            s.set(ok=ok)
+        return ok
+
+    def _send_with_retry(self, url, payload):
+        """按 429 retry_after / 指数退避重试发送"""
+        started = time.perf_counter()
+        error = None
+        for attempt in range(settings.TG_MAX_RETRIES + 1):
+            if attempt:
+                self.stats["retries"] += 1
+            delay = min(settings.HTTP_BACKOFF_BASE * (2 ** attempt), settings.HTTP_BACKOFF_MAX)
+            try:
+                resp = http_post(url, json=payload, timeout=settings.TG_TIMEOUT, max_retries=0)
+            except Exception as e:
+                # POST 读超时可能已经送达，不再重发，避免重复消息
+                if type(e).__name__ == "ReadTimeout":
+                    error = e
+                    break
+                error = e
+            else:
+                if resp.status_code == 200:
+                    self.stats["sent"] += 1
+                    self.stats["latencies"].append(time.perf_counter() - started)
+                    return True
+                error = f"HTTP {resp.status_code} {resp.text[:200]}"
+                if resp.status_code == 429:
+                    delay = min(_retry_after(resp) or delay, settings.TG_RETRY_AFTER_MAX)
+                elif resp.status_code == 400 and "parse" in resp.text and "parse_mode" in payload:
+                    # HTML 解析失败：降级为纯文本再发一次
+                    payload.pop("parse_mode")
+                    delay = 0
+                elif resp.status_code < 500:
+                    break
+            if attempt < settings.TG_MAX_RETRIES:
+                logger.warning(f"⚠️ Telegram 发送重试 ({attempt + 1}/{settings.TG_MAX_RETRIES})，{delay:.1f}s 后再试")
+                time.sleep(delay)
+
+        self.stats["failed"] += 1
+        logger.error(f"❌ Telegram 发送失败: {error}")
+        return False
+
+
+def _retry_after(resp):
+    """读取 429 响应里的 retry_after（Bot API 放在 JSON 的 parameters 中）"""
+    try:
+        value = (resp.json().get("parameters") or {}).get("retry_after")
+    except ValueError:
+        value = None
+    if value is None:
+        value = resp.headers.get("Retry-After")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+_queue = TelegramQueue()
+
+
+def get_tg_stats():
+    """发送统计：入队消息数、实际发送段数、失败数、重试数、发送耗时 p50/p95/max (秒)"""
+    stats = dict(_queue.stats)
+    latencies = sorted(stats.pop("latencies"))
+    if latencies:
+        stats["p50"] = latencies[len(latencies) // 2]
+        stats["p95"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        stats["max"] = latencies[-1]
+    return stats
+
+
+def flush_notifications(timeout=None):
+    """等待发送队列清空（进程退出时自动调用）"""
+    return _queue.flush(timeout)
+
+
+@atexit.register
+def _flush_at_exit():
+    if not _queue.stats["messages"]:
+        return
+    if not flush_notifications():
+        logger.error("❌ Telegram 队列未在超时前发送完毕，剩余消息已丢弃")
+    stats = get_tg_stats()
+    latency = f"，耗时 p50 {stats['p50']:.2f}s / p95 {stats['p95']:.2f}s / max {stats['max']:.2f}s" if "p50" in stats else ""
+    logger.info(f"📨 Telegram 入队 {stats['messages']} 条，发送 {stats['sent']} 段，失败 {stats['failed']}，重试 {stats['retries']}{latency}")
+
+
 def send_tg(content):
     """
-    发送 Telegram 消息的核心函数
+    发送 Telegram 消息的核心函数（入队后立即返回，由后台线程发送）
     """
+    if _deferred is not None:
+        _deferred.append((getattr(_slot, "order", 0), content))
+        return
+
     # 检查配置是否存在，不存在则仅打印日志
     if not settings.TG_BOT_TOKEN or not settings.TG_CHAT_ID:
         logger.warning("⚠️ 未配置 Telegram Token 或 Chat ID，跳过消息发送")
         return
 
-    url = f"https://api.telegram.org/bot{settings.TG_BOT_TOKEN}/sendMessage"
-    payload = {
-        "chat_id": settings.TG_CHAT_ID,
-        "text": content,
-        "parse_mode": "HTML",
-        "disable_web_page_preview": True
-    }
-
-    try:
-        # 设置超时时间，防止网络卡死
-        resp = requests.post(url, json=payload, timeout=10)
-        resp.raise_for_status() # 如果状态码不是200，抛出异常
-    except Exception as e:
-        logger.error(f"❌ Telegram 发送失败: {e}")
+    _queue.put(content)
 
 def log_info(msg):
     """统一的信息打印入口"""
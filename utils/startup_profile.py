@@ -0,0 +1,72 @@
+import os
+import subprocess
+import sys
+import time
+from config import settings
+
+# 各模式启动时导入的业务模块（与 main.py 一致）；只测导入，不真正执行模式，
+# 因此不会联网、调用 AI、推送消息或写状态文件，可以安全地放进 CI
+_BASE_MODULES = ("core.analyzer", "utils.notifier")
+MODE_MODULES = {
+    "serve": _BASE_MODULES + ("core.daemon",),
+    "backtest": _BASE_MODULES + ("core.backtest",),
+    "run": _BASE_MODULES + ("core.scheduler",),
+    "bench": _BASE_MODULES + ("core.benchmark",),
+}
+
+
+def _parse_importtime(stderr_text):
+    """
+    解析 -X importtime 输出，按顶层包汇总 self 耗时
+    :return: ({顶层包: 微秒}, 其他非 importtime 的输出行)
+    """
+    per_package = {}
+    passthrough = []
+    for line in stderr_text.splitlines():
+        if not line.startswith("import time:"):
+            passthrough.append(line)
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # 表头行
+        top = parts[2].strip().split(".")[0]
+        per_package[top] = per_package.get(top, 0) + int(parts[0])
+    return per_package, passthrough
+
+
+def profile_startup(argv, top_n=15):
+    """
+    以 -X importtime 在子进程中只导入该模式用到的模块，打印按顶层包汇总的导入耗时
+    若导入总耗时超过该模式的预算 (settings.STARTUP_BUDGET_MS)，返回非零退出码
+    """
+    args = [a for a in argv if not a.startswith("--")]
+    mode = args[0] if args else "daily"
+    if mode == "monitor" and "--daemon" in argv:
+        mode = "serve"
+    modules = MODE_MODULES.get(mode, _BASE_MODULES)
+
+    code = f"import sys; sys.path.insert(0, {settings.BASE_DIR!r}); " + "; ".join(f"import {m}" for m in modules)
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        stderr=subprocess.PIPE, universal_newlines=True, encoding="utf-8", cwd=settings.BASE_DIR
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    per_package, passthrough = _parse_importtime(proc.stderr)
+    if passthrough:
+        print("\n".join(passthrough), file=sys.stderr)
+
+    total_ms = sum(per_package.values()) / 1000
+    print(f"\n⏱️ 启动导入耗时 [{mode}]：共 {total_ms:.1f}ms，进程总耗时 {wall_ms:.0f}ms ({', '.join(modules)})")
+    for name, us in sorted(per_package.items(), key=lambda kv: kv[1], reverse=True)[:top_n]:
+        print(f"  {name:<24}{us / 1000:>8.1f}ms  {us / 1000 / total_ms * 100 if total_ms else 0:>5.1f}%")
+
+    if proc.returncode != 0:
+        print(f"❌ 模块导入失败，退出码 {proc.returncode}")
+        return proc.returncode
+    budget = settings.STARTUP_BUDGET_MS.get(mode)
+    if budget is not None and total_ms > budget:
+        print(f"❌ 导入耗时 {total_ms:.1f}ms 超出预算 {budget}ms")
+        return 1
+    return 0
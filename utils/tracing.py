@@ -0,0 +1,210 @@
+import contextvars
+import functools
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+from config import settings
+
+# 与 http_client 相同：直接使用同名 logger，避免循环导入
+logger = logging.getLogger("StockBot")
+
+_enabled = bool(settings.TRACE_ENABLED)
+_spans = []
+_lock = threading.Lock()
+_ids = itertools.count(1)
+_current = contextvars.ContextVar("stockbot_span", default=None)
+
+
+class _NoopSpan:
+    """关闭追踪时返回的空 span：进出与 set/add 都不做任何事"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+    def add(self, key, value):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    """一段计时区间：记录耗时、父子关系以及 bytes/items/tokens 等属性"""
+    __slots__ = ("id", "parent", "name", "attrs", "start", "duration", "error", "_token", "_t0")
+
+    def __init__(self, name, attrs):
+        self.id = next(_ids)
+        self.parent = None
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+        self.duration = 0.0
+        self.error = None
+        self._token = None
+
+    def __enter__(self):
+        parent = _current.get()
+        self.parent = parent.id if parent is not None else None
+        self._token = _current.set(self)
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._t0
+        _current.reset(self._token)
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        with _lock:
+            _spans.append(self)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, key, value):
+        self.attrs[key] = self.attrs.get(key, 0) + value
+
+    def to_dict(self):
+        record = {
+            "id": self.id,
+            "parent": self.parent,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "ms": round(self.duration * 1000, 3),
+        }
+        record.update(self.attrs)
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+def enable(on=True):
+    """运行时开关（main 的 --trace 参数）"""
+    global _enabled
+    _enabled = on
+
+
+def is_enabled():
+    return _enabled
+
+
+def span(name, **attrs):
+    """
+    开启一个 span（用作 with 语句）；追踪关闭时返回共享的空 span，几乎没有开销
+    """
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def current():
+    """当前 span，用于向外层 span 累加属性；没有时返回空 span"""
+    if not _enabled:
+        return _NOOP
+    return _current.get() or _NOOP
+
+
+def traced(name, count_items=True):
+    """
+    装饰器：把整个函数包成一个 span，返回值是列表/字典时自动记录条数
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(name, {}) as s:
+                result = func(*args, **kwargs)
+                if count_items and isinstance(result, (list, dict)):
+                    s.attrs["items"] = len(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def _aggregate(spans):
+    """按 span 名汇总：次数、总耗时、最大耗时、bytes/items/tokens 合计"""
+    summary = {}
+    for s in spans:
+        agg = summary.setdefault(s.name, {"count": 0, "seconds": 0.0, "max": 0.0, "errors": 0})
+        agg["count"] += 1
+        agg["seconds"] += s.duration
+        agg["max"] = max(agg["max"], s.duration)
+        if s.error:
+            agg["errors"] += 1
+        for key in ("bytes", "items", "tokens"):
+            if isinstance(s.attrs.get(key), (int, float)):
+                agg[key] = agg.get(key, 0) + s.attrs[key]
+    return summary
+
+
+def _write_jsonl(spans, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for s in spans:
+            f.write(json.dumps(s.to_dict(), ensure_ascii=False) + "\n")
+
+
+def _write_prometheus(summary, path):
+    """写 node_exporter textfile 格式；先写临时文件再改名，避免被读到半截"""
+    # 文本文件每次运行整体覆盖，所以都是"最近一次运行"的 gauge
+    lines = []
+    metrics = (
+        ("seconds", "Time spent in each traced stage during the last run."),
+        ("count", "Number of times each stage ran during the last run."),
+        ("errors", "Failed runs of each stage during the last run."),
+        ("bytes", "Bytes received by each stage during the last run."),
+        ("items", "Items produced by each stage during the last run."),
+        ("tokens", "Tokens used by each stage during the last run."),
+    )
+    for key, help_txt in metrics:
+        lines += [f"# HELP stockbot_span_{key} {help_txt}", f"# TYPE stockbot_span_{key} gauge"]
+        lines += [f'stockbot_span_{key}{{span="{name}"}} {agg[key]:g}' for name, agg in summary.items() if key in agg]
+    lines.append(f"stockbot_last_run_timestamp_seconds {time.time():.0f}")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)
+
+
+def finish():
+    """
+    输出本次运行的全部 span：写 JSON Lines、可选的 Prometheus 文本文件，并在日志里打印汇总
+    :return: 按 span 名的汇总字典
+    """
+    if not _enabled:
+        return {}
+    with _lock:
+        spans = list(_spans)
+        _spans.clear()
+    if not spans:
+        return {}
+
+    summary = _aggregate(spans)
+    try:
+        _write_jsonl(spans, settings.TRACE_FILE)
+        if settings.TRACE_PROM_FILE:
+            _write_prometheus(summary, settings.TRACE_PROM_FILE)
+    except Exception as e:
+        logger.error(f"❌ 追踪数据写入失败: {e}")
+
+    logger.info("🔬 阶段耗时汇总 (span | 次数 | 总耗时 | 最大 | 数据量)")
+    for name, agg in sorted(summary.items(), key=lambda kv: kv[1]["seconds"], reverse=True):
+        extras = " ".join(f"{key}={agg[key]:.0f}" for key in ("bytes", "items", "tokens") if key in agg)
+        errors = f" ❌{agg['errors']}" if agg["errors"] else ""
+        logger.info(f"   {name:<22} {agg['count']:>4} | {agg['seconds']:7.3f}s | {agg['max']:6.3f}s | {extras}{errors}")
+    return summary